@@ -1,55 +1,111 @@
 """
 Simple API interface for the agent that can be used by both CLI and UI
 """
-from agent.graph import create_agent_graph
-from agent.services.memory_manager import load_memory
-import json
+from agent.graph import get_agent_graph
+from agent.services.lead_repository import get_lead_repository
+from agent.services.similar_leads import OPENING_PRECEDENTS, find_similar_leads
+from agent.services.finalization_queue import get_finalization_queue
+from agent.services.conversation_digest import new_digest
+from agent.services.tracing import span
+from agent.services.answer_stream import ANSWER_DELTA, PROGRESS
+from typing import Callable, Iterator
+import copy
+import threading
+import time
+import uuid
 
-from agent.services.memory_manager import load_memory
 from agent.state import ConversationState
 
+COMPANY_DATA_FILE = 'data/company_docs/system_in_context.txt'
+_company_data = None
+_company_data_lock = threading.Lock()
+
+def load_company_data() -> str:
+    """Company context shared by every session (read once per process)"""
+    global _company_data
+    with _company_data_lock:
+        if _company_data is None:
+            with open(COMPANY_DATA_FILE, 'r') as f:
+                _company_data = f.read().strip()
+        return _company_data
+
 def load_initial_data(state: ConversationState) -> ConversationState:
     print("---NODE: LOAD_INITIAL_DATA---")
     lead_id = state['lead_id']
     
-    # Load LTM
-    state['long_term_memory'] = load_memory(lead_id)
-    
-    # Load lead data
-    with open('data/leads.json', 'r') as f:
-        all_leads = json.load(f)
-    state['lead_data'] = all_leads.get(lead_id, {})
+    # Load LTM and lead data (cached until the store or leads file changes)
+    repository = get_lead_repository()
+    state['long_term_memory'] = repository.get_memory(lead_id)
+    state['lead_data'] = repository.get_lead(lead_id)
     
     # Load company data
-    with open('data/company_docs/system_in_context.txt', 'r') as f:
-        state['company_data'] = f.read().strip()
+    state['company_data'] = load_company_data()
+    
+    # What worked with similar leads, for the opening
+    state['precedents'] = []
+    if OPENING_PRECEDENTS:
+        try:
+            state['precedents'] = find_similar_leads(lead_id, OPENING_PRECEDENTS)
+        except Exception as e:
+            print(f"Warning: similar-lead lookup failed for {lead_id}: {e}")
         
     # Initialize turn tracking and other state fields
     state['messages'] = []
     state['scratchpad'] = []  # Now stores structured turn data
     state['retrieved_docs'] = []
+    state['tool_results'] = {}
     state['turn_counter'] = 0
     state['current_turn_actions'] = []
+    state['digest'] = new_digest()
 
     state['is_end'] = False
+    state['finalization_job_id'] = None
     
     return state
 
 class AgentAPI:
-    def __init__(self, lead_id=None):
-        self.app = create_agent_graph()
-        if lead_id:
-            self.state = load_initial_data({"lead_id": lead_id})
-        else:
-            self.state = None
+    def __init__(self, lead_id=None, thread_id=None, app=None):
+        self.app = app or get_agent_graph()
+        self.lead_id = lead_id
+        self._state = None
+        self.last_turn_latency = None  # {"first_token": s, "total": s} of the last streamed turn
+        # Each call is its own checkpoint thread; pass a thread_id to resume one
+        self.thread_id = thread_id or (f"{lead_id}:{uuid.uuid4().hex[:8]}" if lead_id else None)
+        if lead_id and not (thread_id and self.has_checkpoint()):
+            self._state = load_initial_data({"lead_id": lead_id})
+
+    @property
+    def config(self) -> dict:
+        return {"configurable": {"thread_id": self.thread_id}}
+
+    @property
+    def state(self):
+        """Conversation state, reloaded from the checkpointer if it was released"""
+        if self._state is None and self.thread_id:
+            values = self.app.get_state(self.config).values
+            self._state = dict(values) if values else None
+        return self._state
+
+    @state.setter
+    def state(self, value):
+        self._state = value
+
+    def has_checkpoint(self) -> bool:
+        return bool(self.thread_id) and self.app.checkpointer.get_tuple(self.config) is not None
+
+    def release_state(self) -> bool:
+        """Drops the in-memory state of an idle session; the next access reloads it by thread_id"""
+        if self._state is None or not self.has_checkpoint():
+            return False
+        self._state = None
+        return True
 
     def initialize_knowledge(self):
-        """Initialize knowledge bases"""
+        """Initialize knowledge bases (warms the shared runtime; a no-op once warmed)"""
         try:
-            from vectorstores.create_knowledge_bases import initialize_vector_knowledge, initialize_json_knowledge
+            from agent.runtime import get_runtime
             print("Initializing knowledge bases...")
-            initialize_vector_knowledge()
-            initialize_json_knowledge()
+            get_runtime().warm()
             print("Knowledge bases initialized!")
             return True
         except Exception as e:
@@ -57,16 +113,18 @@ class AgentAPI:
             return False
     
     def get_opening_statement(self, lead_id: str) -> str:
-
+        """Get opening statement for a lead"""
+        if self.thread_id is None:
+            self.thread_id = f"{lead_id}:{uuid.uuid4().hex[:8]}"
         if self.state is None:
             self.state = load_initial_data({"lead_id": lead_id})
 
-        """Get opening statement for a lead"""
         try:
-            config = {"configurable": {"thread_id": f"{lead_id}"}}
-            
+            config = self.config
+
             # Run graph to generate opening statement
-            self.state = self.app.invoke(self.state, config)
+            with span("opening", lead_id=lead_id):
+                self.state = self.app.invoke(self.state, config)
             
             # Extract agent message
             messages = self.state.get('messages', [])
@@ -92,14 +150,15 @@ class AgentAPI:
     def process_message(self, lead_id: str, user_input: str) -> str:
         """Process user message and get agent response"""
         try:
-            config = {"configurable": {"thread_id": f"{lead_id}"}}
-            
+            config = self.config
+
             # Prepare the state with conversation context
             self.state['user_input'] = user_input
             if self.state['messages'][-1]['role'] != 'user':
                 self.state['messages'].append({"role": "user", "content": user_input})
             
-            self.state = self.app.invoke(self.state, config)
+            with span("turn", lead_id=lead_id, user_chars=len(user_input)):
+                self.state = self.app.invoke(self.state, config)
             # Extract agent response
             result_messages = self.state.get('messages', [])
             agent_messages = [msg for msg in result_messages if msg.get('role') == 'agent']
@@ -114,16 +173,96 @@ class AgentAPI:
             print(f"Error processing message: {e}")
             return "I'm having trouble processing that. Could you please try again?"
     
+    def stream_opening(self, lead_id: str, cancel: threading.Event = None,
+                       on_progress: Callable[[dict], None] = None) -> Iterator[str]:
+        """Like get_opening_statement, but yields the opener as it is generated"""
+        if self.thread_id is None:
+            self.thread_id = f"{lead_id}:{uuid.uuid4().hex[:8]}"
+        if self.state is None:
+            self.state = load_initial_data({"lead_id": lead_id})
+        yield from self._stream_graph("opening", lead_id,
+                                      "Hello! I'm Zain from Systems Limited. How can I help you today?",
+                                      cancel, on_progress)
+
+    def stream_message(self, lead_id: str, user_input: str, cancel: threading.Event = None,
+                       on_progress: Callable[[dict], None] = None) -> Iterator[str]:
+        """
+        Like process_message, but yields the reply text as the LLM generates it.
+        The final message is in state['messages'] once the generator is exhausted.
+        Setting `cancel` stops the turn at the next streamed event and puts the
+        state back as it was before the message; `on_progress` receives
+        {"node": name} as each graph node starts and {"tool": name} before a tool runs.
+        """
+        before = copy.deepcopy(self.state) if cancel is not None else None
+        self.state['user_input'] = user_input
+        if self.state['messages'][-1]['role'] != 'user':
+            self.state['messages'].append({"role": "user", "content": user_input})
+        yield from self._stream_graph("turn", lead_id,
+                                      "I'm having trouble processing that. Could you please try again?",
+                                      cancel, on_progress, before, user_chars=len(user_input))
+
+    def _stream_graph(self, span_name: str, lead_id: str, fallback: str, cancel: threading.Event = None,
+                      on_progress: Callable[[dict], None] = None, before: dict = None, **attributes) -> Iterator[str]:
+        """Runs the graph with answer streaming on, yielding reply deltas and recording latency"""
+        config = {"configurable": {**self.config["configurable"], "stream_answer": True}}
+        if before is None and cancel is not None:
+            before = copy.deepcopy(self.state)
+        # The checkpoint to go back to if the run is cancelled (None: the thread has none yet)
+        previous = self.app.checkpointer.get_tuple(self.config) if cancel is not None else None
+        start, first_token, streamed = time.perf_counter(), None, False
+        try:
+            with span(span_name, lead_id=lead_id, streamed=True, **attributes) as stream_span:
+                run = self.app.stream(self.state, config, stream_mode=["custom", "values", "tasks"])
+                for mode, chunk in run:
+                    if cancel is not None and cancel.is_set():
+                        # Stop the run, then discard the partial turn in memory and in the checkpointer
+                        stream_span.set("cancelled", True)
+                        run.close()
+                        self._discard_run(previous, before)
+                        break
+                    if mode == "values":
+                        self.state = chunk
+                    elif mode == "tasks":
+                        if on_progress and "result" not in chunk:
+                            on_progress({"node": chunk["name"]})
+                    elif chunk.get("type") == ANSWER_DELTA:
+                        if first_token is None:
+                            first_token = time.perf_counter() - start
+                        streamed = True
+                        yield chunk["text"]
+                    elif chunk.get("type") == PROGRESS and on_progress:
+                        on_progress(chunk["event"])
+        except Exception as e:
+            print(f"Error streaming {span_name}: {e}")
+            if not streamed:
+                yield fallback
+        self.last_turn_latency = {"first_token": first_token, "total": time.perf_counter() - start}
+
+    def _discard_run(self, previous, before: dict):
+        """Puts the state and the thread's checkpoints back as they were before a cancelled run"""
+        self.state = before
+        checkpointer = self.app.checkpointer
+        if hasattr(checkpointer, "rewind"):
+            checkpointer.rewind(self.thread_id, previous.config["configurable"]["checkpoint_id"] if previous else None)
+        else:
+            self.app.update_state(self.config, before)
+
+    def get_finalization_status(self) -> dict:
+        """Status of the background memory synthesis for this conversation, if it has ended"""
+        job_id = self.state.get('finalization_job_id') if self.state else None
+        return get_finalization_queue().get_status(job_id) if job_id else None
+
+    def wait_for_finalization(self, timeout: float = None) -> dict:
+        """Block until long-term memory for this conversation has been persisted (or timeout)"""
+        job_id = self.state.get('finalization_job_id') if self.state else None
+        return get_finalization_queue().wait(job_id, timeout) if job_id else None
+
     def get_lead_info(self, lead_id: str) -> dict:
         """Get lead information and memory"""
         try:
-            # Load lead data
-            with open('data/leads.json', 'r') as f:
-                leads = json.load(f)
-            lead_data = leads.get(lead_id, {})
-            
-            # Load memory
-            memory = load_memory(lead_id)
+            repository = get_lead_repository()
+            lead_data = repository.get_lead(lead_id)
+            memory = repository.get_memory(lead_id)
             
             return {
                 'lead_data': lead_data,
@@ -134,5 +273,5 @@ class AgentAPI:
             return {'lead_data': {}, 'memory': {}}
 
 # Global instance
-def get_agent_api(lead_id: str) -> AgentAPI:
-    return AgentAPI(lead_id=lead_id)
\ No newline at end of file
+def get_agent_api(lead_id: str, thread_id: str = None) -> AgentAPI:
+    return AgentAPI(lead_id=lead_id, thread_id=thread_id)
\ No newline at end of file
@@ -1,60 +1,21 @@
-import json
+import threading
 from langgraph.graph import StateGraph, END
 from agent.state import ConversationState
 from agent.nodes import reasoning, finalization
-from agent.services.turn_manager import TurnManager
+from agent.services.checkpointer import get_checkpointer
 
 def should_continue_reasoning(state: ConversationState) -> str:
-    # Get reasoning from current turn actions
-    current_actions = state.get('current_turn_actions', [])
-
-    if current_actions[-1]['action_type'] == 'agent_opening':
-        final_answer = state['messages'][-1]['content']
-        TurnManager.finalize_turn(state, final_answer)
-        #print(final_answer)
-        return "end_turn"
+    # `think` closes the turn once the LLM answers; an open turn means a tool is pending
+    if state.get('current_turn_actions'):
+        return "execute_tool"
 
-    reasoning_actions = [action for action in current_actions if action['action_type'] == 'llm_reasoning']
-    
-    if not reasoning_actions:
-        return "execute_tool"  # No reasoning yet, continue
-    
-    last_reasoning = reasoning_actions[-1]['details']['reasoning_output']
-    
-    try:
-        action_json = json.loads(last_reasoning.split('```json\n')[-1].split('```')[0])
-        action = action_json.get('action', {})
-    except json.JSONDecodeError:
-        return "execute_tool"  # Continue if can't parse
-    
-    tool = action.get("tool")
-    
-    if tool == "generate_response":
-        final_answer = action.get("answer", "I'm not sure how to respond to that.")
-        
-        # Finalize the turn before ending
-        TurnManager.finalize_turn(state, final_answer)
-        
-        state['messages'].append({"role": "agent", "content": final_answer})
-        #print(f"\nAgent: {state['messages'][-1]['content']}\n")
-        #print(final_answer)
-        return "end_turn"
-        
-    elif tool == "end_conversation":
-        final_answer = action.get("answer", "Thank you for your time. Have a great day!")
-        
-        # Finalize the turn before ending conversation
-        TurnManager.finalize_turn(state, final_answer)
-        
-        state['messages'].append({"role": "agent", "content": final_answer})
-        #print(f"\nAgent: {state['messages'][-1]['content']}\n")
-        #print(final_answer)
+    if state.get('scratchpad') and state['scratchpad'][-1].ends_conversation:
         return "end_conversation"
-    else:
-        return "execute_tool"
+    return "end_turn"
 
 
-def create_agent_graph() -> StateGraph:
+def create_agent_graph(checkpointer=None) -> StateGraph:
+    """Compiles the agent graph; state is checkpointed per thread_id (SQLite by default)."""
     workflow = StateGraph(ConversationState)
 
     # Add ALL nodes
@@ -77,4 +38,16 @@ def create_agent_graph() -> StateGraph:
     workflow.add_edge("execute_tool", "think")
     workflow.add_edge("finalize", END)
 
-    return workflow.compile()
\ No newline at end of file
+    return workflow.compile(checkpointer=checkpointer or get_checkpointer())
+
+
+_agent_graph = None
+_agent_graph_lock = threading.Lock()
+
+def get_agent_graph():
+    """Process-wide compiled graph (compiled on first use); sessions only differ by thread_id."""
+    global _agent_graph
+    with _agent_graph_lock:
+        if _agent_graph is None:
+            _agent_graph = create_agent_graph()
+        return _agent_graph
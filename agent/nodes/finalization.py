@@ -1,12 +1,26 @@
+import copy
 import json
-from agent.services.llm_service import get_llm
+import os
+from agent.services.llm_service import get_llm, invoke_llm
 from agent.state import ConversationState
 from agent.services.memory_manager import save_memory
+import agent.services.similar_leads  # noqa: F401  (re-indexes a lead when its memory is saved)
+from agent.services.finalization_queue import get_finalization_queue, run_with_retries
+from agent.services.conversation_digest import format_digest
+from agent.services.tracing import span
+
+FINALIZE_IN_BACKGROUND = os.getenv("FINALIZE_IN_BACKGROUND", "1") == "1"
+
+# State fields the synthesis needs; copied so the job is isolated from later mutations
+SYNTHESIS_FIELDS = [
+    'lead_id', 'lead_data', 'long_term_memory', 'digest',
+    'conversation_stage', 'lead_qualification_score', 'buying_signals_detected', 'detected_objections',
+]
 
 def format_final_state_for_synthesis(state: ConversationState) -> str:
     """
-    Helper to compile the entire final state into a comprehensive text block
-    for the LLM to synthesize.
+    Helper to compile the final state into a text block for the LLM to synthesize.
+    Uses the per-turn conversation digest, so its size is bounded regardless of call length.
     """
     report = []
     report.append("### Final State Report for Synthesis ###")
@@ -20,23 +34,11 @@ def format_final_state_for_synthesis(state: ConversationState) -> str:
     if state.get('long_term_memory'):
         report.append("\n--- Pre-existing Long-Term Memory ---")
         report.append(json.dumps(state['long_term_memory'], indent=2))
-        
-    # Full Conversation Transcript
-    if state.get('messages'):
-        report.append("\n--- Conversation Transcript ---")
-        transcript = "\n".join([f"{msg['role'].capitalize()}: {msg['content']}" for msg in state['messages']])
-        report.append(transcript)
-
-    # Documents Retrieved During the Conversation
-    if state.get('retrieved_docs'):
-        report.append("\n--- Documents Retrieved During Conversation ---")
-        report.append("\n".join([f"- {doc}" for doc in state['retrieved_docs']]))
-
-    # Agent's Internal Thoughts (Scratchpad)
-    if state.get('scratchpad'):
-        report.append("\n--- Agent's Internal Reasoning (Scratchpad) ---")
-        report.append("\n".join(state['scratchpad']))
-        
+
+    # Facts, signals, referenced docs and condensed transcript accumulated turn by turn
+    report.append("\n--- Conversation Digest ---")
+    report.append(format_digest(state.get('digest')))
+
     return "\n".join(report)
 
 
@@ -66,12 +68,11 @@ def create_enhanced_summary(detailed_memory: dict) -> str:
         **Write a natural paragraph summary that helps the sales agent pick up where they left off:**
         """
 
-    summary = llm.invoke(prompt).content.strip()
+    summary = invoke_llm(llm, prompt, "summary").strip()
     return summary
 
-def update_summary_and_insights(state: ConversationState) -> ConversationState:
-    print("---NODE: UPDATE_SUMMARY_AND_INSIGHTS (Enhanced with Conversation Intelligence)---")
-    
+def synthesize_memory(state: ConversationState) -> tuple:
+    """Runs the two synthesis LLM calls; returns (detailed_memory, in_context_summary)."""
     llm = get_llm()
     final_report = format_final_state_for_synthesis(state)
     
@@ -119,7 +120,7 @@ def update_summary_and_insights(state: ConversationState) -> ConversationState:
         """
         
     try:
-        response_str = llm.invoke(detailed_prompt).content
+        response_str = invoke_llm(llm, detailed_prompt, "memory_synthesis")
         cleaned_response_str = response_str.strip().replace('```json', '').replace('```', '')
         detailed_memory = json.loads(cleaned_response_str)
     except (json.JSONDecodeError, TypeError) as e:
@@ -137,6 +138,33 @@ def update_summary_and_insights(state: ConversationState) -> ConversationState:
     else:
         in_context_summary = "No detailed memory was generated."
 
-    save_memory(state['lead_id'], detailed_memory, in_context_summary)
+    return detailed_memory, in_context_summary
+
+def finalize_conversation(state: ConversationState, job=None) -> dict:
+    """Synthesizes and persists long-term memory, retrying each stage when run as a job."""
+    with span("finalization", lead_id=state['lead_id'], background=job is not None):
+        return _finalize_conversation(state, job)
+
+def _finalize_conversation(state: ConversationState, job=None) -> dict:
+    if job is None:
+        detailed_memory, in_context_summary = synthesize_memory(state)
+        save_memory(state['lead_id'], detailed_memory, in_context_summary)
+    else:
+        detailed_memory, in_context_summary = run_with_retries(job, synthesize_memory, state)
+        run_with_retries(job, save_memory, state['lead_id'], detailed_memory, in_context_summary)
+    return detailed_memory
+
+def update_summary_and_insights(state: ConversationState) -> ConversationState:
+    print("---NODE: UPDATE_SUMMARY_AND_INSIGHTS (Enhanced with Conversation Intelligence)---")
+
+    if FINALIZE_IN_BACKGROUND:
+        # The goodbye is already in state; memory synthesis happens on the finalization queue
+        snapshot = {key: copy.deepcopy(state.get(key)) for key in SYNTHESIS_FIELDS}
+        state['finalization_job_id'] = get_finalization_queue().submit(
+            state['lead_id'], lambda job: finalize_conversation(snapshot, job)
+        )
+    else:
+        finalize_conversation(state)
+
     state['is_end'] = True  # Mark conversation as ended
     return state
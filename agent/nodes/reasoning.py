@@ -1,47 +1,99 @@
 # agent/nodes/reasoning.py
 import json
+import re
 from agent.state import ConversationState
 from agent.prompts import get_reasoning_prompt, get_opening_prompt
-from agent.services.llm_service import get_llm
+from agent.services.llm_service import get_llm, invoke_llm
 from agent.services.knowledge_retriever import search_knowledge_base, search_company_case_studies, search_technical_capabilities, search_pricing_models, search_company_profile
 from agent.services.turn_manager import TurnManager
+from agent.services.opening_store import get_fresh_opening, opening_fingerprint
+from agent.services.tool_registry import ToolSpec, register_tool, get_tool, run_tool
+from agent.services.tracing import span
+from agent.services.answer_stream import AnswerExtractor, get_answer_writer, report_progress
+from vectorstores.create_knowledge_bases import index_manifest_paths
+
+# Whitespace after the fence is optional: streamed chunks lose their trailing newlines
+_JSON_BLOCK = re.compile(r"```json\s*(.*?)```", re.DOTALL)
+
+def parse_reasoning_output(reasoning_output: str) -> dict:
+    """Extracts the action JSON from the LLM's reasoning output"""
+    blocks = _JSON_BLOCK.findall(reasoning_output)
+    return json.loads(blocks[-1] if blocks else reasoning_output.split('```')[0])
 
 def think(state: ConversationState) -> ConversationState:
+    with span("think", turn=state.get('turn_counter') or 0):
+        return _think(state)
+
+def _think(state: ConversationState) -> ConversationState:
     print("---NODE: THINK---")
 
     llm = get_llm()
+    write_answer = get_answer_writer()
 
     if not state['messages']:
-        prompt = get_opening_prompt(state)
-        #print(prompt)
-        response_str = llm.invoke(prompt).content
-        state['messages'].append({
-            "role": "agent",
-            "content": response_str
-        })
-        TurnManager.start_new_turn(state, user_query=None)
-        return state
+        # Serve the batch-generated opener when it was built from the current lead data and memory
+        with span("opening_store") as store_span:
+            fingerprint = opening_fingerprint(state.get('lead_data'), state.get('long_term_memory'), state.get('company_data'),
+                                              state.get('precedents'))
+            response_str = get_fresh_opening(state['lead_id'], fingerprint)
+            store_span.set("cache_hit", response_str is not None)
+        if response_str is None:
+            with span("prompt_build", prompt="opening"):
+                prompt = get_opening_prompt(state)
+            #print(prompt)
+            response_str = invoke_llm(llm, prompt, "opening", on_token=write_answer)
+        elif write_answer:
+            write_answer(response_str)  # a stored opener arrives in one piece
+        return record_opening(state, response_str)
 
-    if state['messages'][-1]['role'] == 'user' and state['current_turn_actions'] is None:
+    if state['messages'][-1]['role'] == 'user' and not state['current_turn_actions']:
         user_query = state['messages'][-1]['content']
         TurnManager.start_new_turn(state, user_query=user_query)
 
-    prompt = get_reasoning_prompt(state)
+    with span("prompt_build", prompt="reasoning"):
+        prompt = get_reasoning_prompt(state)
     #print(prompt)
-    response_str = llm.invoke(prompt).content
+    if write_answer:
+        # Only the reply inside the action JSON is streamed, not the thought or tool calls
+        extractor = AnswerExtractor()
+        response_str = invoke_llm(llm, prompt, "reasoning", on_token=lambda token: write_answer(extractor.feed(token)))
+    else:
+        response_str = invoke_llm(llm, prompt, "reasoning")
     
     TurnManager.add_action_to_current_turn(
         state,
         action_type="llm_reasoning",
-        details={
-            "reasoning_output": response_str,
-            "prompt_length": len(prompt)
-        }
+        text=response_str
     )
-    
+
+    # Close the turn here (not in the router) so the scratchpad and digest updates are part of the node's state
+    try:
+        action = parse_reasoning_output(response_str).get('action', {})
+    except json.JSONDecodeError:
+        action = {}
+
+    if action.get("tool") == "generate_response":
+        final_answer = action.get("answer", "I'm not sure how to respond to that.")
+        TurnManager.finalize_turn(state, final_answer)
+        state['messages'].append({"role": "agent", "content": final_answer})
+    elif action.get("tool") == "end_conversation":
+        final_answer = action.get("answer", "Thank you for your time. Have a great day!")
+        TurnManager.finalize_turn(state, final_answer, ends_conversation=True)
+        state['messages'].append({"role": "agent", "content": final_answer})
+
     #print(response_str)
     return state
 
+def record_opening(state: ConversationState, opening: str) -> ConversationState:
+    """Adds the opener as the agent's first message and records it as the opening turn"""
+    state['messages'].append({
+        "role": "agent",
+        "content": opening
+    })
+    TurnManager.start_new_turn(state, user_query=None)
+    TurnManager.finalize_turn(state, opening)
+    return state
+
 def update_conversation_context(state: ConversationState, stage: str, signals: list, qualification_updates: dict) -> str:
     """Update conversation stage and qualification data"""
     # Update stage
@@ -78,151 +130,111 @@ def update_conversation_context(state: ConversationState, stage: str, signals: l
     
     return f"Updated to {stage} stage. Qualification score: {state['lead_qualification_score']}. New signals: {signals}"
 
+# --- Tool registry ---
+SEARCH_TOOLS = [
+    # (name, search function, argument, result tag, timeout seconds, max concurrent calls, index searched,
+    #  cacheable: deterministic retrieval whose results can be shared across sessions)
+    ("search_company_case_studies", search_company_case_studies, "keywords", "CASE STUDIES", 10, 8, "company_projects", True),
+    ("search_technical_capabilities", search_technical_capabilities, "keywords", "TECHNICAL", 10, 8, "company_technical", True),
+    ("search_pricing_models", search_pricing_models, "keywords", "PRICING", 10, 8, "company_price_models", True),
+    ("search_company_profile", search_company_profile, "keywords", "COMPANY PROFILE", 10, 8, "company_profile", True),
+    # Retrieval + an LLM-written answer: not replayed into other conversations
+    ("search_knowledge_base", search_knowledge_base, "query", "GENERAL KB", 30, 4, "company_docs", False),
+]
+
+for name, search_fn, arg_name, tag, timeout, max_concurrency, index, cacheable in SEARCH_TOOLS:
+    register_tool(ToolSpec(
+        name=name,
+        handler=lambda state, search_fn=search_fn, **args: search_fn(**args),
+        args={arg_name: (str, "")},
+        result_tag=tag,
+        timeout=timeout,
+        max_concurrency=max_concurrency,
+        cacheable=cacheable,
+        cache_namespace=index,
+        cache_paths=index_manifest_paths(index),
+    ))
+
+register_tool(ToolSpec(
+    name="update_conversation_context",
+    handler=update_conversation_context,
+    args={"stage": (str, "discovery"), "signals": (list, []), "qualification_updates": (dict, {})},
+    action_type="context_update",
+))
+
 def execute_tool(state: ConversationState) -> ConversationState:
+    with span("execute_tool"):
+        return _execute_tool(state)
+
+def _execute_tool(state: ConversationState) -> ConversationState:
     print("---NODE: EXECUTE_TOOL---")
     
     # Get the last reasoning step from current turn actions
     current_actions = state.get('current_turn_actions', [])
-    reasoning_actions = [action for action in current_actions if action['action_type'] == 'llm_reasoning']
+    reasoning_actions = [action for action in current_actions if action.kind == 'llm_reasoning']
     
     if not reasoning_actions:
         TurnManager.add_action_to_current_turn(
             state,
             action_type="error", 
-            details={"error": "No reasoning output found to parse"}
+            text="No reasoning output found to parse"
         )
         return state
     
-    last_reasoning = reasoning_actions[-1]['details']['reasoning_output']
+    last_reasoning = reasoning_actions[-1].text
     
     try:
-        action_json = json.loads(last_reasoning.split('```json\n')[-1].split('```')[0])
+        action_json = parse_reasoning_output(last_reasoning)
         action = action_json.get('action', {})
         thought = action_json.get('thought', '')
     except json.JSONDecodeError:
         TurnManager.add_action_to_current_turn(
             state,
             action_type="error",
-            details={"error": "Failed to parse action JSON from LLM reasoning"}
+            text="Failed to parse action JSON from LLM reasoning"
         )
         return state
 
     tool = action.get("tool")
-    
-    # HIERARCHICAL SEARCH IMPLEMENTATION WITH TURN TRACKING
-    if tool == "search_company_case_studies":
-        keywords = action.get("keywords", "")
-        result = search_company_case_studies(keywords)
-        print(f"Case Studies Result: {result}")
-        
-        TurnManager.add_action_to_current_turn(
-            state,
-            action_type="tool_execution",
-            details={
-                "tool": "search_company_case_studies",
-                "keywords": keywords,
-                "result": result,
-                "thought": thought
-            }
-        )
-        state['retrieved_docs'].append(f"[CASE STUDIES] {result}")
-        
-    elif tool == "search_technical_capabilities":
-        keywords = action.get("keywords", "")
-        result = search_technical_capabilities(keywords)
-        print(f"Technical Capabilities Result: {result}")
-        
-        TurnManager.add_action_to_current_turn(
-            state,
-            action_type="tool_execution", 
-            details={
-                "tool": "search_technical_capabilities",
-                "keywords": keywords,
-                "result": result,
-                "thought": thought
-            }
-        )
-        state['retrieved_docs'].append(f"[TECHNICAL] {result}")
-        
-    elif tool == "search_pricing_models":
-        keywords = action.get("keywords", "")
-        result = search_pricing_models(keywords)
-        print(f"Pricing Models Result: {result}")
-        
-        TurnManager.add_action_to_current_turn(
-            state,
-            action_type="tool_execution",
-            details={
-                "tool": "search_pricing_models", 
-                "keywords": keywords,
-                "result": result,
-                "thought": thought
-            }
-        )
-        state['retrieved_docs'].append(f"[PRICING] {result}")
+    spec = get_tool(tool)
 
-    elif tool == "search_company_profile":
-        keywords = action.get("keywords", "")
-        result = search_company_profile(keywords)
-        print(f"Company Profile Result: {result}")
-        
+    if spec is None:
         TurnManager.add_action_to_current_turn(
             state,
-            action_type="tool_execution",
-            details={
-                "tool": "search_company_profile",
-                "keywords": keywords,
-                "result": result,
-                "thought": thought
-            }
-        )
-        state['retrieved_docs'].append(f"[COMPANY PROFILE] {result}")
-    
-    elif tool == "search_knowledge_base":
-        query = action.get("query", "")
-        result = search_knowledge_base(query)
-        print(f"Knowledge Base Result: {result}")
-        
-        TurnManager.add_action_to_current_turn(
-            state,
-            action_type="tool_execution",
-            details={
-                "tool": "search_knowledge_base",
-                "query": query,
-                "result": result, 
-                "thought": thought
-            }
+            action_type="error",
+            text=f"Unknown tool '{tool}'",
+            thought=thought
         )
-        state['retrieved_docs'].append(f"[GENERAL KB] {result}")
-        
-    elif tool == "update_conversation_context":
-        stage = action.get("stage", "discovery")
-        signals = action.get("signals", [])
-        qualification_updates = action.get("qualification_updates", {})
-        
-        context_result = update_conversation_context(state, stage, signals, qualification_updates)
-        
+        return state
+
+    report_progress(tool=tool)
+    outcome = run_tool(spec, state, action)
+    print(f"{tool}: {'ERROR ' + outcome.error if outcome.error else f'{len(outcome.result)} chars'} in {outcome.elapsed * 1000:.0f} ms")
+
+    if outcome.error:
         TurnManager.add_action_to_current_turn(
             state,
-            action_type="context_update",
-            details={
-                "tool": "update_conversation_context",
-                "stage": stage,
-                "signals": signals,
-                "qualification_updates": qualification_updates,
-                "result": context_result,
-                "thought": thought
-            }
+            action_type="error",
+            text=outcome.error, tool=tool, args=outcome.args, thought=thought
         )
-        
-    else:
+        return state
+
+    if not spec.result_tag:
         TurnManager.add_action_to_current_turn(
             state,
-            action_type="error",
-            details={
-                "error": f"Unknown tool '{tool}'",
-                "thought": thought
-            }
+            action_type=spec.action_type,
+            text=outcome.result, tool=tool, args=outcome.args, thought=thought
         )
+        return state
 
-    return state
\ No newline at end of file
+    # Retrieved text is stored once; the action and retrieved_docs reference it by id
+    result_id = TurnManager.record_tool_result(state, spec.result_tag, tool, outcome.result)
+    TurnManager.add_action_to_current_turn(
+        state,
+        action_type=spec.action_type,
+        tool=tool, args=outcome.args, result_id=result_id, thought=thought
+    )
+    if result_id not in state['retrieved_docs']:
+        state['retrieved_docs'].append(result_id)
+
+    return state
@@ -1,5 +1,7 @@
 from agent.state import ConversationState
 from agent.services.turn_manager import TurnManager
+from agent.services.turn_records import iter_retrieved_docs, render_action
+from agent.services.similar_leads import format_precedents
 
 def get_system_persona() -> str:
     """Defines the agent's core identity."""
@@ -33,6 +35,9 @@ def get_opening_prompt(state: ConversationState) -> str:
     company_section = f"## COMPANY DATA ##\n{company!r}"
     lead_section = f"## LEAD DATA ##\n{lead!r}"
     memory_section = f"## PAST MEMORY ##\n{memory!r}" if memory else "## PAST MEMORY ##\nNone"
+    if state.get('precedents'):
+        memory_section += ("\n## PRECEDENTS (similar leads, for inspiration only; never mention them) ##\n"
+                           f"{format_precedents(state['precedents'])}")
 
     # Build message list for Gemini LLM
     prompt = [
@@ -80,14 +85,14 @@ def get_reasoning_prompt(state: ConversationState) -> str:
     # Retrieved Docs
     if state.get('retrieved_docs'):
         prompt.append("\n### RETRIEVED KNOWLEDGE BASE INFO:")
-        for doc in state['retrieved_docs']:
+        for doc in iter_retrieved_docs(state):
             prompt.append(f"- {doc}")
 
     # Actions for Current Turn
     if state.get('current_turn_actions'):
         prompt.append("\n### CURRENT TURN ACTIONS:")
         for action in state['current_turn_actions']:
-            prompt.append(f"- {action}")
+            prompt.append(f"- {render_action(action, state.get('tool_results'))}")
 
     # Previous Turn Scratchpad
     if state.get('scratchpad'):
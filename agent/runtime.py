@@ -0,0 +1,136 @@
+# agent/runtime.py
+"""
+Warm-start runtime shared by the CLI, UI, voice loop and harnesses.
+
+    runtime = get_runtime()
+    runtime.warm()                       # compile graph, load indexes and clients once
+    agent_api = runtime.session(lead_id)  # cheap per-lead session on the shared graph
+
+`prefork_pool(workers)` warms the parent and forks worker processes that
+share the warmed state copy-on-write (Linux/macOS only).
+"""
+import gc
+import multiprocessing
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from agent.services.tracing import span
+
+
+def _warm_imports():
+    import agent.AgentAPI  # noqa: F401  (graph, nodes, LangChain/Gemini clients)
+    import vectorstores.create_knowledge_bases  # noqa: F401  (FAISS, BM25)
+
+def _warm_graph():
+    from agent.graph import get_agent_graph
+    get_agent_graph()
+
+def _warm_company_data():
+    from agent.AgentAPI import load_company_data
+    load_company_data()
+
+def _warm_llm_clients():
+    from agent.services.llm_service import get_embeddings, get_llm
+    get_llm()
+    get_embeddings()
+
+def _warm_vector_index():
+    from vectorstores.create_knowledge_bases import initialize_vector_knowledge
+    initialize_vector_knowledge()
+
+def _warm_json_indexes():
+    from vectorstores.create_knowledge_bases import initialize_json_knowledge
+    initialize_json_knowledge()
+
+
+# Phases a session can start without; searches load these on demand if still pending
+BACKGROUND_PHASES = {"vector_index", "json_indexes"}
+
+# (phase name, loader) in start-up order
+WARM_PHASES: List[Tuple[str, Callable[[], None]]] = [
+    ("imports", _warm_imports),
+    ("graph", _warm_graph),
+    ("company_data", _warm_company_data),
+    ("llm_clients", _warm_llm_clients),
+    ("vector_index", _warm_vector_index),
+    ("json_indexes", _warm_json_indexes),
+]
+
+
+class AgentRuntime:
+    """Process-wide warmed resources plus a factory for lightweight sessions."""
+
+    def __init__(self):
+        self.timings: Dict[str, float] = {}  # phase -> seconds
+        self.warmed = False
+        self._lock = threading.Lock()
+        self._background: Optional[threading.Thread] = None
+
+    def _run_phases(self, phases: List[Tuple[str, Callable[[], None]]]):
+        for phase, load in phases:
+            start = time.perf_counter()
+            with span("startup_phase", phase=phase):
+                load()
+            self.timings[phase] = time.perf_counter() - start
+
+    def warm(self, background_indexes: bool = False) -> Dict[str, float]:
+        """
+        Runs every warm-up phase once; later calls return the recorded timings.
+        With background_indexes the index phases load on a thread, so e.g. the
+        opening statement is generated while they load.
+        """
+        with self._lock:
+            if self.warmed:
+                return self.timings
+            deferred = [item for item in WARM_PHASES if background_indexes and item[0] in BACKGROUND_PHASES]
+            with span("startup"):
+                self._run_phases([item for item in WARM_PHASES if item not in deferred])
+            if deferred:
+                self._background = threading.Thread(target=self._run_phases, args=(deferred,),
+                                                    name="warm-indexes", daemon=True)
+                self._background.start()
+            self.warmed = True
+        print(f"---SERVICE: Runtime warmed in {self.format_timings()}"
+              f"{' (indexes loading in background)' if deferred else ''}---")
+        return self.timings
+
+    def wait_until_warm(self, timeout: Optional[float] = None) -> bool:
+        """Waits for background index loading, if any; True once everything is loaded."""
+        if self._background is not None:
+            self._background.join(timeout)
+            return not self._background.is_alive()
+        return self.warmed
+
+    def format_timings(self) -> str:
+        total = sum(self.timings.values())
+        phases = ", ".join(f"{phase} {seconds * 1000:.0f} ms" for phase, seconds in self.timings.items())
+        return f"{total * 1000:.0f} ms ({phases})"
+
+    def session(self, lead_id: str, thread_id: Optional[str] = None):
+        """A per-lead AgentAPI on the shared compiled graph."""
+        from agent.AgentAPI import AgentAPI
+        from agent.graph import get_agent_graph
+        return AgentAPI(lead_id=lead_id, thread_id=thread_id, app=get_agent_graph())
+
+    def prefork_pool(self, workers: int):
+        """
+        Warms this process, then forks `workers` processes that inherit the warmed
+        state. Objects are moved to the permanent GC generation first so collections
+        in the workers don't touch (and copy) the shared pages.
+        """
+        self.warm()
+        self.wait_until_warm()
+        gc.freeze()
+        return multiprocessing.get_context("fork").Pool(processes=workers)
+
+
+_runtime: Optional[AgentRuntime] = None
+_runtime_lock = threading.Lock()
+
+def get_runtime() -> AgentRuntime:
+    global _runtime
+    with _runtime_lock:
+        if _runtime is None:
+            _runtime = AgentRuntime()
+        return _runtime
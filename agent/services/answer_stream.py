@@ -0,0 +1,102 @@
+# agent/services/answer_stream.py
+"""
+Streams the agent's reply while the LLM is still generating it.
+
+Reasoning output is a ```json block whose action may carry the reply in an
+"answer" string. `AnswerExtractor` is fed the raw tokens and returns the
+newly decoded characters of that string as they arrive, so the UI can show
+the reply before the JSON is complete. Nodes emit the text (and progress
+events such as the tool being run) through the LangGraph custom stream when
+the caller asked for it:
+
+    for mode, chunk in app.stream(state, {"configurable": {..., "stream_answer": True}},
+                                  stream_mode=["custom", "values"]):
+        if mode == "custom" and chunk.get("type") == ANSWER_DELTA:
+            print(chunk["text"], end="")
+"""
+import json
+import re
+from typing import Callable, Optional
+
+from langgraph.config import get_config, get_stream_writer
+
+ANSWER_DELTA = "answer_delta"
+PROGRESS = "progress"
+
+# The opening quote of the key must not itself be escaped (i.e. inside another string)
+_ANSWER_KEY = re.compile(r'(?<!\\)"answer"\s*:\s*"')
+_ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+
+
+class AnswerExtractor:
+    """Incrementally decodes the "answer" string value out of streamed reasoning JSON."""
+
+    def __init__(self):
+        self.buffer = ""
+        self.pos = None  # index of the next undecoded answer character
+        self.done = False
+
+    def feed(self, token: str) -> str:
+        """Adds a token; returns the answer text decoded from it (possibly empty)."""
+        self.buffer += token
+        if self.done:
+            return ""
+        if self.pos is None:
+            match = _ANSWER_KEY.search(self.buffer)
+            if not match:
+                return ""
+            self.pos = match.end()
+
+        out = []
+        buffer, pos = self.buffer, self.pos
+        while pos < len(buffer):
+            char = buffer[pos]
+            if char == '"':
+                self.done = True
+                break
+            if char != '\\':
+                out.append(char)
+                pos += 1
+                continue
+            # Escape sequence; wait for the rest of it if it is split across tokens
+            if pos + 1 >= len(buffer):
+                break
+            code = buffer[pos + 1]
+            if code == 'u':
+                # A high surrogate is decoded together with the low one that follows it
+                width = 12 if buffer[pos + 2:pos + 4].lower() in ("d8", "d9", "da", "db") else 6
+                if pos + width > len(buffer):
+                    break
+                try:
+                    out.append(json.loads(f'"{buffer[pos:pos + width]}"'))
+                except ValueError:
+                    pass
+                pos += width
+            else:
+                out.append(_ESCAPES.get(code, code))
+                pos += 2
+        self.pos = pos
+        return "".join(out)
+
+
+def _streaming() -> bool:
+    """True inside a graph run whose caller asked for streamed answers."""
+    try:
+        config = get_config()
+    except RuntimeError:
+        return False
+    return bool(config.get("configurable", {}).get("stream_answer"))
+
+
+def get_answer_writer() -> Optional[Callable[[str], None]]:
+    """Writer for reply text when the current graph run streams answers (else None)."""
+    if not _streaming():
+        return None
+    writer = get_stream_writer()
+    return lambda text: writer({"type": ANSWER_DELTA, "text": text}) if text else None
+
+
+def report_progress(**event):
+    """Emits a progress event (e.g. tool=name) when the current graph run streams answers."""
+    if _streaming():
+        get_stream_writer()({"type": PROGRESS, "event": event})
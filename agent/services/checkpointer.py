@@ -0,0 +1,391 @@
+# agent/services/checkpointer.py
+"""
+SQLite-backed LangGraph checkpointer.
+
+Nodes return the whole ConversationState, so every super-step bumps every
+channel version even when most values are unchanged. Channel values and
+pending writes are therefore stored content-addressed: each serialized value
+is hashed and written to `blob_data` once, and checkpoints only reference the
+hashes. A turn that appends one message writes that channel (plus the small
+turn-tracking ones) instead of a full copy of the state.
+
+Values are msgpack-serialized by LangGraph's serializer and zlib-compressed
+above COMPRESS_MIN_BYTES.
+"""
+import hashlib
+import os
+import random
+import sqlite3
+import threading
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+
+CHECKPOINT_DB = os.getenv("CHECKPOINT_DB", "data/checkpoints.sqlite")
+CHECKPOINT_HISTORY = int(os.getenv("CHECKPOINT_HISTORY", "20"))  # Checkpoints kept per thread (0 = all)
+COMPRESS_MIN_BYTES = 1024
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    parent_checkpoint_id TEXT,
+    type TEXT,
+    checkpoint BLOB,
+    metadata_type TEXT,
+    metadata BLOB,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+);
+CREATE TABLE IF NOT EXISTS blobs (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    channel TEXT NOT NULL,
+    version TEXT NOT NULL,
+    hash TEXT,
+    PRIMARY KEY (thread_id, checkpoint_ns, channel, version)
+);
+CREATE TABLE IF NOT EXISTS writes (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    channel TEXT NOT NULL,
+    hash TEXT NOT NULL,
+    task_path TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+);
+CREATE TABLE IF NOT EXISTS blob_data (
+    hash TEXT PRIMARY KEY,
+    type TEXT NOT NULL,
+    data BLOB
+);
+"""
+
+
+def _thread_config(thread_id: str, checkpoint_ns: str, checkpoint_id: str) -> RunnableConfig:
+    return {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint_id}}
+
+
+class SQLiteCheckpointSaver(BaseCheckpointSaver[str]):
+    """Durable checkpointer for `create_agent_graph`, safe to share across threads."""
+
+    def __init__(self, path: str = CHECKPOINT_DB, history: int = CHECKPOINT_HISTORY, serde=None):
+        super().__init__(serde=serde)
+        self.path = path
+        self.history = history
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._connect()
+
+    def _connect(self):
+        """Opens the connection; also called in forked workers, which must not share the parent's."""
+        self.conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    # --- serialization ---
+
+    def _dump(self, value: Any) -> Tuple[str, str, bytes]:
+        """Serializes a value; returns (hash, type, data)."""
+        type_, data = self.serde.dumps_typed(value)
+        if data and len(data) >= COMPRESS_MIN_BYTES:
+            type_, data = f"{type_}+zlib", zlib.compress(data, 1)
+        return hashlib.blake2b(type_.encode() + b"\0" + (data or b""), digest_size=16).hexdigest(), type_, data
+
+    def _load(self, type_: str, data: bytes) -> Any:
+        if type_.endswith("+zlib"):
+            type_, data = type_[:-5], zlib.decompress(data)
+        return self.serde.loads_typed((type_, data))
+
+    def _store_blob(self, value: Any) -> str:
+        blob_hash, type_, data = self._dump(value)
+        self.conn.execute("INSERT OR IGNORE INTO blob_data (hash, type, data) VALUES (?, ?, ?)",
+                          (blob_hash, type_, data))
+        return blob_hash
+
+    # --- reads ---
+
+    def _load_channel_values(self, thread_id: str, checkpoint_ns: str, versions: ChannelVersions) -> Dict[str, Any]:
+        if not versions:
+            return {}
+        pairs = [item for channel_version in versions.items() for item in channel_version]
+        rows = self.conn.execute(
+            "SELECT b.channel, d.type, d.data FROM blobs b JOIN blob_data d ON d.hash = b.hash "
+            "WHERE b.thread_id = ? AND b.checkpoint_ns = ? "
+            f"AND (b.channel, b.version) IN (VALUES {','.join(['(?, ?)'] * len(versions))})",
+            (thread_id, checkpoint_ns, *pairs),
+        ).fetchall()
+        return {channel: self._load(type_, data) for channel, type_, data in rows}
+
+    def _load_writes(self, thread_id: str, checkpoint_ns: str, checkpoint_id: str) -> List[Tuple[str, str, Any]]:
+        rows = self.conn.execute(
+            "SELECT w.task_id, w.channel, d.type, d.data FROM writes w JOIN blob_data d ON d.hash = w.hash "
+            "WHERE w.thread_id = ? AND w.checkpoint_ns = ? AND w.checkpoint_id = ? ORDER BY w.task_id, w.idx",
+            (thread_id, checkpoint_ns, checkpoint_id),
+        ).fetchall()
+        return [(task_id, channel, self._load(type_, data)) for task_id, channel, type_, data in rows]
+
+    def _build_tuple(self, thread_id: str, checkpoint_ns: str, row) -> CheckpointTuple:
+        checkpoint_id, parent_id, type_, checkpoint_data, metadata_type, metadata_data = row
+        checkpoint = self._load(type_, checkpoint_data)
+        return CheckpointTuple(
+            config=_thread_config(thread_id, checkpoint_ns, checkpoint_id),
+            checkpoint={
+                **checkpoint,
+                "channel_values": self._load_channel_values(thread_id, checkpoint_ns, checkpoint["channel_versions"]),
+            },
+            metadata=self._load(metadata_type, metadata_data),
+            parent_config=_thread_config(thread_id, checkpoint_ns, parent_id) if parent_id else None,
+            pending_writes=self._load_writes(thread_id, checkpoint_ns, checkpoint_id),
+        )
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        columns = "checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata_type, metadata"
+        with self._lock:
+            if checkpoint_id := get_checkpoint_id(config):
+                row = self.conn.execute(
+                    f"SELECT {columns} FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                    (thread_id, checkpoint_ns, checkpoint_id),
+                ).fetchone()
+            else:
+                row = self.conn.execute(
+                    f"SELECT {columns} FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+                    "ORDER BY checkpoint_id DESC LIMIT 1",
+                    (thread_id, checkpoint_ns),
+                ).fetchone()
+            return self._build_tuple(thread_id, checkpoint_ns, row) if row else None
+
+    def list(self, config: Optional[RunnableConfig], *, filter: Optional[Dict[str, Any]] = None,
+             before: Optional[RunnableConfig] = None, limit: Optional[int] = None) -> Iterator[CheckpointTuple]:
+        query = ("SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, "
+                 "metadata_type, metadata FROM checkpoints")
+        clauses, params = [], []
+        if config:
+            clauses.append("thread_id = ?")
+            params.append(config["configurable"]["thread_id"])
+            if (checkpoint_ns := config["configurable"].get("checkpoint_ns")) is not None:
+                clauses.append("checkpoint_ns = ?")
+                params.append(checkpoint_ns)
+            if checkpoint_id := get_checkpoint_id(config):
+                clauses.append("checkpoint_id = ?")
+                params.append(checkpoint_id)
+        if before and (before_id := get_checkpoint_id(before)):
+            clauses.append("checkpoint_id < ?")
+            params.append(before_id)
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY checkpoint_id DESC"
+
+        with self._lock:
+            rows = self.conn.execute(query, params).fetchall()
+        for thread_id, checkpoint_ns, *row in rows:
+            if limit is not None and limit <= 0:
+                break
+            with self._lock:
+                checkpoint_tuple = self._build_tuple(thread_id, checkpoint_ns, row)
+            if filter and not all(checkpoint_tuple.metadata.get(k) == v for k, v in filter.items()):
+                continue
+            if limit is not None:
+                limit -= 1
+            yield checkpoint_tuple
+
+    # --- writes ---
+
+    def put(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+            new_versions: ChannelVersions) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_copy = checkpoint.copy()
+        values = checkpoint_copy.pop("channel_values")
+
+        with self._lock:
+            self.conn.execute("BEGIN")
+            try:
+                for channel, version in new_versions.items():
+                    blob_hash = self._store_blob(values[channel]) if channel in values else None
+                    self.conn.execute(
+                        "INSERT OR REPLACE INTO blobs (thread_id, checkpoint_ns, channel, version, hash) VALUES (?, ?, ?, ?, ?)",
+                        (thread_id, checkpoint_ns, channel, version, blob_hash),
+                    )
+                type_, checkpoint_data = self._dump(checkpoint_copy)[1:]
+                metadata_type, metadata_data = self._dump(get_checkpoint_metadata(config, metadata))[1:]
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO checkpoints (thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, "
+                    "type, checkpoint, metadata_type, metadata) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (thread_id, checkpoint_ns, checkpoint["id"], config["configurable"].get("checkpoint_id"),
+                     type_, checkpoint_data, metadata_type, metadata_data),
+                )
+                if self.history:
+                    self._prune(thread_id, checkpoint_ns)
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        return _thread_config(thread_id, checkpoint_ns, checkpoint["id"])
+
+    def put_writes(self, config: RunnableConfig, writes: Sequence[Tuple[str, Any]], task_id: str,
+                   task_path: str = "") -> None:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        # Special writes (errors, interrupts) have fixed negative indices and replace earlier ones
+        verb = "INSERT OR REPLACE" if all(channel in WRITES_IDX_MAP for channel, _ in writes) else "INSERT OR IGNORE"
+        with self._lock:
+            self.conn.execute("BEGIN")
+            try:
+                for idx, (channel, value) in enumerate(writes):
+                    self.conn.execute(
+                        f"{verb} INTO writes (thread_id, checkpoint_ns, checkpoint_id, task_id, idx, channel, hash, task_path) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        (thread_id, checkpoint_ns, checkpoint_id, task_id, WRITES_IDX_MAP.get(channel, idx),
+                         channel, self._store_blob(value), task_path),
+                    )
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    def _prune(self, thread_id: str, checkpoint_ns: str):
+        """Drops checkpoints (and their writes / channel versions) beyond the newest `history`."""
+        stale = [row[0] for row in self.conn.execute(
+            "SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+            "ORDER BY checkpoint_id DESC LIMIT -1 OFFSET ?",
+            (thread_id, checkpoint_ns, self.history),
+        )]
+        if not stale:
+            return
+        marks = ",".join("?" * len(stale))
+        self.conn.execute(f"DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id IN ({marks})",
+                          (thread_id, checkpoint_ns, *stale))
+        self.conn.execute(f"DELETE FROM writes WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id IN ({marks})",
+                          (thread_id, checkpoint_ns, *stale))
+
+        # Channel versions older than what the oldest remaining checkpoint points at are unreachable
+        type_, data = self.conn.execute(
+            "SELECT type, checkpoint FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+            "ORDER BY checkpoint_id ASC LIMIT 1",
+            (thread_id, checkpoint_ns),
+        ).fetchone()
+        for channel, version in self._load(type_, data)["channel_versions"].items():
+            self.conn.execute(
+                "DELETE FROM blobs WHERE thread_id = ? AND checkpoint_ns = ? AND channel = ? AND version < ?",
+                (thread_id, checkpoint_ns, channel, version),
+            )
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock:
+            self.conn.execute("BEGIN")
+            try:
+                for table in ("checkpoints", "blobs", "writes"):
+                    self.conn.execute(f"DELETE FROM {table} WHERE thread_id = ?", (thread_id,))
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    def rewind(self, thread_id: str, checkpoint_id: Optional[str], checkpoint_ns: str = "") -> None:
+        """Drops what a thread recorded after `checkpoint_id` (everything, if None), making it the latest again."""
+        if checkpoint_id is None:
+            self.delete_thread(thread_id)
+            return
+        with self._lock:
+            self.conn.execute("BEGIN")
+            try:
+                for table in ("checkpoints", "writes"):
+                    self.conn.execute(
+                        f"DELETE FROM {table} WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id > ?",
+                        (thread_id, checkpoint_ns, checkpoint_id),
+                    )
+                # Channel versions newer than the restored checkpoint's were only reachable from the dropped ones
+                row = self.conn.execute(
+                    "SELECT type, checkpoint FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                    (thread_id, checkpoint_ns, checkpoint_id),
+                ).fetchone()
+                if row:
+                    for channel, version in self._load(*row)["channel_versions"].items():
+                        self.conn.execute(
+                            "DELETE FROM blobs WHERE thread_id = ? AND checkpoint_ns = ? AND channel = ? AND version > ?",
+                            (thread_id, checkpoint_ns, channel, version),
+                        )
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    def vacuum(self) -> int:
+        """Deletes blob data no longer referenced by any thread; returns the number of rows removed."""
+        with self._lock:
+            cursor = self.conn.execute(
+                "DELETE FROM blob_data WHERE hash NOT IN (SELECT hash FROM blobs WHERE hash IS NOT NULL) "
+                "AND hash NOT IN (SELECT hash FROM writes)"
+            )
+            return cursor.rowcount
+
+    def get_next_version(self, current: Optional[str], channel: None) -> str:
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        return f"{current_v + 1:032}.{random.random():016}"
+
+    # --- async API (the graph is only invoked synchronously) ---
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return self.get_tuple(config)
+
+    async def alist(self, config: Optional[RunnableConfig], *, filter: Optional[Dict[str, Any]] = None,
+                    before: Optional[RunnableConfig] = None, limit: Optional[int] = None):
+        for item in self.list(config, filter=filter, before=before, limit=limit):
+            yield item
+
+    async def aput(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+                   new_versions: ChannelVersions) -> RunnableConfig:
+        return self.put(config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config: RunnableConfig, writes: Sequence[Tuple[str, Any]], task_id: str,
+                          task_path: str = "") -> None:
+        return self.put_writes(config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        return self.delete_thread(thread_id)
+
+
+_checkpointer: Optional[SQLiteCheckpointSaver] = None
+_checkpointer_lock = threading.Lock()
+
+def get_checkpointer() -> SQLiteCheckpointSaver:
+    """Process-wide checkpointer (created on first use)."""
+    global _checkpointer
+    with _checkpointer_lock:
+        if _checkpointer is None:
+            _checkpointer = SQLiteCheckpointSaver()
+            print(f"---SERVICE: Checkpoints stored in {_checkpointer.path}---")
+        return _checkpointer
+
+
+def _reconnect_after_fork():
+    if _checkpointer is not None:
+        _checkpointer._connect()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reconnect_after_fork)
@@ -0,0 +1,148 @@
+# agent/services/conversation_digest.py
+import re
+from typing import Any, Dict, List, Optional
+from agent.state import ConversationState
+from agent.services.turn_records import TurnRecord
+
+# Bounds that keep the digest (and the finalization prompt) constant-size
+MAX_FACTS = 20
+MAX_QUESTIONS = 10
+MAX_SIGNALS = 15
+MAX_DOCS = 25
+RECENT_EXCHANGES = 4      # Turns kept verbatim
+MAX_SUMMARY_LINES = 12    # Older turns kept as one-line summaries
+SNIPPET_CHARS = 160
+
+# Lead statements containing these are kept as facts (qualification data)
+FACT_KEYWORDS = [
+    "budget", "$", "cost", "timeline", "deadline", "month", "quarter", "year", "week",
+    "team", "we use", "we have", "using", "currently", "decision", "approve", "ceo", "board",
+    "employees", "users", "patients", "customers", "integrat", "legacy", "migrat", "vendor",
+]
+
+
+def new_digest() -> Dict[str, Any]:
+    return {
+        "turns": 0,
+        "stage": None,
+        "qualification": {},
+        "facts": [],
+        "questions": [],
+        "buying_signals": [],
+        "objections": [],
+        "docs": {},               # result_id -> {tool, query, preview}
+        "transcript_summary": [],  # one line per older turn
+        "elided_turns": 0,
+        "recent_exchanges": [],    # last RECENT_EXCHANGES turns verbatim
+    }
+
+
+def _snippet(text: str, limit: int = SNIPPET_CHARS) -> str:
+    text = " ".join(str(text).split())
+    return text if len(text) <= limit else text[:limit - 3] + "..."
+
+
+def _add_unique(items: List[str], value: str, limit: int):
+    """Appends value unless an equivalent (case/whitespace-insensitive) entry exists; drops the oldest past limit."""
+    key = " ".join(value.lower().split())
+    if not key or any(" ".join(item.lower().split()) == key for item in items):
+        return
+    items.append(value)
+    del items[:max(0, len(items) - limit)]
+
+
+def _sentences(text: str) -> List[str]:
+    return [s.strip() for s in re.split(r"(?<=[.!?])\s+", text or "") if s.strip()]
+
+
+def update_digest(state: ConversationState, turn_entry: TurnRecord) -> Dict[str, Any]:
+    """Folds a finished turn into state['digest']; cost is bounded by the turn, not the call."""
+    digest = state.get('digest') or new_digest()
+    digest['turns'] += 1
+
+    # Conversation intelligence tracked on the state
+    digest['stage'] = state.get('conversation_stage') or digest['stage']
+    digest['qualification'] = dict(state.get('lead_qualification_score') or digest['qualification'])
+    for signal in state.get('buying_signals_detected') or []:
+        _add_unique(digest['buying_signals'], _snippet(signal), MAX_SIGNALS)
+    for objection in state.get('detected_objections') or []:
+        _add_unique(digest['objections'], _snippet(objection), MAX_SIGNALS)
+
+    # Facts and questions from what the lead said this turn
+    user_query = turn_entry.user_query or ''
+    for sentence in _sentences(user_query):
+        lowered = sentence.lower()
+        if sentence.endswith('?'):
+            _add_unique(digest['questions'], _snippet(sentence), MAX_QUESTIONS)
+        elif any(keyword in lowered for keyword in FACT_KEYWORDS):
+            _add_unique(digest['facts'], _snippet(sentence), MAX_FACTS)
+
+    # Documents are referenced by result id; the text itself stays in state['tool_results']
+    results = state.get('tool_results') or {}
+    for action in turn_entry.actions:
+        if action.kind != 'tool_execution' or action.result_id not in results:
+            continue
+        doc_id = action.result_id
+        if doc_id not in digest['docs']:
+            args = action.args or {}
+            digest['docs'][doc_id] = {
+                "tool": action.tool or '',
+                "query": _snippet(args.get('keywords') or args.get('query') or '', 80),
+                "preview": _snippet(results[doc_id].text),
+            }
+            for stale in list(digest['docs'])[:max(0, len(digest['docs']) - MAX_DOCS)]:
+                del digest['docs'][stale]
+
+    # Bounded transcript: recent turns verbatim, older ones as single lines
+    digest['recent_exchanges'].append({
+        "turn": turn_entry.number or digest['turns'],
+        "lead": user_query,
+        "agent": turn_entry.final_response,
+    })
+    while len(digest['recent_exchanges']) > RECENT_EXCHANGES:
+        old = digest['recent_exchanges'].pop(0)
+        lead_part = f"Lead: {_snippet(old['lead'], 80)} | " if old['lead'] else ""
+        digest['transcript_summary'].append(f"Turn {old['turn']}: {lead_part}Agent: {_snippet(old['agent'], 80)}")
+        if len(digest['transcript_summary']) > MAX_SUMMARY_LINES:
+            digest['transcript_summary'].pop(0)
+            digest['elided_turns'] += 1
+
+    state['digest'] = digest
+    return digest
+
+
+def format_digest(digest: Optional[Dict[str, Any]]) -> str:
+    """Renders the digest as report sections for the finalization prompt."""
+    if not digest:
+        return "No conversation digest recorded."
+
+    report = [f"Turns: {digest['turns']} | Stage reached: {digest.get('stage') or 'unknown'}"]
+    if digest['qualification']:
+        report.append(f"Qualification score: {digest['qualification']}")
+
+    sections = [
+        ("Facts stated by the lead", digest['facts']),
+        ("Questions asked by the lead", digest['questions']),
+        ("Buying signals", digest['buying_signals']),
+        ("Objections", digest['objections']),
+    ]
+    for title, items in sections:
+        if items:
+            report.append(f"\n--- {title} ---")
+            report.extend(f"- {item}" for item in items)
+
+    if digest['docs']:
+        report.append("\n--- Documents Referenced ---")
+        for doc_id, doc in digest['docs'].items():
+            report.append(f"- [{doc_id}] {doc['tool']} ({doc['query']}): {doc['preview']}")
+
+    report.append("\n--- Conversation Transcript (condensed) ---")
+    if digest['elided_turns']:
+        report.append(f"({digest['elided_turns']} earlier turns omitted)")
+    report.extend(digest['transcript_summary'])
+    for exchange in digest['recent_exchanges']:
+        if exchange['lead']:
+            report.append(f"Lead: {exchange['lead']}")
+        report.append(f"Agent: {exchange['agent']}")
+
+    return "\n".join(report)
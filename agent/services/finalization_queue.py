@@ -0,0 +1,134 @@
+# agent/services/finalization_queue.py
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+FINALIZATION_WORKERS = int(os.getenv("FINALIZATION_WORKERS", "2"))
+FINALIZATION_RETRIES = int(os.getenv("FINALIZATION_RETRIES", "3"))
+FINALIZATION_BACKOFF = float(os.getenv("FINALIZATION_BACKOFF", "1.0"))
+MAX_FINISHED_JOBS = 1000  # Finished job statuses kept around for polling
+
+
+class FinalizationJob:
+    """Status of one background finalization (memory synthesis + persistence)."""
+
+    def __init__(self, lead_id: str):
+        self.id = uuid.uuid4().hex[:12]
+        self.lead_id = lead_id
+        self.status = "pending"  # pending -> running -> done | failed
+        self.attempts = 0
+        self.error: Optional[str] = None
+        self.result: Any = None
+        self.submitted_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.done = threading.Event()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "lead_id": self.lead_id,
+            "status": self.status,
+            "attempts": self.attempts,
+            "error": self.error,
+            "duration": (self.finished_at - self.submitted_at) if self.finished_at else None,
+        }
+
+
+class FinalizationQueue:
+    """Worker pool that runs finalization jobs off the request path."""
+
+    def __init__(self, max_workers: int = FINALIZATION_WORKERS):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="finalize")
+        self._jobs: Dict[str, FinalizationJob] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, lead_id: str, fn: Callable[[FinalizationJob], Any]) -> str:
+        """Queue `fn(job)` and return the job id immediately."""
+        job = FinalizationJob(lead_id)
+        with self._lock:
+            self._prune_finished()
+            self._jobs[job.id] = job
+        self._executor.submit(self._run, job, fn)
+        print(f"---SERVICE: Finalization job {job.id} queued for {lead_id}---")
+        return job.id
+
+    def _prune_finished(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.done.is_set()]
+        for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self._jobs[job_id]
+
+    def _run(self, job: FinalizationJob, fn: Callable[[FinalizationJob], Any]):
+        job.status = "running"
+        try:
+            job.result = fn(job)
+            job.status = "done"
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e)
+            print(f"---SERVICE: Finalization job {job.id} failed for {job.lead_id}: {e}---")
+        finally:
+            job.finished_at = time.time()
+            job.done.set()
+
+    def get_status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = self._jobs.get(job_id)
+        return job.to_dict() if job else None
+
+    def wait(self, job_id: str, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Block until the job finishes (or timeout) and return its status."""
+        job = self._jobs.get(job_id)
+        if job is None:
+            return None
+        job.done.wait(timeout)
+        return job.to_dict()
+
+    def wait_all(self, timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+        deadline = None if timeout is None else time.time() + timeout
+        with self._lock:
+            jobs = list(self._jobs.values())
+        for job in jobs:
+            job.done.wait(None if deadline is None else max(0.0, deadline - time.time()))
+        return [job.to_dict() for job in jobs]
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return sum(1 for job in self._jobs.values() if not job.done.is_set())
+
+
+def run_with_retries(job: FinalizationJob, fn: Callable, *args,
+                     retries: int = FINALIZATION_RETRIES, backoff: float = FINALIZATION_BACKOFF):
+    """Call fn(*args), retrying with exponential backoff; re-raises after the last attempt."""
+    for attempt in range(1, retries + 1):
+        job.attempts += 1
+        try:
+            return fn(*args)
+        except Exception as e:
+            if attempt == retries:
+                raise
+            delay = backoff * (2 ** (attempt - 1))
+            print(f"---SERVICE: {fn.__name__} failed for {job.lead_id} ({e}), retrying in {delay:.1f}s---")
+            time.sleep(delay)
+
+
+_queue: Optional[FinalizationQueue] = None
+_queue_lock = threading.Lock()
+
+def get_finalization_queue() -> FinalizationQueue:
+    """Process-wide finalization queue (created on first use)."""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = FinalizationQueue()
+        return _queue
+
+
+def _reset_after_fork():
+    # Forked workers start their own queue (the parent's worker threads aren't copied)
+    global _queue, _queue_lock
+    _queue, _queue_lock = None, threading.Lock()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,65 @@
+# agent/services/json_delta.py
+"""
+Minimal structural deltas between JSON documents.
+
+A delta is {"set": [[path, value], ...], "del": [path, ...],
+"append": [[path, items], ...]} where a path is the list of dict keys leading
+to a value. Dicts are diffed key by key; a list that only grew at the end
+(objections, buying signals, next steps accumulating over calls) records the
+new items; any other changed value is replaced whole.
+
+    delta = diff(old, new)
+    assert apply(old, delta) == new
+"""
+import copy
+from typing import Any, Dict, List
+
+
+def diff(old: Any, new: Any, path: List[str] = None) -> Dict[str, list]:
+    """The delta turning `old` into `new`."""
+    path = path or []
+    delta = {"set": [], "del": [], "append": []}
+    if isinstance(old, dict) and isinstance(new, dict):
+        for key in old.keys() - new.keys():
+            delta["del"].append(path + [key])
+        for key, value in new.items():
+            if key not in old:
+                delta["set"].append([path + [key], value])
+            elif old[key] != value:
+                child = diff(old[key], value, path + [key])
+                for op in delta:
+                    delta[op] += child[op]
+    elif isinstance(old, list) and isinstance(new, list) and len(new) > len(old) and new[:len(old)] == old:
+        delta["append"].append([path, new[len(old):]])
+    elif old != new:
+        delta["set"].append([path, new])
+    return delta
+
+
+def apply(document: Any, delta: Dict[str, list]) -> Any:
+    """A copy of `document` with `delta` applied."""
+    document = copy.deepcopy(document)
+    for path in delta.get("del", []):
+        parent = document
+        for key in path[:-1]:
+            parent = parent[key]
+        parent.pop(path[-1], None)
+    for path, value in delta.get("set", []):
+        if not path:
+            document = copy.deepcopy(value)
+            continue
+        parent = document
+        for key in path[:-1]:
+            if not isinstance(parent.get(key), dict):
+                parent[key] = {}
+            parent = parent[key]
+        parent[path[-1]] = copy.deepcopy(value)
+    for path, items in delta.get("append", []):
+        if not path:
+            document.extend(copy.deepcopy(items))
+            continue
+        parent = document
+        for key in path[:-1]:
+            parent = parent[key]
+        parent[path[-1]].extend(copy.deepcopy(items))
+    return document
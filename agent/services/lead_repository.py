@@ -0,0 +1,179 @@
+# agent/services/lead_repository.py
+"""
+Read-through cache for lead data and long-term memory.
+
+    repo = get_lead_repository()
+    repo.get_lead(lead_id)          # from the lead store once per change
+    repo.search_leads("acme")       # paginated search, cached per query
+    repo.get_memory(lead_id)        # loaded from the memory store once per save
+
+Cached leads and query results are dropped when the lead store is written
+(change listener, or SQLite data_version for other processes) and the
+legacy leads file is re-imported when its mtime or size changes. Cached
+memories are dropped the same way when a lead's memory is saved. A
+Streamlit rerun with nothing changed therefore costs no parsing or queries.
+Returned dicts are shared: treat them as read-only.
+"""
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Tuple
+
+from agent.services import memory_manager
+from agent.services.lead_store import LEADS_FILE, Cursor, LeadPage, get_lead_store
+
+MAX_CACHED_QUERIES = 512
+
+
+class LeadRepository:
+    def __init__(self, leads_file: Path = LEADS_FILE):
+        self.leads_file = Path(leads_file)
+        self.store = get_lead_store()
+        self._lock = threading.Lock()
+        self._leads: Dict[str, Dict] = {}
+        self._queries: Dict[Tuple, object] = {}  # (kind, args) -> LeadPage or count
+        self._leads_file_fingerprint: Optional[Tuple[int, int]] = None  # (mtime_ns, size) last synced
+        self._seen_lead_version: Optional[int] = None
+        self._memories: Dict[str, Dict] = {}
+        self._generation = 0  # Bumped on every invalidation; loads that raced one are not cached
+        self._seen_version: Optional[int] = None  # Store data_version the cached memories were loaded at
+        self.stats = {"lead_hits": 0, "lead_misses": 0, "lead_invalidations": 0,
+                      "memory_hits": 0, "memory_misses": 0, "invalidations": 0}
+        self.store.add_change_listener(self.invalidate_leads)
+        memory_manager.add_change_listener(self.invalidate_memory)
+
+    # --- Leads ---
+
+    def _check_lead_changes(self):
+        try:
+            stat = self.leads_file.stat()
+            fingerprint = (stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            fingerprint = None
+        if fingerprint is not None and fingerprint != self._leads_file_fingerprint:
+            self.store.sync_json_file(self.leads_file)
+            self._leads_file_fingerprint = fingerprint
+        version = self.store.data_version()
+        if version != self._seen_lead_version:
+            self.invalidate_leads()
+            self._seen_lead_version = version
+
+    def get_lead(self, lead_id: str) -> Dict:
+        """The lead's record ({} if unknown)."""
+        self._check_lead_changes()
+        with self._lock:
+            if lead_id in self._leads:
+                self.stats["lead_hits"] += 1
+                return self._leads[lead_id]
+            self.stats["lead_misses"] += 1
+            generation = self._generation
+        lead = self.store.get(lead_id) or {}
+        with self._lock:
+            if generation == self._generation:
+                self._leads[lead_id] = lead
+        return lead
+
+    def _cached_query(self, key: Tuple, run):
+        self._check_lead_changes()
+        with self._lock:
+            if key in self._queries:
+                self.stats["lead_hits"] += 1
+                return self._queries[key]
+            self.stats["lead_misses"] += 1
+            generation = self._generation
+        result = run()
+        with self._lock:
+            if generation == self._generation:
+                if len(self._queries) >= MAX_CACHED_QUERIES:
+                    self._queries.clear()
+                self._queries[key] = result
+        return result
+
+    def search_leads(self, query: str = "", company: Optional[str] = None, role: Optional[str] = None,
+                     industry: Optional[str] = None, limit: int = 25, after: Optional[Cursor] = None) -> LeadPage:
+        """One page of leads matching a name/company/id prefix and filters (see LeadStore.search)."""
+        return self._cached_query(
+            ("search", query, company, role, industry, limit, after),
+            lambda: self.store.search(query, company=company, role=role, industry=industry, limit=limit, after=after))
+
+    def count_leads(self, query: str = "", company: Optional[str] = None, role: Optional[str] = None,
+                    industry: Optional[str] = None) -> int:
+        return self._cached_query(
+            ("count", query, company, role, industry),
+            lambda: self.store.count(query, company=company, role=role, industry=industry))
+
+    def lead_filter_values(self, field_name: str):
+        return self._cached_query(("values", field_name), lambda: self.store.distinct_values(field_name))
+
+    def iter_lead_ids(self) -> Iterator[str]:
+        self._check_lead_changes()
+        return self.store.iter_lead_ids()
+
+    def invalidate_leads(self):
+        with self._lock:
+            self._leads.clear()
+            self._queries.clear()
+            self._generation += 1
+            self.stats["lead_invalidations"] += 1
+
+    # --- Long-term memory ---
+
+    def _check_external_writes(self):
+        version = memory_manager.data_version()
+        if version != self._seen_version:
+            self.invalidate_memory()
+            self._seen_version = version
+
+    def get_memory(self, lead_id: str) -> Dict:
+        """The lead's long-term memory ({} if none), as returned by memory_manager.load_memory."""
+        self._check_external_writes()
+        with self._lock:
+            if lead_id in self._memories:
+                self.stats["memory_hits"] += 1
+                return self._memories[lead_id]
+            self.stats["memory_misses"] += 1
+            generation = self._generation
+        memory = memory_manager.load_memory(lead_id)
+        with self._lock:
+            if generation == self._generation:
+                self._memories[lead_id] = memory
+        return memory
+
+    def invalidate_memory(self, lead_id: Optional[str] = None):
+        """Drops one lead's cached memory, or all of them."""
+        with self._lock:
+            if lead_id is None:
+                self._memories.clear()
+            else:
+                self._memories.pop(lead_id, None)
+            self._generation += 1
+            self.stats["invalidations"] += 1
+
+    def reset_after_fork(self):
+        """The child's new store connections have their own data_version baselines, so start cold."""
+        self._lock = threading.Lock()
+        self._leads.clear()
+        self._queries.clear()
+        self._memories.clear()
+        self._generation += 1
+        self._seen_version = self._seen_lead_version = None
+
+
+_repository: Optional[LeadRepository] = None
+_repository_lock = threading.Lock()
+
+def get_lead_repository() -> LeadRepository:
+    """Process-wide lead repository (created on first use)."""
+    global _repository
+    with _repository_lock:
+        if _repository is None:
+            _repository = LeadRepository()
+        return _repository
+
+
+def _reset_after_fork():
+    if _repository is not None:
+        _repository.reset_after_fork()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,352 @@
+# agent/services/lead_store.py
+"""
+Indexed SQLite store for the lead book.
+
+Leads are rows keyed by lead_id, with the searchable fields (name, company,
+role, industry) in case-insensitive indexed columns and the full record as
+JSON. Lists are paginated with a (name, lead_id) keyset cursor, so any page
+of a 200k-lead book costs an index seek rather than loading the book:
+
+    page = get_lead_store().search("health", industry="Healthcare", limit=25)
+    next_page = get_lead_store().search("health", industry="Healthcare", after=page.next_cursor)
+
+Bulk loads stream CSV or JSONL files and validate them in chunks:
+
+    uv run import_leads.py leads.csv
+
+The legacy data/leads.json ({lead_id: record}) is imported on first use and
+again whenever the file changes; leads removed from the file are removed
+from the store (leads that came from bulk imports are left alone).
+"""
+import csv
+import json
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+LEADS_DB = os.getenv("LEADS_DB", "data/leads.sqlite")
+LEADS_FILE = Path(os.getenv("LEADS_FILE", "data/leads.json"))
+IMPORT_CHUNK_SIZE = int(os.getenv("LEADS_IMPORT_CHUNK_SIZE", "1000"))
+MAX_REPORTED_ERRORS = 100
+
+REQUIRED_FIELDS = ("name", "company")
+FILTER_FIELDS = ("company", "role", "industry")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS leads (
+    lead_id TEXT PRIMARY KEY,
+    name TEXT NOT NULL COLLATE NOCASE,
+    company TEXT NOT NULL COLLATE NOCASE,
+    role TEXT NOT NULL DEFAULT '' COLLATE NOCASE,
+    industry TEXT NOT NULL DEFAULT '' COLLATE NOCASE,
+    data TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS leads_by_name ON leads (name, lead_id);
+CREATE INDEX IF NOT EXISTS leads_by_company ON leads (company, name, lead_id);
+CREATE INDEX IF NOT EXISTS leads_by_role ON leads (role, name, lead_id);
+CREATE INDEX IF NOT EXISTS leads_by_industry ON leads (industry, name, lead_id);
+CREATE TABLE IF NOT EXISTS json_leads (
+    lead_id TEXT PRIMARY KEY
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+Cursor = Tuple[str, str]  # (name, lead_id) of the last lead on a page
+
+
+@dataclass
+class LeadPage:
+    leads: List[Dict]  # Records with their "lead_id"
+    next_cursor: Optional[Cursor]  # None on the last page
+
+
+@dataclass
+class ImportReport:
+    imported: int = 0
+    rejected: int = 0
+    removed: int = 0  # Leads deleted because the synced file no longer has them
+    errors: List[str] = field(default_factory=list)  # First MAX_REPORTED_ERRORS rejections
+
+    def __str__(self):
+        text = f"{self.imported} imported, {self.rejected} rejected"
+        return f"{text}, {self.removed} removed" if self.removed else text
+
+
+def validate_lead(raw: Dict) -> Tuple[str, Dict]:
+    """Returns (lead_id, record) with whitespace trimmed and empty values dropped; raises ValueError."""
+    if not isinstance(raw, dict):
+        raise ValueError("record is not an object")
+    record = {key.strip(): value.strip() if isinstance(value, str) else value
+              for key, value in raw.items() if key and value not in (None, "")}
+    lead_id = record.pop("lead_id", None) or record.pop("id", None)
+    if not lead_id or not isinstance(lead_id, str):
+        raise ValueError("missing lead_id")
+    for name in REQUIRED_FIELDS:
+        if not isinstance(record.get(name), str) or not record[name]:
+            raise ValueError(f"{lead_id}: missing {name}")
+    for name in FILTER_FIELDS:
+        if name in record and not isinstance(record[name], str):
+            raise ValueError(f"{lead_id}: {name} must be a string")
+    return lead_id, record
+
+
+def iter_lead_records(path: Path) -> Iterator[Tuple[int, Dict]]:
+    """Streams (line number, raw record) from a CSV, JSONL or legacy {lead_id: record} JSON file."""
+    path = Path(path)
+    suffix = path.suffix.lower()
+    if suffix == ".csv":
+        with open(path, newline='') as f:
+            for line_no, row in enumerate(csv.DictReader(f), start=2):
+                yield line_no, row
+    elif suffix in (".jsonl", ".ndjson"):
+        with open(path, 'r') as f:
+            for line_no, line in enumerate(f, start=1):
+                if line.strip():
+                    try:
+                        yield line_no, json.loads(line)
+                    except json.JSONDecodeError as e:
+                        yield line_no, {"__error__": f"invalid JSON ({e.msg})"}
+    elif suffix == ".json":
+        with open(path, 'r') as f:
+            content = f.read()
+        leads = json.loads(content) if content else {}
+        items = leads.items() if isinstance(leads, dict) else enumerate(leads)
+        for index, (key, record) in enumerate(items, start=1):
+            if isinstance(leads, dict) and isinstance(record, dict):
+                record = {"lead_id": key, **record}
+            yield index, record
+    else:
+        raise ValueError(f"Unsupported lead file type: {path.suffix} (expected .csv, .jsonl or .json)")
+
+
+class LeadStore:
+    """Lead book in SQLite, safe to share across threads."""
+
+    def __init__(self, path: str = LEADS_DB):
+        self.path = path
+        self._listeners: List[Callable[[], None]] = []  # Called after every write
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._connect()
+
+    def _connect(self):
+        """Opens the connection; also called in forked workers, which must not share the parent's."""
+        self.conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=10)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    def add_change_listener(self, listener: Callable[[], None]):
+        self._listeners.append(listener)
+
+    def data_version(self) -> int:
+        """Changes whenever another connection (e.g. another process) commits to the store."""
+        with self._lock:
+            return self.conn.execute("PRAGMA data_version").fetchone()[0]
+
+    # --- reads ---
+
+    @staticmethod
+    def _row_to_lead(row) -> Dict:
+        return {"lead_id": row[0], **json.loads(row[1])}
+
+    def get(self, lead_id: str) -> Optional[Dict]:
+        """The lead's record (without its lead_id), or None."""
+        with self._lock:
+            row = self.conn.execute("SELECT data FROM leads WHERE lead_id = ?", (lead_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    @staticmethod
+    def _where(query: str, filters: Dict[str, Optional[str]], after: Optional[Cursor] = None) -> Tuple[str, list]:
+        clauses, params = [], []
+        query = (query or "").strip()
+        # With a search prefix the prefix seeks drive the plan; the other terms are
+        # written as +column so the planner doesn't walk a filter or name index instead
+        unindexed = "+" if query else ""
+        if query:
+            # Prefix ranges on NOCASE columns are index seeks (one per column, OR-ed)
+            upper = query + "\U0010ffff"
+            clauses.append("((name >= ? AND name < ?) OR (company >= ? AND company < ?) "
+                           "OR (lead_id >= ? AND lead_id < ?))")
+            params += [query, upper] * 3
+        for name, value in filters.items():
+            if value:
+                clauses.append(f"{unindexed}{name} = ?")
+                params.append(value)
+        if after is not None:
+            clauses.append(f"({unindexed}name, {unindexed}lead_id) > (?, ?)")
+            params += list(after)
+        return " AND ".join(clauses), params
+
+    def search(self, query: str = "", company: Optional[str] = None, role: Optional[str] = None,
+               industry: Optional[str] = None, limit: int = 25, after: Optional[Cursor] = None) -> LeadPage:
+        """Leads whose name, company or id starts with `query` (case-insensitive), ordered by name."""
+        where, params = self._where(query, {"company": company, "role": role, "industry": industry}, after)
+        sql = (f"SELECT lead_id, data, name FROM leads {'WHERE ' + where if where else ''} "
+               f"ORDER BY name, lead_id LIMIT ?")
+        with self._lock:
+            rows = self.conn.execute(sql, params + [limit + 1]).fetchall()
+        leads = [self._row_to_lead(row) for row in rows[:limit]]
+        next_cursor = (rows[limit - 1][2], rows[limit - 1][0]) if len(rows) > limit else None
+        return LeadPage(leads=leads, next_cursor=next_cursor)
+
+    def count(self, query: str = "", company: Optional[str] = None, role: Optional[str] = None,
+              industry: Optional[str] = None) -> int:
+        where, params = self._where(query, {"company": company, "role": role, "industry": industry})
+        with self._lock:
+            return self.conn.execute(f"SELECT COUNT(*) FROM leads {'WHERE ' + where if where else ''}",
+                                     params).fetchone()[0]
+
+    def distinct_values(self, field_name: str, limit: int = 200) -> List[str]:
+        """Distinct non-empty values of a filter field, for filter dropdowns."""
+        if field_name not in FILTER_FIELDS:
+            raise ValueError(f"Not a filter field: {field_name}")
+        with self._lock:
+            rows = self.conn.execute(f"SELECT DISTINCT {field_name} FROM leads WHERE {field_name} != '' "
+                                     f"ORDER BY {field_name} LIMIT ?", (limit,)).fetchall()
+        return [row[0] for row in rows]
+
+    def iter_lead_ids(self, batch_size: int = 1000) -> Iterator[str]:
+        """Every lead_id in id order, fetched a batch at a time."""
+        last = ""
+        while True:
+            with self._lock:
+                rows = self.conn.execute("SELECT lead_id FROM leads WHERE lead_id > ? ORDER BY lead_id LIMIT ?",
+                                         (last, batch_size)).fetchall()
+            if not rows:
+                return
+            for (lead_id,) in rows:
+                yield lead_id
+            last = rows[-1][0]
+
+    # --- writes ---
+
+    def upsert_many(self, leads: Iterable[Tuple[str, Dict]]) -> int:
+        """Inserts or replaces validated (lead_id, record) pairs in one transaction."""
+        now = time.time()
+        rows = [(lead_id, record["name"], record["company"], record.get("role", ""), record.get("industry", ""),
+                 json.dumps(record), now) for lead_id, record in leads]
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                self.conn.executemany(
+                    "INSERT INTO leads (lead_id, name, company, role, industry, data, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT(lead_id) DO UPDATE SET name = excluded.name, "
+                    "company = excluded.company, role = excluded.role, industry = excluded.industry, "
+                    "data = excluded.data, updated_at = excluded.updated_at", rows)
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        for listener in self._listeners:
+            listener()
+        return len(rows)
+
+    def import_records(self, records: Iterable[Tuple[int, Dict]], chunk_size: int = IMPORT_CHUNK_SIZE,
+                       progress: Optional[Callable[[ImportReport], None]] = None,
+                       imported_ids: Optional[set] = None) -> ImportReport:
+        """
+        Validates and upserts (line number, raw record) pairs a chunk at a time; invalid
+        records are skipped. The ids of valid records are added to `imported_ids` if given.
+        """
+        report = ImportReport()
+        chunk: List[Tuple[str, Dict]] = []
+
+        def flush():
+            report.imported += self.upsert_many(chunk)
+            chunk.clear()
+            if progress:
+                progress(report)
+
+        for line_no, raw in records:
+            try:
+                if isinstance(raw, dict) and "__error__" in raw:
+                    raise ValueError(raw["__error__"])
+                chunk.append(validate_lead(raw))
+                if imported_ids is not None:
+                    imported_ids.add(chunk[-1][0])
+            except ValueError as e:
+                report.rejected += 1
+                if len(report.errors) < MAX_REPORTED_ERRORS:
+                    report.errors.append(f"line {line_no}: {e}")
+            if len(chunk) >= chunk_size:
+                flush()
+        if chunk:
+            flush()
+        with self._lock:
+            self.conn.execute("PRAGMA optimize")  # Refresh planner statistics after bulk changes
+        return report
+
+    def import_file(self, path: Path, chunk_size: int = IMPORT_CHUNK_SIZE,
+                    progress: Optional[Callable[[ImportReport], None]] = None,
+                    imported_ids: Optional[set] = None) -> ImportReport:
+        return self.import_records(iter_lead_records(path), chunk_size, progress, imported_ids)
+
+    def sync_json_file(self, path: Path = LEADS_FILE) -> Optional[ImportReport]:
+        """
+        Imports the legacy leads JSON if it changed since it was last imported (by any
+        process), and deletes the leads an earlier sync imported that it no longer has.
+        """
+        try:
+            stat = Path(path).stat()
+        except FileNotFoundError:
+            return None
+        fingerprint = f"{Path(path).resolve()}:{stat.st_mtime_ns}:{stat.st_size}"
+        with self._lock:
+            row = self.conn.execute("SELECT value FROM meta WHERE key = 'leads_file'").fetchone()
+            # Stores synced before json_leads existed don't know which leads came from the file yet.
+            # Recorded in meta rather than read off json_leads, which is empty for a file without leads
+            tracked = self.conn.execute("SELECT 1 FROM meta WHERE key = 'json_leads_tracked'").fetchone()
+        if row and row[0] == fingerprint and tracked:
+            return None
+        file_ids = set()
+        report = self.import_file(path, imported_ids=file_ids)
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                previous = {lead_id for (lead_id,) in self.conn.execute("SELECT lead_id FROM json_leads")}
+                removed = [(lead_id,) for lead_id in previous - file_ids]
+                self.conn.executemany("DELETE FROM leads WHERE lead_id = ?", removed)
+                self.conn.execute("DELETE FROM json_leads")
+                self.conn.executemany("INSERT INTO json_leads (lead_id) VALUES (?)", [(i,) for i in file_ids])
+                self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('leads_file', ?)", (fingerprint,))
+                self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('json_leads_tracked', '1')")
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        report.removed = len(removed)
+        if removed:
+            for listener in self._listeners:
+                listener()
+        print(f"---SERVICE: Imported lead book {path} into {self.path}: {report}---")
+        return report
+
+
+_store: Optional[LeadStore] = None
+_store_lock = threading.Lock()
+
+def get_lead_store() -> LeadStore:
+    """Process-wide lead store (created on first use)."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = LeadStore()
+        return _store
+
+
+def _reconnect_after_fork():
+    if _store is not None:
+        _store._connect()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reconnect_after_fork)
@@ -1,15 +1,87 @@
 import os
+import threading
+import time
 from dotenv import load_dotenv
-from langchain_google_genai import ChatGoogleGenerativeAI
+from langchain_google_genai import ChatGoogleGenerativeAI, GoogleGenerativeAIEmbeddings
+from langchain_google_genai._genai_extension import build_generative_service
+from agent.services.tracing import span
 
 load_dotenv()
 
+# Clients are shared process-wide, keyed by everything they were built from
+_clients = {}
+_clients_lock = threading.Lock()
+
+def _cached_client(key: tuple, build):
+    with _clients_lock:
+        if key not in _clients:
+            _clients[key] = build()
+        return _clients[key]
+
+def get_client_kwargs() -> dict:
+    """
+    Extra client arguments for the Google GenAI clients. Setting LLM_API_ENDPOINT
+    (e.g. to the local stub_llm_server.py) routes all LLM and embedding calls there.
+    """
+    endpoint = os.getenv("LLM_API_ENDPOINT")
+    if not endpoint:
+        return {}
+    return {"client_options": {"api_endpoint": endpoint}, "transport": "rest"}
+
 def get_llm(model_name="gemini-2.0-flash"):
-    """Initializes and returns the Gemini LLM client."""
+    """Returns the (shared) Gemini LLM client."""
+    api_key = os.getenv("GOOGLE_API_KEY")
+    return _cached_client(("llm", model_name, api_key, os.getenv("LLM_API_ENDPOINT")),
+                          lambda: _build_llm(model_name, api_key))
+
+def _build_llm(model_name: str, api_key: str):
     #print(os.getenv("GOOGLE_API_KEY"))
     llm = ChatGoogleGenerativeAI(
         model=model_name,  # You can also use "gemini-1.5-pro" if needed
         temperature=0,
-        google_api_key=os.getenv("GOOGLE_API_KEY")
+        google_api_key=api_key,
+        **get_client_kwargs()
     )
     return llm
+
+def invoke_llm(llm, prompt: str, purpose: str, on_token=None) -> str:
+    """
+    Runs the LLM under a span carrying prompt size and token usage. With
+    `on_token` the response is streamed and each text chunk is passed to it.
+    """
+    with span("llm", purpose=purpose, prompt_chars=len(prompt), streamed=on_token is not None) as llm_span:
+        if on_token is None:
+            response = llm.invoke(prompt)
+        else:
+            response, start = None, time.perf_counter()
+            for chunk in llm.stream(prompt):
+                if response is None:
+                    llm_span.set("first_token_ms", round((time.perf_counter() - start) * 1000, 1))
+                on_token(chunk.content)
+                response = chunk if response is None else response + chunk
+        usage = getattr(response, "usage_metadata", None) or {}
+        llm_span.set("input_tokens", usage.get("input_tokens", 0))
+        llm_span.set("output_tokens", usage.get("output_tokens", 0))
+    return response.content if response is not None else ""
+
+class TracedEmbeddings(GoogleGenerativeAIEmbeddings):
+    """Gemini embeddings that record an `embedding` span per call (embed_query goes through embed_documents)."""
+
+    def embed_documents(self, texts, *args, **kwargs):
+        with span("embedding", texts=len(texts), chars=sum(len(t) for t in texts)):
+            return super().embed_documents(texts, *args, **kwargs)
+
+def get_embeddings(api_key: str = None, model_name="models/embedding-001"):
+    """Returns the (shared) Gemini embeddings client."""
+    api_key = api_key or os.getenv("GOOGLE_API_KEY")
+    return _cached_client(("embeddings", model_name, api_key, os.getenv("LLM_API_ENDPOINT")),
+                          lambda: _build_embeddings(api_key, model_name))
+
+def _build_embeddings(api_key: str, model_name: str):
+    client_kwargs = get_client_kwargs()
+    embeddings = TracedEmbeddings(model=model_name, google_api_key=api_key, **client_kwargs)
+    if client_kwargs:
+        # GoogleGenerativeAIEmbeddings ignores `transport` when building its client,
+        # and the custom endpoint is only reachable over REST.
+        embeddings.client = build_generative_service(api_key=api_key, **client_kwargs)
+    return embeddings
@@ -1,43 +1,259 @@
 import json
+import os
+import sqlite3
+import threading
+import time
 from pathlib import Path
+from typing import Callable, Dict, List, Optional
+from agent.services import json_delta
+from agent.services.tracing import span
 
-MEMORY_FILE = Path("data/long_term_memory.json")
+# Long-term memory lives in SQLite: one row per lead, upserted atomically.
+# MEMORY_FILE is the legacy whole-file JSON store, imported once on first use.
+MEMORY_DB = Path(os.getenv("LONG_TERM_MEMORY_DB", "data/long_term_memory.sqlite"))
+MEMORY_FILE = Path(os.getenv("LONG_TERM_MEMORY_FILE", "data/long_term_memory.json"))
+BUSY_TIMEOUT_MS = 10000  # Concurrent writers (threads or worker processes) wait instead of failing
+
+# Every save is also recorded in memory_versions: a full snapshot every
+# MEMORY_SNAPSHOT_EVERY versions and JSON deltas against the previous version
+# in between, so rebuilding any version applies at most that many deltas.
+# The latest version stays denormalized in `memories` for O(1) reads.
+MEMORY_SNAPSHOT_EVERY = max(1, int(os.getenv("MEMORY_SNAPSHOT_EVERY", "10")))  # 1 (or less) = snapshots only
+MEMORY_HISTORY_VERSIONS = int(os.getenv("MEMORY_HISTORY_VERSIONS", "50"))  # Versions kept per lead (0 = all)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS memories (
+    lead_id TEXT PRIMARY KEY,
+    summary TEXT NOT NULL DEFAULT '',
+    detailed_memory TEXT NOT NULL DEFAULT '{}',
+    updated_at REAL NOT NULL,
+    version INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS memory_versions (
+    lead_id TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    kind TEXT NOT NULL,  -- 'snapshot' or 'delta'
+    payload TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (lead_id, version)
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+_local = threading.local()
+_init_lock = threading.Lock()
+_initialized_pid = None
+_listeners: List[Callable[[str], None]] = []  # Called with the lead_id after every save
 
-def save_memory(lead_id: str, detailed_memory: dict, summary: str):
 
-    all_memory = {}
-    if MEMORY_FILE.exists():
+def _connection() -> sqlite3.Connection:
+    """Per-thread connection (re-opened in forked workers); the schema and migration run once per process."""
+    global _initialized_pid
+    if getattr(_local, "pid", None) != os.getpid():
+        with _init_lock:
+            if _initialized_pid != os.getpid():
+                MEMORY_DB.parent.mkdir(parents=True, exist_ok=True)
+                conn = sqlite3.connect(MEMORY_DB, timeout=BUSY_TIMEOUT_MS / 1000, isolation_level=None)
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.executescript(SCHEMA)
+                columns = [row[1] for row in conn.execute("PRAGMA table_info(memories)")]
+                if "version" not in columns:  # Stores created before memory history
+                    conn.execute("ALTER TABLE memories ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+                migrate_json_memory(conn)
+                conn.close()
+                _initialized_pid = os.getpid()
+        conn = sqlite3.connect(MEMORY_DB, timeout=BUSY_TIMEOUT_MS / 1000, isolation_level=None)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        _local.conn, _local.pid = conn, os.getpid()
+    return _local.conn
+
+
+def migrate_json_memory(conn: sqlite3.Connection, json_path: Path = MEMORY_FILE) -> int:
+    """One-shot import of the legacy JSON file; leads already in the store are kept. Returns leads imported."""
+    if not json_path.exists():
+        return 0
+    # The write lock is taken before the check, so concurrent processes migrate exactly once
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        if conn.execute("SELECT 1 FROM meta WHERE key = 'json_migrated'").fetchone():
+            conn.execute("ROLLBACK")
+            return 0
         try:
-            with open(MEMORY_FILE, 'r') as f:
+            with open(json_path, 'r') as f:
                 content = f.read()
-                if content:
-                    all_memory = json.loads(content)
+                all_memory = json.loads(content) if content else {}
         except json.JSONDecodeError:
             all_memory = {}
 
-    # The new memory object now has a dedicated key for the summary.
-    all_memory[lead_id] = {
-        "summary": summary,
-        "detailed_memory": detailed_memory
-    }
-    
-    with open(MEMORY_FILE, 'w') as f:
-        json.dump(all_memory, f, indent=2)
-        
-    print(f"---SERVICE: Long-term memory with in-context summary saved for {lead_id}---")
+        now = time.time()
+        imported = 0
+        for lead_id, memory in all_memory.items():
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO memories (lead_id, summary, detailed_memory, updated_at) VALUES (?, ?, ?, ?)",
+                (lead_id, memory.get("summary", ""), json.dumps(memory.get("detailed_memory", {})), now),
+            )
+            imported += cursor.rowcount
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('json_migrated', ?)", (str(json_path),))
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    print(f"---SERVICE: Migrated {imported} lead memories from {json_path} to {MEMORY_DB}---")
+    return imported
+
+
+def add_change_listener(listener: Callable[[str], None]):
+    """Registers a callback notified with the lead_id whenever this process saves a lead's memory."""
+    _listeners.append(listener)
+
+
+_watch = {"conn": None, "pid": None}
+_watch_lock = threading.Lock()
+
+def data_version() -> int:
+    """
+    SQLite's data_version on a read-only watch connection shared by all threads.
+    It changes whenever any writer (any thread or process) commits, so readers
+    can detect writes they were not notified about.
+    """
+    _connection()  # Schema and migration
+    with _watch_lock:
+        if _watch["pid"] != os.getpid():
+            _watch["conn"] = sqlite3.connect(MEMORY_DB, timeout=BUSY_TIMEOUT_MS / 1000,
+                                             isolation_level=None, check_same_thread=False)
+            _watch["pid"] = os.getpid()
+        return _watch["conn"].execute("PRAGMA data_version").fetchone()[0]
+
+
+def save_memory(lead_id: str, detailed_memory: dict, summary: str):
+    with span("save_memory", lead_id=lead_id):
+        _save_memory(lead_id, detailed_memory, summary)
+
+def _insert_version(conn: sqlite3.Connection, lead_id: str, version: int, kind: str, payload: dict, now: float):
+    conn.execute("INSERT INTO memory_versions (lead_id, version, kind, payload, created_at) VALUES (?, ?, ?, ?, ?)",
+                 (lead_id, version, kind, json.dumps(payload), now))
 
-# The load_memory function does not need to be changed. It already loads the full object.
+def _save_memory(lead_id: str, detailed_memory: dict, summary: str):
+    # The new memory object now has a dedicated key for the summary.
+    memory = {"summary": summary, "detailed_memory": detailed_memory}
+    conn = _connection()
+    now = time.time()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        row = conn.execute("SELECT summary, detailed_memory, version FROM memories WHERE lead_id = ?",
+                           (lead_id,)).fetchone()
+        version = row[2] if row else 0
+        if row:
+            previous = {"summary": row[0], "detailed_memory": json.loads(row[1])}
+            if version == 0:
+                # Memory saved before history was kept (or migrated from JSON) becomes version 1
+                version = 1
+                _insert_version(conn, lead_id, version, "snapshot", previous, now)
+        version += 1
+        if not row or MEMORY_SNAPSHOT_EVERY == 1 or version % MEMORY_SNAPSHOT_EVERY == 1:
+            _insert_version(conn, lead_id, version, "snapshot", memory, now)
+        else:
+            _insert_version(conn, lead_id, version, "delta", json_delta.diff(previous, memory), now)
+        conn.execute(
+            "INSERT INTO memories (lead_id, summary, detailed_memory, updated_at, version) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT(lead_id) DO UPDATE SET summary = excluded.summary, "
+            "detailed_memory = excluded.detailed_memory, updated_at = excluded.updated_at, version = excluded.version",
+            (lead_id, summary, json.dumps(detailed_memory), now, version),
+        )
+        # Amortized compaction: only once a lead is a full snapshot interval over its bound
+        if MEMORY_HISTORY_VERSIONS and version > MEMORY_HISTORY_VERSIONS + MEMORY_SNAPSHOT_EVERY:
+            oldest = conn.execute("SELECT MIN(version) FROM memory_versions WHERE lead_id = ?", (lead_id,)).fetchone()[0]
+            if version - oldest + 1 > MEMORY_HISTORY_VERSIONS + MEMORY_SNAPSHOT_EVERY:
+                _compact_lead(conn, lead_id, version, MEMORY_HISTORY_VERSIONS)
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    for listener in _listeners:
+        listener(lead_id)
+    print(f"---SERVICE: Long-term memory with in-context summary saved for {lead_id} (version {version})---")
 
 def load_memory(lead_id: str) -> dict:
-    if not MEMORY_FILE.exists():
+    with span("load_memory", lead_id=lead_id):
+        return _load_memory(lead_id)
+
+def _load_memory(lead_id: str) -> dict:
+    row = _connection().execute(
+        "SELECT summary, detailed_memory FROM memories WHERE lead_id = ?", (lead_id,)
+    ).fetchone()
+    if row is None:
         return {}
-    try:
-        with open(MEMORY_FILE, 'r') as f:
-            content = f.read()
-            if not content:
-                return {}
-            all_memory = json.loads(content)
-        # Return the entire object stored under the lead's ID, or an empty dict if not found.
-        return all_memory.get(lead_id, {})
-    except (json.JSONDecodeError, FileNotFoundError):
-        return {}
\ No newline at end of file
+    # Return the entire object stored under the lead's ID, or an empty dict if not found.
+    return {
+        "summary": row[0],
+        "detailed_memory": json.loads(row[1])
+    }
+
+
+# --- History ---
+
+def _reconstruct(conn: sqlite3.Connection, lead_id: str, version: int) -> Optional[dict]:
+    """Nearest snapshot at or before `version`, plus the deltas after it."""
+    snapshot = conn.execute(
+        "SELECT version, payload FROM memory_versions WHERE lead_id = ? AND version <= ? AND kind = 'snapshot' "
+        "ORDER BY version DESC LIMIT 1", (lead_id, version)).fetchone()
+    if snapshot is None:
+        return None
+    memory = json.loads(snapshot[1])
+    for (payload,) in conn.execute(
+            "SELECT payload FROM memory_versions WHERE lead_id = ? AND version > ? AND version <= ? ORDER BY version",
+            (lead_id, snapshot[0], version)):
+        memory = json_delta.apply(memory, json.loads(payload))
+    return memory
+
+def load_memory_version(lead_id: str, version: int) -> dict:
+    """The lead's memory as of `version` ({} if that version was never saved or has been compacted away)."""
+    with span("load_memory_version", lead_id=lead_id, version=version):
+        conn = _connection()
+        conn.execute("BEGIN")  # One read snapshot for the snapshot and its deltas
+        try:
+            return _reconstruct(conn, lead_id, version) or {}
+        finally:
+            conn.execute("COMMIT")
+
+def list_memory_versions(lead_id: str) -> List[Dict]:
+    """[{version, kind, created_at}] oldest first."""
+    rows = _connection().execute(
+        "SELECT version, kind, created_at FROM memory_versions WHERE lead_id = ? ORDER BY version", (lead_id,))
+    return [{"version": version, "kind": kind, "created_at": created_at} for version, kind, created_at in rows]
+
+def _compact_lead(conn: sqlite3.Connection, lead_id: str, latest: int, keep: int) -> int:
+    """Keeps the newest `keep` versions, re-basing the oldest kept one as a snapshot. Returns versions deleted."""
+    oldest_kept = latest - keep + 1
+    kind = conn.execute("SELECT kind FROM memory_versions WHERE lead_id = ? AND version = ?",
+                        (lead_id, oldest_kept)).fetchone()
+    if kind is None:
+        return 0
+    if kind[0] != "snapshot":
+        memory = _reconstruct(conn, lead_id, oldest_kept)
+        conn.execute("UPDATE memory_versions SET kind = 'snapshot', payload = ? WHERE lead_id = ? AND version = ?",
+                     (json.dumps(memory), lead_id, oldest_kept))
+    return conn.execute("DELETE FROM memory_versions WHERE lead_id = ? AND version < ?",
+                        (lead_id, oldest_kept)).rowcount
+
+def compact_memory_history(keep: int = MEMORY_HISTORY_VERSIONS) -> int:
+    """Bounds every lead's history to its newest `keep` versions. Returns versions deleted."""
+    if keep <= 0:
+        return 0
+    conn = _connection()
+    leads = [row[0] for row in conn.execute("SELECT lead_id FROM memories WHERE version > ?", (keep,))]
+    deleted = 0
+    for lead_id in leads:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            latest = conn.execute("SELECT version FROM memories WHERE lead_id = ?", (lead_id,)).fetchone()[0]
+            deleted += _compact_lead(conn, lead_id, latest, keep)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    print(f"---SERVICE: Compacted memory history: {deleted} versions deleted across {len(leads)} leads---")
+    return deleted
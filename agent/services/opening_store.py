@@ -0,0 +1,137 @@
+# agent/services/opening_store.py
+"""
+Precomputed opening statements (see pregenerate_openings.py).
+
+Each opener is stored with a fingerprint of what the opening prompt is built
+from (lead data, long-term memory, company data, and the similar-lead
+precedents when OPENING_PRECEDENTS is on). A stored opener is only
+served while the fingerprint still matches, e.g. a finished call updates the
+lead's memory and makes the next opener stale.
+
+Openers are rows keyed by lead_id in SQLite, so a batch run over the whole
+lead book upserts each opener instead of rewriting one large file, and a
+lookup is a primary-key read. A data/openings.json written by earlier
+versions is imported the first time the store is opened.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+OPENINGS_DB = os.getenv("OPENINGS_DB", "data/openings.sqlite")
+LEGACY_OPENINGS_FILE = Path(os.getenv("OPENINGS_FILE", "data/openings.json"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS openings (
+    lead_id TEXT PRIMARY KEY,
+    fingerprint TEXT NOT NULL,
+    opening TEXT NOT NULL,
+    generated_at REAL NOT NULL
+);
+"""
+
+
+def opening_fingerprint(lead_data: Dict, long_term_memory: Dict, company_data: Any = None,
+                        precedents: Optional[List[Dict]] = None) -> str:
+    parts = [lead_data or {}, long_term_memory or {}, company_data or ""]
+    if precedents:
+        # What the prompt shows of each similar lead; the similarity score isn't part of it
+        parts.append([{k: v for k, v in precedent.items() if k != "score"} for precedent in precedents])
+    payload = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
+
+
+class OpeningStore:
+    """Stored openers in SQLite, safe to share across threads."""
+
+    def __init__(self, path: str = OPENINGS_DB, legacy_file: Path = LEGACY_OPENINGS_FILE):
+        self.path = path
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._connect()
+        self._import_legacy_file(Path(legacy_file))
+
+    def _connect(self):
+        """Opens the connection; also called in forked workers, which must not share the parent's."""
+        self.conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=10)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    def _import_legacy_file(self, path: Path):
+        with self._lock:
+            if self.conn.execute("SELECT 1 FROM openings LIMIT 1").fetchone():
+                return
+        try:
+            with open(path, 'r') as f:
+                legacy = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return
+        saved = self.upsert_many({lead_id: entry for lead_id, entry in legacy.items()
+                                  if isinstance(entry, dict) and entry.get("fingerprint") and entry.get("opening")})
+        print(f"---SERVICE: Imported {saved} opening statement(s) from {path}---")
+
+    def get(self, lead_id: str) -> Optional[Dict[str, Any]]:
+        """{"fingerprint", "opening", "generated_at"} for the lead, or None."""
+        with self._lock:
+            row = self.conn.execute("SELECT fingerprint, opening, generated_at FROM openings WHERE lead_id = ?",
+                                    (lead_id,)).fetchone()
+        return {"fingerprint": row[0], "opening": row[1], "generated_at": row[2]} if row else None
+
+    def upsert_many(self, generated: Dict[str, Dict[str, Any]]) -> int:
+        """Inserts or replaces {lead_id: {"fingerprint", "opening"}} in one transaction."""
+        now = time.time()
+        rows = [(lead_id, entry["fingerprint"], entry["opening"], entry.get("generated_at", now))
+                for lead_id, entry in generated.items()]
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                self.conn.executemany(
+                    "INSERT INTO openings (lead_id, fingerprint, opening, generated_at) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT(lead_id) DO UPDATE SET fingerprint = excluded.fingerprint, "
+                    "opening = excluded.opening, generated_at = excluded.generated_at", rows)
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        return len(rows)
+
+
+_store: Optional[OpeningStore] = None
+_store_lock = threading.Lock()
+
+def get_opening_store() -> OpeningStore:
+    """Process-wide opening store (created on first use)."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = OpeningStore()
+        return _store
+
+
+def get_fresh_opening(lead_id: str, fingerprint: str) -> Optional[str]:
+    """The stored opener for this lead, or None if missing or generated from different data."""
+    entry = get_opening_store().get(lead_id)
+    if entry and entry["fingerprint"] == fingerprint:
+        return entry["opening"]
+    return None
+
+
+def save_openings(generated: Dict[str, Dict[str, Any]]):
+    """Upserts {lead_id: {"fingerprint", "opening"}} into the store."""
+    store = get_opening_store()
+    store.upsert_many(generated)
+    print(f"---SERVICE: {len(generated)} opening statement(s) saved to {store.path}---")
+
+
+def _reconnect_after_fork():
+    if _store is not None:
+        _store._connect()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reconnect_after_fork)
@@ -0,0 +1,192 @@
+# agent/services/result_cache.py
+"""
+Process-wide cache for deterministic tool results, shared across sessions.
+
+Entries are keyed by tool name, namespace (the index the tool reads) and
+canonicalized arguments, and stamped with a fingerprint of the namespace's
+index manifest (file sizes + mtimes). Rebuilding an index changes the
+fingerprint, so stale entries miss and are dropped on the next lookup (the
+fingerprint itself is recomputed at most every RESULT_CACHE_MANIFEST_TTL
+seconds).
+Negative results are kept for RESULT_CACHE_NEGATIVE_TTL only.
+
+Set RESULT_CACHE_DB to also persist entries in SQLite across restarts.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+RESULT_CACHE_ENABLED = os.getenv("RESULT_CACHE", "1") == "1"
+RESULT_CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", "3600"))
+RESULT_CACHE_NEGATIVE_TTL = float(os.getenv("RESULT_CACHE_NEGATIVE_TTL", "120"))
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "2048"))
+RESULT_CACHE_DB = os.getenv("RESULT_CACHE_DB")  # e.g. data/tool_cache.sqlite
+# Seconds an index manifest fingerprint is reused; a rebuilt index is noticed within this long
+MANIFEST_FINGERPRINT_TTL = float(os.getenv("RESULT_CACHE_MANIFEST_TTL", "5"))
+
+NEGATIVE_RESULTS = {
+    "No relevant data found.",
+    "Information not found in the provided documents.",
+}
+
+
+def canonicalize_args(args: Dict[str, Any]) -> str:
+    """Stable text form of tool arguments: case and whitespace in strings don't matter."""
+    def normalize(value):
+        if isinstance(value, str):
+            return " ".join(value.lower().split())
+        if isinstance(value, (list, tuple)):
+            return [normalize(item) for item in value]
+        if isinstance(value, dict):
+            return {str(k): normalize(v) for k, v in value.items()}
+        return value
+    return json.dumps(normalize(args), sort_keys=True, default=str)
+
+
+_fingerprints: Dict[Tuple[str, ...], Tuple[float, str]] = {}  # paths -> (computed_at, fingerprint)
+_fingerprints_lock = threading.Lock()
+
+
+def manifest_fingerprint(paths: Iterable[str], max_age: float = MANIFEST_FINGERPRINT_TTL) -> str:
+    """
+    Hash of (path, size, mtime) for every file under the given paths; missing files count too.
+    Reused for max_age seconds, so a lookup doesn't walk the index directory every time.
+    """
+    key = tuple(sorted(paths))
+    now = time.monotonic()
+    with _fingerprints_lock:
+        cached = _fingerprints.get(key)
+    if cached and now - cached[0] < max_age:
+        return cached[1]
+    fingerprint = _compute_fingerprint(key)
+    with _fingerprints_lock:
+        _fingerprints[key] = (now, fingerprint)
+    return fingerprint
+
+
+def _compute_fingerprint(paths: Tuple[str, ...]) -> str:
+    digest = hashlib.sha1()
+    for path in paths:
+        root = Path(path)
+        files = sorted(p for p in root.rglob("*") if p.is_file()) if root.is_dir() else [root]
+        for file in files:
+            try:
+                stat = file.stat()
+                digest.update(f"{file}:{stat.st_size}:{stat.st_mtime_ns};".encode())
+            except FileNotFoundError:
+                digest.update(f"{file}:missing;".encode())
+    return digest.hexdigest()[:16]
+
+
+class ToolResultCache:
+    """LRU of tool results with per-entry expiry and manifest fingerprints (thread-safe)."""
+
+    def __init__(self, max_entries: int = RESULT_CACHE_MAX_ENTRIES, ttl: float = RESULT_CACHE_TTL,
+                 negative_ttl: float = RESULT_CACHE_NEGATIVE_TTL, db_path: Optional[str] = RESULT_CACHE_DB):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._entries: "OrderedDict[str, Tuple[str, float, str]]" = OrderedDict()  # key -> (fingerprint, expires_at, result)
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "negative_hits": 0, "invalidated": 0, "stores": 0}
+        self.db_path = db_path
+        self.db = None
+        if db_path:
+            Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+            self._connect()
+
+    def _connect(self):
+        self.db = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS tool_cache (key TEXT PRIMARY KEY, tool TEXT, fingerprint TEXT, "
+            "expires_at REAL, result TEXT)"
+        )
+
+    @staticmethod
+    def make_key(tool: str, namespace: Optional[str], args: Dict[str, Any]) -> str:
+        raw = f"{tool}\0{namespace or ''}\0{canonicalize_args(args)}"
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key: str, fingerprint: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None and self.db is not None:
+                row = self.db.execute("SELECT fingerprint, expires_at, result FROM tool_cache WHERE key = ?",
+                                      (key,)).fetchone()
+                entry = tuple(row) if row else None
+                if entry:
+                    self._entries[key] = entry
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            entry_fingerprint, expires_at, result = entry
+            if entry_fingerprint != fingerprint or expires_at <= now:
+                self.stats["invalidated" if entry_fingerprint != fingerprint else "misses"] += 1
+                self._delete(key)
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            if result.strip() in NEGATIVE_RESULTS:
+                self.stats["negative_hits"] += 1
+            return result
+
+    def put(self, key: str, fingerprint: str, result: str, tool: str = ""):
+        ttl = self.negative_ttl if result.strip() in NEGATIVE_RESULTS else self.ttl
+        entry = (fingerprint, time.time() + ttl, result)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self.stats["stores"] += 1
+            if self.db is not None:
+                self.db.execute("INSERT OR REPLACE INTO tool_cache (key, tool, fingerprint, expires_at, result) "
+                                "VALUES (?, ?, ?, ?, ?)", (key, tool, *entry))
+
+    def _delete(self, key: str):
+        self._entries.pop(key, None)
+        if self.db is not None:
+            self.db.execute("DELETE FROM tool_cache WHERE key = ?", (key,))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self.db is not None:
+                self.db.execute("DELETE FROM tool_cache")
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self.stats, "entries": len(self._entries)}
+
+
+_cache: Optional[ToolResultCache] = None
+_cache_lock = threading.Lock()
+
+def get_result_cache() -> ToolResultCache:
+    """Process-wide tool result cache (created on first use)."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ToolResultCache()
+        return _cache
+
+
+def _reset_after_fork():
+    """Forked workers keep the warmed entries but need their own lock and connection."""
+    global _fingerprints_lock
+    _fingerprints_lock = threading.Lock()
+    if _cache is not None:
+        _cache._lock = threading.Lock()
+        if _cache.db_path:
+            _cache._connect()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
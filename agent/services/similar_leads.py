@@ -0,0 +1,389 @@
+# agent/services/similar_leads.py
+"""
+Approximate nearest-neighbour index over lead memories.
+
+Each lead with a long-term memory gets a profile text (summary, pain points,
+solutions of interest, industry, role) whose embedding is stored in the
+memory database (`lead_vectors`) and indexed in an in-process FAISS HNSW
+graph:
+
+    find_similar_leads(lead_id, k=5)  # [{lead_id, score, name, company, ...}]
+
+A lead without a memory (never called) has no vector of its own; it is
+searched with an embedding of its lead data (role, industry, company) in the
+same profile format, cached per lead until that data changes.
+
+The index follows save_memory incrementally: a change listener re-embeds the
+saved lead (skipped when its profile text is unchanged) and adds the vector.
+HNSW cannot delete, so a re-embedded lead's old vector stays in the graph
+but is ignored by searches, and the graph is rebuilt once such stale
+entries outnumber live ones. Vectors saved by other processes are picked up
+by sequence number on the next search. Leads saved before the index existed
+are embedded with `main.py index-similar-leads`. Building the graph is the
+slow part, so it is snapshotted to SIMILAR_LEADS_INDEX as it grows and a new
+process only indexes the vectors added since the snapshot.
+
+OPENING_PRECEDENTS (default 0 = off) adds that many similar leads as short
+precedents to the opening prompt.
+"""
+import hashlib
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+from agent.services import memory_manager
+from agent.services.tracing import span
+
+OPENING_PRECEDENTS = int(os.getenv("OPENING_PRECEDENTS", "0"))
+SIMILAR_LEADS_INDEXING = os.getenv("SIMILAR_LEADS_INDEXING", "1") != "0"  # Embed leads as memories are saved
+SIMILAR_LEADS_INDEX = os.getenv("SIMILAR_LEADS_INDEX", "data/similar_leads.index")
+SNAPSHOT_EVERY = 1000  # Vectors indexed between index snapshots (at least 10% of the index)
+HNSW_NEIGHBORS = 32
+HNSW_EF_SEARCH = 64
+EMBED_BATCH_SIZE = 100
+MAX_CACHED_QUERY_VECTORS = 1024  # Lead-data embeddings kept for leads without a memory
+CATCH_UP_BATCH_SIZE = 5000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS lead_vectors (
+    lead_id TEXT PRIMARY KEY,
+    seq INTEGER NOT NULL,
+    profile_hash TEXT NOT NULL,
+    vector BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS lead_vectors_by_seq ON lead_vectors (seq);
+"""
+
+
+def lead_profile_text(memory: Dict, lead_data: Dict) -> str:
+    """What similarity is measured on: the memory summary plus the fields reps compare leads by."""
+    detailed = memory.get("detailed_memory") or {}
+    parts = [
+        f"Industry: {lead_data.get('industry') or detailed.get('industry') or 'unknown'}",
+        f"Role: {lead_data.get('role', 'unknown')}",
+        f"Pain points: {', '.join(map(str, detailed.get('key_pain_points_confirmed') or [])) or 'none'}",
+        f"Solutions of interest: {', '.join(map(str, detailed.get('solutions_of_interest') or [])) or 'none'}",
+        f"Summary: {memory.get('summary', '')}",
+    ]
+    return "\n".join(parts)
+
+
+class SimilarLeadIndex:
+    """HNSW index over lead profile embeddings, kept in step with lead_vectors."""
+
+    def __init__(self, db_path=memory_manager.MEMORY_DB, snapshot_path: str = SIMILAR_LEADS_INDEX):
+        self.db_path = db_path
+        self.snapshot_path = snapshot_path
+        memory_manager.data_version()  # Creates the memory database (schema, migration) if needed
+        self._connect()
+        self.index = None  # Built on first use
+        self.dim: Optional[int] = None
+        self._lead_to_id: Dict[str, int] = {}  # lead_id -> live FAISS id
+        self._id_to_lead: Dict[int, str] = {}
+        self._next_id = 0
+        self._seen_seq = 0  # Highest lead_vectors.seq in the index
+        self._unsaved = 0  # Vectors indexed since the last snapshot
+        self._snapshot_checked = False
+        self._query_vectors: Dict[str, tuple] = {}  # lead_id -> (profile_hash, vector) of unindexed leads
+
+    def _connect(self):
+        """Opens the connection; also called in forked workers, which must not share the parent's."""
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None,
+                                    timeout=memory_manager.BUSY_TIMEOUT_MS / 1000)
+        self.conn.executescript(SCHEMA)
+        self._lock = threading.RLock()
+
+    # --- index maintenance ---
+
+    def _new_index(self, dim: int):
+        import faiss
+        hnsw = faiss.IndexHNSWFlat(dim, HNSW_NEIGHBORS, faiss.METRIC_INNER_PRODUCT)
+        hnsw.hnsw.efSearch = HNSW_EF_SEARCH
+        return faiss.IndexIDMap2(hnsw)
+
+    def _add_vectors(self, rows):
+        """Adds (lead_id, seq, vector bytes) rows, superseding each lead's previous vector."""
+        import numpy as np
+        if not rows:
+            return
+        vectors = np.vstack([np.frombuffer(vector, dtype=np.float32) for _, _, vector in rows])
+        if self.index is None:
+            self.dim = vectors.shape[1]
+            self.index = self._new_index(self.dim)
+        ids = np.arange(self._next_id, self._next_id + len(rows), dtype=np.int64)
+        self._next_id += len(rows)
+        for (lead_id, seq, _), faiss_id in zip(rows, ids.tolist()):
+            previous = self._lead_to_id.pop(lead_id, None)
+            if previous is not None:
+                self._id_to_lead.pop(previous, None)
+            self._lead_to_id[lead_id] = faiss_id
+            self._id_to_lead[faiss_id] = lead_id
+            self._seen_seq = max(self._seen_seq, seq)
+        self.index.add_with_ids(vectors, ids)
+        if self.index.ntotal > 2 * max(len(self._lead_to_id), 1000):
+            self._rebuild()
+
+    def _rebuild(self):
+        """Rebuilds the graph from the live vectors only."""
+        import numpy as np
+        start = time.perf_counter()
+        live = list(self._lead_to_id.items())
+        vectors = np.vstack([self.index.reconstruct(faiss_id) for _, faiss_id in live])
+        self.index = self._new_index(self.dim)
+        self._lead_to_id, self._id_to_lead = {}, {}
+        ids = np.arange(len(live), dtype=np.int64)
+        for (lead_id, _), faiss_id in zip(live, ids.tolist()):
+            self._lead_to_id[lead_id] = faiss_id
+            self._id_to_lead[faiss_id] = lead_id
+        self._next_id = len(live)
+        self.index.add_with_ids(vectors, ids)
+        print(f"---SERVICE: Similar-lead index rebuilt with {len(live)} leads in "
+              f"{(time.perf_counter() - start) * 1000:.0f} ms---")
+
+    def catch_up(self):
+        """Indexes vectors written since the last catch-up (by this or another process)."""
+        with self._lock:
+            if not self._snapshot_checked:
+                self._snapshot_checked = True
+                self._load_snapshot()
+            while True:
+                rows = self.conn.execute(
+                    "SELECT lead_id, seq, vector FROM lead_vectors WHERE seq > ? ORDER BY seq LIMIT ?",
+                    (self._seen_seq, CATCH_UP_BATCH_SIZE)).fetchall()
+                self._add_vectors(rows)
+                self._unsaved += len(rows)
+                if len(rows) < CATCH_UP_BATCH_SIZE:
+                    break
+            if self._unsaved >= max(SNAPSHOT_EVERY, len(self._lead_to_id) // 10):
+                self.save_snapshot()
+
+    # --- snapshots ---
+
+    def save_snapshot(self):
+        """Writes the graph and its id mapping atomically, tagged with the database it indexes."""
+        import faiss
+        with self._lock:
+            if self.index is None:
+                return
+            state = {
+                "db_path": os.path.abspath(self.db_path),
+                "seen_seq": self._seen_seq,
+                "next_id": self._next_id,
+                "dim": self.dim,
+                "lead_to_id": self._lead_to_id,
+                "index": faiss.serialize_index(self.index),
+            }
+            os.makedirs(os.path.dirname(self.snapshot_path) or ".", exist_ok=True)
+            tmp_path = f"{self.snapshot_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.snapshot_path)
+            self._unsaved = 0
+
+    def _load_snapshot(self):
+        import faiss
+        if not os.path.exists(self.snapshot_path):
+            return
+        try:
+            with open(self.snapshot_path, 'rb') as f:
+                state = pickle.load(f)
+        except Exception as e:
+            print(f"---SERVICE: Ignoring unreadable similar-lead snapshot: {e}---")
+            return
+        max_seq = self.conn.execute("SELECT COALESCE(MAX(seq), 0) FROM lead_vectors").fetchone()[0]
+        if state["db_path"] != os.path.abspath(self.db_path) or state["seen_seq"] > max_seq:
+            return  # Built from another (or a reset) database
+        self.index = faiss.deserialize_index(state["index"])
+        faiss.downcast_index(self.index.index).hnsw.efSearch = HNSW_EF_SEARCH
+        self.dim, self._seen_seq, self._next_id = state["dim"], state["seen_seq"], state["next_id"]
+        self._lead_to_id = state["lead_to_id"]
+        self._id_to_lead = {faiss_id: lead_id for lead_id, faiss_id in self._lead_to_id.items()}
+
+    # --- writes ---
+
+    def _store_vectors(self, items: List[tuple]):
+        """Upserts (lead_id, profile_hash, vector) and indexes them."""
+        import numpy as np
+        import faiss
+        vectors = np.asarray([vector for _, _, vector in items], dtype=np.float32)
+        faiss.normalize_L2(vectors)  # Inner product on unit vectors = cosine similarity
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                seq = self.conn.execute("SELECT COALESCE(MAX(seq), 0) FROM lead_vectors").fetchone()[0]
+                for offset, ((lead_id, profile_hash, _), vector) in enumerate(zip(items, vectors), start=1):
+                    self.conn.execute(
+                        "INSERT INTO lead_vectors (lead_id, seq, profile_hash, vector) VALUES (?, ?, ?, ?) "
+                        "ON CONFLICT(lead_id) DO UPDATE SET seq = excluded.seq, "
+                        "profile_hash = excluded.profile_hash, vector = excluded.vector",
+                        (lead_id, seq + offset, profile_hash, vector.tobytes()))
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.catch_up()
+
+    def _stale_profiles(self, lead_ids: List[str]) -> List[tuple]:
+        """(lead_id, profile_hash, text) for leads whose profile changed since they were embedded."""
+        from agent.services.lead_repository import get_lead_repository
+        repository = get_lead_repository()
+        placeholders = ",".join("?" * len(lead_ids))
+        with self._lock:
+            known = dict(self.conn.execute(
+                f"SELECT lead_id, profile_hash FROM lead_vectors WHERE lead_id IN ({placeholders})", lead_ids))
+        stale = []
+        for lead_id in lead_ids:
+            memory = memory_manager.load_memory(lead_id)
+            if not memory:
+                continue
+            text = lead_profile_text(memory, repository.get_lead(lead_id))
+            profile_hash = hashlib.sha1(text.encode()).hexdigest()
+            if known.get(lead_id) != profile_hash:
+                stale.append((lead_id, profile_hash, text))
+        return stale
+
+    def index_leads(self, lead_ids: List[str]) -> int:
+        """Embeds and indexes the given leads' current memories; unchanged profiles are skipped."""
+        from agent.services.llm_service import get_embeddings
+        indexed = 0
+        for start in range(0, len(lead_ids), EMBED_BATCH_SIZE):
+            stale = self._stale_profiles(lead_ids[start:start + EMBED_BATCH_SIZE])
+            if not stale:
+                continue
+            with span("similar_leads_embed", leads=len(stale)):
+                vectors = get_embeddings().embed_documents([text for _, _, text in stale])
+            self._store_vectors([(lead_id, profile_hash, vector)
+                                 for (lead_id, profile_hash, _), vector in zip(stale, vectors)])
+            indexed += len(stale)
+        return indexed
+
+    def index_all(self) -> int:
+        """Backfill: embeds every lead whose memory has no (or an outdated) vector."""
+        with self._lock:
+            lead_ids = [row[0] for row in self.conn.execute("SELECT lead_id FROM memories ORDER BY lead_id")]
+        return self.index_leads(lead_ids)
+
+    # --- reads ---
+
+    def size(self) -> int:
+        """Leads in the index."""
+        self.catch_up()
+        return len(self._lead_to_id)
+
+    def _lead_data_vector(self, lead_id: str):
+        """Query vector for a lead with no memory: its lead data in the indexed profile format."""
+        import numpy as np
+        import faiss
+        from agent.services.lead_repository import get_lead_repository
+        from agent.services.llm_service import get_embeddings
+        lead = get_lead_repository().get_lead(lead_id)
+        if not lead:
+            return None
+        who = f"{lead.get('role') or 'Lead'} at {lead.get('company') or 'unknown company'}"
+        text = lead_profile_text({"summary": f"New lead, not yet contacted: {who}."}, lead)
+        profile_hash = hashlib.sha1(text.encode()).hexdigest()
+        with self._lock:
+            cached = self._query_vectors.get(lead_id)
+        if cached and cached[0] == profile_hash:
+            return cached[1]
+        with span("similar_leads_embed", leads=1):
+            vector = np.asarray([get_embeddings().embed_query(text)], dtype=np.float32)
+        faiss.normalize_L2(vector)
+        with self._lock:
+            if len(self._query_vectors) >= MAX_CACHED_QUERY_VECTORS:
+                self._query_vectors.pop(next(iter(self._query_vectors)))
+            self._query_vectors[lead_id] = (profile_hash, vector)
+        return vector
+
+    def find_similar(self, lead_id: str, k: int = 5) -> List[Dict]:
+        """The k leads most similar to `lead_id`, best first; unindexed leads are matched by lead data."""
+        import numpy as np
+        from agent.services.lead_repository import get_lead_repository
+        with span("find_similar_leads", lead_id=lead_id, k=k):
+            self.catch_up()
+            with self._lock:
+                if self.index is None:
+                    return []
+                faiss_id = self._lead_to_id.get(lead_id)
+                query = self.index.reconstruct(faiss_id).reshape(1, -1) if faiss_id is not None else None
+            if query is None:
+                query = self._lead_data_vector(lead_id)  # Embedded outside the lock
+                if query is None or query.shape[1] != self.dim:
+                    return []
+            with self._lock:
+                # Over-fetch: stale entries and the lead itself are skipped
+                fetch = min(self.index.ntotal, k + 1 + (self.index.ntotal - len(self._lead_to_id)))
+                scores, ids = self.index.search(np.ascontiguousarray(query, dtype=np.float32), fetch)
+                matches = [(self._id_to_lead.get(int(faiss_id)), float(score))
+                           for faiss_id, score in zip(ids[0], scores[0]) if faiss_id >= 0]
+            repository = get_lead_repository()
+            results = []
+            for other, score in matches:
+                if other is None or other == lead_id:
+                    continue
+                lead = repository.get_lead(other)
+                memory = repository.get_memory(other)
+                detailed = memory.get("detailed_memory") or {}
+                results.append({
+                    "lead_id": other,
+                    "score": round(score, 4),
+                    "name": lead.get("name"),
+                    "company": lead.get("company"),
+                    "role": lead.get("role"),
+                    "industry": lead.get("industry"),
+                    "stage_reached": detailed.get("conversation_stage_reached"),
+                    "solutions_of_interest": detailed.get("solutions_of_interest") or [],
+                    "summary": memory.get("summary", ""),
+                })
+                if len(results) == k:
+                    break
+            return results
+
+
+_index: Optional[SimilarLeadIndex] = None
+_index_lock = threading.Lock()
+
+def get_similar_lead_index() -> SimilarLeadIndex:
+    """Process-wide similar-lead index (created on first use)."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = SimilarLeadIndex()
+        return _index
+
+
+def find_similar_leads(lead_id: str, k: int = 5) -> List[Dict]:
+    return get_similar_lead_index().find_similar(lead_id, k)
+
+
+def format_precedents(similar: List[Dict], max_chars: int = 240) -> str:
+    """Short precedent lines for prompts."""
+    lines = []
+    for lead in similar:
+        summary = lead["summary"] if len(lead["summary"]) <= max_chars else lead["summary"][:max_chars].rsplit(" ", 1)[0] + "..."
+        solutions = ", ".join(lead["solutions_of_interest"][:3]) or "none recorded"
+        lines.append(f"- {lead['role'] or 'Lead'} at {lead['company'] or 'unknown'} ({lead['industry'] or 'industry unknown'}); "
+                     f"stage reached: {lead['stage_reached'] or 'unknown'}; interested in: {solutions}. {summary}")
+    return "\n".join(lines)
+
+
+def _on_memory_saved(lead_id: str):
+    # Runs in the saving thread (the finalization worker); a failed embedding must not fail the save
+    try:
+        get_similar_lead_index().index_leads([lead_id])
+    except Exception as e:
+        print(f"---SERVICE: Similar-lead indexing failed for {lead_id}: {e}---")
+
+if SIMILAR_LEADS_INDEXING:
+    memory_manager.add_change_listener(_on_memory_saved)
+
+
+def _reconnect_after_fork():
+    if _index is not None:
+        _index._connect()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reconnect_after_fork)
@@ -0,0 +1,56 @@
+# agent/services/startup_profile.py
+"""
+Import-time breakdown for entry points, from `python -X importtime`.
+
+    python main.py profile cli      # what `main.py cli` imports before the first prompt
+"""
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+# Modules each entry point imports before it can serve the user
+ENTRY_POINT_IMPORTS = {
+    "main": ["main"],
+    "cli": ["main", "agent.runtime", "agent.AgentAPI", "vectorstores.create_knowledge_bases"],
+    "graph": ["main", "agent.graph"],
+    "voice": ["audio_wip", "agent.AgentAPI", "audio.tts"],
+}
+
+
+def import_times(modules: List[str]) -> List[Tuple[str, int, int]]:
+    """(module, self µs, cumulative µs) for every module imported by `import <modules>`, in import order."""
+    code = "; ".join(f"import {module}" for module in modules)
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                               capture_output=True, text=True)
+    rows = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else "import failed")
+    return rows
+
+
+def breakdown_by_package(rows: List[Tuple[str, int, int]]) -> Dict[str, int]:
+    """Self time (µs) summed per top-level package, slowest first."""
+    totals: Dict[str, int] = {}
+    for name, self_us, _ in rows:
+        package = name.split(".")[0]
+        totals[package] = totals.get(package, 0) + self_us
+    return dict(sorted(totals.items(), key=lambda item: item[1], reverse=True))
+
+
+def format_import_profile(modules: List[str], top: int = 15) -> str:
+    rows = import_times(modules)
+    total_us = sum(self_us for _, self_us, _ in rows)
+    lines = [f"Import time for {', '.join(modules)}: {total_us / 1e6:.2f}s across {len(rows)} modules", "",
+             f"{'package':<32}{'self ms':>10}{'share':>8}"]
+    for package, self_us in list(breakdown_by_package(rows).items())[:top]:
+        lines.append(f"{package:<32}{self_us / 1000:>10.1f}{self_us / total_us:>8.0%}")
+
+    lines += ["", f"{'slowest modules (cumulative)':<52}{'ms':>10}"]
+    for name, _, cumulative_us in sorted(rows, key=lambda row: row[2], reverse=True)[:top]:
+        lines.append(f"{name[:52]:<52}{cumulative_us / 1000:>10.1f}")
+    return "\n".join(lines)
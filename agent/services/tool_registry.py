@@ -0,0 +1,159 @@
+# agent/services/tool_registry.py
+import contextvars
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from agent.services.result_cache import RESULT_CACHE_ENABLED, get_result_cache, manifest_fingerprint
+from agent.services.tracing import LatencyHistogram, span
+
+MAX_RESULT_CHARS = int(os.getenv("TOOL_RESULT_MAX_CHARS", "4000"))
+TOOL_WORKERS = int(os.getenv("TOOL_WORKERS", "16"))
+
+
+class ToolSpec:
+    """
+    Declares a tool the reasoning LLM can pick.
+
+    `args` maps each argument to (type, default). `handler(state, **args)` returns the
+    result string. Tools with a `timeout` run on the shared tool pool; tools without one
+    (e.g. ones that mutate state) run inline. `cacheable` tools must not depend on the
+    state; their results are shared across sessions until the files in `cache_paths`
+    (the index manifest of `cache_namespace`) change.
+    """
+
+    def __init__(self, name: str, handler: Callable[..., str], args: Dict[str, Tuple[type, Any]],
+                 result_tag: Optional[str] = None, action_type: str = "tool_execution",
+                 timeout: Optional[float] = None, max_concurrency: Optional[int] = None,
+                 cacheable: bool = False, cache_namespace: Optional[str] = None,
+                 cache_paths: Optional[List[str]] = None):
+        self.name = name
+        self.handler = handler
+        self.args = args
+        self.result_tag = result_tag
+        self.action_type = action_type
+        self.timeout = timeout
+        self.cacheable = cacheable
+        self.cache_namespace = cache_namespace
+        self.cache_paths = cache_paths or []
+        self.semaphore = threading.BoundedSemaphore(max_concurrency) if max_concurrency else None
+
+    def validate_args(self, action: Dict[str, Any]) -> Dict[str, Any]:
+        """Picks the declared arguments out of the LLM action, applying defaults and types."""
+        args = {}
+        for arg_name, (arg_type, default) in self.args.items():
+            value = action.get(arg_name, default)
+            if value is None:
+                value = default
+            if not isinstance(value, arg_type):
+                if arg_type is str and isinstance(value, (int, float, list)):
+                    value = " ".join(map(str, value)) if isinstance(value, list) else str(value)
+                else:
+                    raise ValueError(f"Argument '{arg_name}' for {self.name} must be {arg_type.__name__}")
+            args[arg_name] = value
+        return args
+
+
+class ToolOutcome:
+    def __init__(self, args: Dict[str, Any], result: Optional[str] = None,
+                 error: Optional[str] = None, elapsed: float = 0.0, cached: bool = False):
+        self.args = args
+        self.result = result
+        self.error = error
+        self.elapsed = elapsed
+        self.cached = cached
+
+
+TOOL_REGISTRY: Dict[str, ToolSpec] = {}
+TOOL_LATENCY: Dict[str, LatencyHistogram] = {}
+_tool_pool = ThreadPoolExecutor(max_workers=TOOL_WORKERS, thread_name_prefix="tool")
+
+
+def _new_pool_after_fork():
+    # Worker threads don't survive fork; a copied executor would queue work nobody runs
+    global _tool_pool
+    _tool_pool = ThreadPoolExecutor(max_workers=TOOL_WORKERS, thread_name_prefix="tool")
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_new_pool_after_fork)
+
+
+def register_tool(spec: ToolSpec) -> ToolSpec:
+    TOOL_REGISTRY[spec.name] = spec
+    TOOL_LATENCY[spec.name] = LatencyHistogram()
+    return spec
+
+
+def get_tool(name: str) -> Optional[ToolSpec]:
+    return TOOL_REGISTRY.get(name)
+
+
+def cap_result(result: str, limit: int = MAX_RESULT_CHARS) -> str:
+    result = str(result)
+    if len(result) <= limit:
+        return result
+    return result[:limit] + f"\n... [truncated {len(result) - limit} chars]"
+
+
+def _call_and_release(spec: ToolSpec, state, args: Dict[str, Any]) -> str:
+    try:
+        return spec.handler(state, **args)
+    finally:
+        if spec.semaphore:
+            spec.semaphore.release()
+
+
+def run_tool(spec: ToolSpec, state, action: Dict[str, Any]) -> ToolOutcome:
+    """Validates arguments and runs a tool under its concurrency limit and timeout."""
+    with span("tool", tool=spec.name) as tool_span:
+        outcome = _run_tool(spec, state, action)
+        tool_span.set("result_chars", len(outcome.result or ""))
+        if spec.cacheable and RESULT_CACHE_ENABLED:
+            tool_span.set("cache_hit", outcome.cached)
+        if outcome.error:
+            tool_span.set("status", "error")
+    return outcome
+
+
+def _run_tool(spec: ToolSpec, state, action: Dict[str, Any]) -> ToolOutcome:
+    try:
+        args = spec.validate_args(action)
+    except ValueError as e:
+        return ToolOutcome({}, error=str(e))
+
+    start = time.perf_counter()
+    cache_key = None
+    if spec.cacheable and RESULT_CACHE_ENABLED:
+        cache = get_result_cache()
+        cache_key = cache.make_key(spec.name, spec.cache_namespace, args)
+        fingerprint = manifest_fingerprint(spec.cache_paths)
+        cached = cache.get(cache_key, fingerprint)
+        if cached is not None:
+            return ToolOutcome(args, result=cached, elapsed=time.perf_counter() - start, cached=True)
+
+    if spec.semaphore and not spec.semaphore.acquire(timeout=spec.timeout):
+        return ToolOutcome(args, error=f"Tool '{spec.name}' is at its concurrency limit", elapsed=time.perf_counter() - start)
+    try:
+        if spec.timeout is None:
+            result = _call_and_release(spec, state, args)
+        else:
+            # A timed-out call keeps its slot until the worker actually finishes
+            remaining = max(0.0, spec.timeout - (time.perf_counter() - start))
+            context = contextvars.copy_context()  # Keep retriever spans under this tool's span
+            result = _tool_pool.submit(context.run, _call_and_release, spec, state, args).result(timeout=remaining)
+        outcome = ToolOutcome(args, result=cap_result(result))
+        if cache_key:
+            cache.put(cache_key, fingerprint, outcome.result, tool=spec.name)
+    except FutureTimeoutError:
+        outcome = ToolOutcome(args, error=f"Tool '{spec.name}' timed out after {spec.timeout:.0f}s")
+    except Exception as e:
+        outcome = ToolOutcome(args, error=f"Tool '{spec.name}' failed: {e}")
+
+    outcome.elapsed = time.perf_counter() - start
+    TOOL_LATENCY[spec.name].observe(outcome.elapsed)
+    return outcome
+
+
+def get_tool_latency_stats() -> Dict[str, Dict[str, Any]]:
+    return {name: histogram.snapshot() for name, histogram in TOOL_LATENCY.items() if histogram.count}
@@ -0,0 +1,274 @@
+# agent/services/tracing.py
+"""
+Lightweight span tracing for the agent hot path.
+
+    with span("think", prompt_chars=len(prompt)) as s:
+        ...
+        s.set("output_tokens", 120)
+
+Finished spans are aggregated per name (latency histogram + numeric attribute
+sums), kept in a bounded ring buffer, optionally appended to a JSONL file
+(TRACE_FILE) and exposed as Prometheus text (render_prometheus /
+start_metrics_server).
+"""
+import bisect
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+TRACING_ENABLED = os.getenv("TRACING", "1") == "1"
+TRACE_FILE = os.getenv("TRACE_FILE")  # Append every finished span as a JSON line
+MAX_BUFFERED_SPANS = 10000
+MAX_ATTRIBUTE_VALUES = 50  # Distinct values counted per categorical attribute (ids, queries are capped)
+
+# Latency histogram bucket upper bounds, in seconds
+LATENCY_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, float("inf")]
+
+
+class LatencyHistogram:
+    """Cumulative-bucket latency histogram (thread-safe)."""
+
+    def __init__(self, buckets: List[float] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.total = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float):
+        with self._lock:
+            self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+            self.count += 1
+            self.total += seconds
+
+    def percentile(self, pct: float) -> float:
+        """Upper bound of the bucket containing the given percentile."""
+        with self._lock:
+            if not self.count:
+                return 0.0
+            target = pct / 100 * self.count
+            running = 0
+            for bound, bucket_count in zip(self.buckets, self.counts):
+                running += bucket_count
+                if running >= target:
+                    return bound
+        return self.buckets[-1]
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else 0.0,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "buckets": dict(zip(self.buckets, self.counts)),
+        }
+
+
+class Span:
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "start", "duration", "attributes", "error", "_t0")
+
+    def __init__(self, name: str, parent: Optional["Span"], attributes: Dict[str, Any]):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else uuid.uuid4().hex[:16]
+        self.span_id = uuid.uuid4().hex[:8]
+        self.parent_id = parent.span_id if parent else None
+        self.start = time.time()
+        self.duration = 0.0
+        self.attributes = attributes
+        self.error = None
+        self._t0 = time.perf_counter()
+
+    def set(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start": self.start,
+            "duration_ms": round(self.duration * 1000, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class _NoopSpan:
+    def set(self, key: str, value: Any):
+        pass
+
+
+class SpanStats:
+    def __init__(self):
+        self.latency = LatencyHistogram()
+        self.errors = 0
+        self.attribute_sums: Dict[str, float] = {}
+        self.attribute_counts: Dict[str, Dict[str, int]] = {}  # e.g. cache_hit -> {"True": 3}
+
+
+_current_span: contextvars.ContextVar = contextvars.ContextVar("current_span", default=None)
+_stats: Dict[str, SpanStats] = {}
+_buffer: deque = deque(maxlen=MAX_BUFFERED_SPANS)
+_lock = threading.Lock()
+_trace_file = None
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Times the enclosed block as a child of the current span."""
+    if not TRACING_ENABLED:
+        yield _NoopSpan()
+        return
+    current = Span(name, _current_span.get(), attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current_span.reset(token)
+        current.duration = time.perf_counter() - current._t0
+        _record(current)
+
+
+def _record(finished: Span):
+    global _trace_file
+    with _lock:
+        stats = _stats.setdefault(finished.name, SpanStats())
+        if finished.error:
+            stats.errors += 1
+        for key, value in finished.attributes.items():
+            if isinstance(value, bool) or isinstance(value, str):
+                counts = stats.attribute_counts.setdefault(key, {})
+                if str(value) in counts or len(counts) < MAX_ATTRIBUTE_VALUES:
+                    counts[str(value)] = counts.get(str(value), 0) + 1
+            elif isinstance(value, (int, float)):
+                stats.attribute_sums[key] = stats.attribute_sums.get(key, 0) + value
+        _buffer.append(finished)
+        if TRACE_FILE:
+            if _trace_file is None:
+                _trace_file = open(TRACE_FILE, "a", encoding="utf-8")
+            _trace_file.write(json.dumps(finished.to_dict(), default=str) + "\n")
+            _trace_file.flush()
+    stats.latency.observe(finished.duration)
+
+
+def get_span_stats() -> Dict[str, Dict[str, Any]]:
+    with _lock:
+        items = list(_stats.items())
+    return {
+        name: {**stats.latency.snapshot(), "errors": stats.errors,
+               "attribute_sums": dict(stats.attribute_sums), "attribute_counts": dict(stats.attribute_counts)}
+        for name, stats in items
+    }
+
+
+def export_spans_jsonl(path: str) -> int:
+    """Writes the buffered spans to a JSONL file; returns how many were written."""
+    with _lock:
+        spans = list(_buffer)
+    with open(path, "w", encoding="utf-8") as f:
+        for finished in spans:
+            f.write(json.dumps(finished.to_dict(), default=str) + "\n")
+    return len(spans)
+
+
+def _label(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+
+
+def render_prometheus() -> str:
+    """Span metrics in the Prometheus text exposition format."""
+    lines = [
+        "# HELP agent_span_duration_seconds Duration of agent spans.",
+        "# TYPE agent_span_duration_seconds histogram",
+    ]
+    with _lock:
+        items = sorted(_stats.items())
+    for name, stats in items:
+        running = 0
+        for bound, bucket_count in zip(stats.latency.buckets, stats.latency.counts):
+            running += bucket_count
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            lines.append(f'agent_span_duration_seconds_bucket{{span="{_label(name)}",le="{le}"}} {running}')
+        lines.append(f'agent_span_duration_seconds_sum{{span="{_label(name)}"}} {stats.latency.total}')
+        lines.append(f'agent_span_duration_seconds_count{{span="{_label(name)}"}} {stats.latency.count}')
+
+    lines += ["# HELP agent_span_errors_total Spans that raised.", "# TYPE agent_span_errors_total counter"]
+    lines += [f'agent_span_errors_total{{span="{_label(name)}"}} {stats.errors}' for name, stats in items]
+
+    lines += ["# HELP agent_span_attribute_total Sum of numeric span attributes (chars, tokens, ...).",
+              "# TYPE agent_span_attribute_total counter"]
+    for name, stats in items:
+        for key, total in sorted(stats.attribute_sums.items()):
+            lines.append(f'agent_span_attribute_total{{span="{_label(name)}",attribute="{_label(key)}"}} {total}')
+
+    lines += ["# HELP agent_span_attribute_values_total Spans per value of categorical attributes.",
+              "# TYPE agent_span_attribute_values_total counter"]
+    for name, stats in items:
+        for key, counts in sorted(stats.attribute_counts.items()):
+            if len(counts) >= MAX_ATTRIBUTE_VALUES:  # Skip high-cardinality attributes (queries, ids)
+                continue
+            for value, count in sorted(counts.items()):
+                lines.append(f'agent_span_attribute_values_total{{span="{_label(name)}",attribute="{_label(key)}",'
+                             f'value="{_label(value)}"}} {count}')
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def start_metrics_server(port: int = 9464, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """Serves /metrics on a daemon thread."""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"---SERVICE: Metrics available at http://{host}:{port}/metrics---")
+    return server
+
+
+def format_summary() -> str:
+    """Per-span latency table, slowest total first."""
+    stats = get_span_stats()
+    if not stats:
+        return "No spans recorded."
+    rows = sorted(stats.items(), key=lambda item: item[1]["mean"] * item[1]["count"], reverse=True)
+    lines = [f"{'span':<28}{'count':>7}{'mean ms':>10}{'p95 ms':>10}{'total s':>10}  attributes"]
+    for name, s in rows:
+        attrs = ", ".join(f"{k}={v:.0f}" for k, v in s["attribute_sums"].items())
+        hits = s["attribute_counts"].get("cache_hit")
+        if hits:
+            attrs += (", " if attrs else "") + f"cache_hit={hits.get('True', 0)}/{sum(hits.values())}"
+        p95 = "inf" if s["p95"] == float("inf") else f"{s['p95'] * 1000:.0f}"
+        lines.append(f"{name:<28}{s['count']:>7}{s['mean'] * 1000:>10.1f}{'<=' + p95:>10}"
+                     f"{s['mean'] * s['count']:>10.2f}  {attrs}")
+    return "\n".join(lines)
+
+
+def print_summary():
+    print("\n" + "=" * 50)
+    print("TRACE SUMMARY")
+    print("=" * 50)
+    print(format_summary())
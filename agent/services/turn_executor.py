@@ -0,0 +1,165 @@
+# agent/services/turn_executor.py
+"""
+Runs agent turns off the caller's thread, e.g. the Streamlit script thread.
+
+    job_id = get_turn_executor().submit(agent_api, lead_id, user_input)
+    get_turn_executor().get_progress(job_id)  # node, tool, partial answer, status
+    get_turn_executor().cancel(job_id)
+
+Turns stream (AgentAPI.stream_message), so a job's progress carries the
+reply as it is generated. A session runs one turn at a time: submitting
+while its previous turn is in flight returns that turn's job.
+"""
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional
+
+TURN_WORKERS = int(os.getenv("TURN_WORKERS", "8"))
+MAX_FINISHED_TURNS = 1000  # Finished job statuses kept around for polling
+
+
+class TurnJob:
+    """Progress of one agent turn (or opening statement) running in the background."""
+
+    def __init__(self, lead_id: str, session_key: str, user_input: Optional[str]):
+        self.id = uuid.uuid4().hex[:12]
+        self.lead_id = lead_id
+        self.session_key = session_key
+        self.user_input = user_input  # None for the opening statement
+        self.status = "pending"  # pending -> running -> done | failed | cancelled
+        self.node: Optional[str] = None
+        self.tool: Optional[str] = None
+        self.partial = ""
+        self.reply: Optional[str] = None
+        self.error: Optional[str] = None
+        self.latency: Optional[Dict[str, float]] = None
+        self.submitted_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.cancelled = threading.Event()
+        self.done = threading.Event()
+
+    def on_progress(self, event: Dict[str, str]):
+        if "node" in event:
+            self.node, self.tool = event["node"], None
+        if "tool" in event:
+            self.tool = event["tool"]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "lead_id": self.lead_id,
+            "status": "cancelling" if self.cancelled.is_set() and not self.done.is_set() else self.status,
+            "node": self.node,
+            "tool": self.tool,
+            "partial": self.partial,
+            "reply": self.reply,
+            "error": self.error,
+            "latency": self.latency,
+            "elapsed": (self.finished_at or time.time()) - self.submitted_at,
+        }
+
+
+class TurnExecutor:
+    """Worker pool shared by every UI session; turns are polled and can be cancelled."""
+
+    def __init__(self, max_workers: int = TURN_WORKERS):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="turn")
+        self._jobs: Dict[str, TurnJob] = {}
+        self._active: Dict[str, TurnJob] = {}  # session key -> its in-flight turn
+        self._lock = threading.Lock()
+
+    def submit(self, agent_api, lead_id: str, user_input: Optional[str] = None) -> str:
+        """Queue a turn (the opening statement when user_input is None) and return its job id."""
+        session_key = agent_api.thread_id or lead_id
+        with self._lock:
+            active = self._active.get(session_key)
+            if active is not None:
+                return active.id
+            self._prune_finished()
+            job = TurnJob(lead_id, session_key, user_input)
+            self._jobs[job.id] = job
+            self._active[session_key] = job
+        self._executor.submit(self._run, job, agent_api)
+        return job.id
+
+    def _prune_finished(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.done.is_set()]
+        for job_id in finished[:max(0, len(finished) - MAX_FINISHED_TURNS)]:
+            del self._jobs[job_id]
+
+    def _run(self, job: TurnJob, agent_api):
+        job.status = "running"
+        try:
+            if job.user_input is None:
+                stream = agent_api.stream_opening(job.lead_id, cancel=job.cancelled, on_progress=job.on_progress)
+            else:
+                stream = agent_api.stream_message(job.lead_id, job.user_input, cancel=job.cancelled,
+                                                  on_progress=job.on_progress)
+            for delta in stream:
+                job.partial += delta
+            job.latency = agent_api.last_turn_latency
+            if job.cancelled.is_set():
+                job.status = "cancelled"
+                print(f"---SERVICE: Turn {job.id} cancelled for {job.lead_id}---")
+            else:
+                messages = agent_api.state.get('messages', []) if agent_api.state else []
+                job.reply = messages[-1]['content'] if messages and messages[-1]['role'] == 'agent' else job.partial
+                job.status = "done"
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e)
+            print(f"---SERVICE: Turn {job.id} failed for {job.lead_id}: {e}---")
+        finally:
+            job.finished_at = time.time()
+            with self._lock:
+                if self._active.get(job.session_key) is job:
+                    del self._active[job.session_key]
+            job.done.set()
+
+    def get_progress(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = self._jobs.get(job_id)
+        return job.to_dict() if job else None
+
+    def cancel(self, job_id: str) -> bool:
+        """Asks a turn to stop at its next streamed event; False if it already finished."""
+        job = self._jobs.get(job_id)
+        if job is None or job.done.is_set():
+            return False
+        job.cancelled.set()
+        return True
+
+    def wait(self, job_id: str, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Block until the turn finishes (or timeout) and return its progress."""
+        job = self._jobs.get(job_id)
+        if job is None:
+            return None
+        job.done.wait(timeout)
+        return job.to_dict()
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._active)
+
+
+_executor: Optional[TurnExecutor] = None
+_executor_lock = threading.Lock()
+
+def get_turn_executor() -> TurnExecutor:
+    """Process-wide turn executor (created on first use)."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = TurnExecutor()
+        return _executor
+
+
+def _reset_after_fork():
+    # Forked workers start their own pool (the parent's worker threads aren't copied)
+    global _executor, _executor_lock
+    _executor, _executor_lock = None, threading.Lock()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
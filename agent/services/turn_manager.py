@@ -1,7 +1,8 @@
 # agent/services/turn_manager.py
-from datetime import datetime
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
 from agent.state import ConversationState
+from agent.services.conversation_digest import update_digest
+from agent.services.turn_records import Action, TurnRecord, store_result, timestamp_ms
 
 class TurnManager:
     """Manages turn-based scratchpad entries"""
@@ -21,58 +22,62 @@ class TurnManager:
         # Add initial action - user query received
         if user_query is None:
             TurnManager.add_action_to_current_turn(
-            state, 
-            action_type="agent_opening",
-            details={"agent_response": state['messages'][-1]['content']}
-        )
+                state,
+                action_type="agent_opening",
+                text=state['messages'][-1]['content']
+            )
         else:
             TurnManager.add_action_to_current_turn(
                 state,
                 action_type="user_query",
-                details={"query": user_query}
+                text=user_query
             )
 
         return state
     
     @staticmethod
-    def add_action_to_current_turn(state: ConversationState, action_type: str, details: Dict[str, Any]) -> ConversationState:
+    def add_action_to_current_turn(state: ConversationState, action_type: str, text: Optional[str] = None,
+                                   tool: Optional[str] = None, args: Optional[Dict[str, Any]] = None,
+                                   result_id: Optional[str] = None, thought: Optional[str] = None) -> ConversationState:
         """Add an action to the current turn's action list"""
         if not state.get('current_turn_actions'):
             state['current_turn_actions'] = []
-            
-        action_entry = {
-            "timestamp": datetime.now().isoformat(),
-            "action_type": action_type,
-            "details": details
-        }
-        
-        state['current_turn_actions'].append(action_entry)
+
+        state['current_turn_actions'].append(Action(
+            kind=action_type, ts=timestamp_ms(), text=text, tool=tool,
+            args=args or None, result_id=result_id, thought=thought or None,
+        ))
         return state
-    
+
     @staticmethod
-    def finalize_turn(state: ConversationState, final_response: str) -> ConversationState:
-        """Finalize the current turn and add it to scratchpad"""
-        # Add final response to turn actions
-        TurnManager.add_action_to_current_turn(
-            state,
-            action_type="final_response", 
-            details={"response": final_response}
-        )
-        
+    def record_tool_result(state: ConversationState, tag: str, tool: str, result: str) -> str:
+        """Stores a tool result once in state['tool_results'] and returns its id"""
+        if state.get('tool_results') is None:
+            state['tool_results'] = {}
+        return store_result(state['tool_results'], tag, tool, result)
+
+    @staticmethod
+    def finalize_turn(state: ConversationState, final_response: str, ends_conversation: bool = False) -> ConversationState:
+        """Finalize the current turn, add it to scratchpad and fold it into the digest"""
+        # Add final response to turn actions (the text lives on the turn record)
+        TurnManager.add_action_to_current_turn(state, action_type="final_response")
+
         # Create comprehensive turn entry
-        turn_entry = {
-            "turn_number": state.get('turn_counter', 0),
-            "user_query": state.get('user_input', ''),
-            "actions_taken": state.get('current_turn_actions', []),
-            "final_response": final_response,
-            "turn_summary": TurnManager._generate_turn_summary(state),
-            "timestamp": datetime.now().isoformat()
-        }
-        
+        turn_entry = TurnRecord(
+            number=state.get('turn_counter', 0),
+            user_query=state.get('user_input') or '',
+            actions=state.get('current_turn_actions', []),
+            final_response=final_response,
+            summary=TurnManager._generate_turn_summary(state),
+            ends_conversation=ends_conversation,
+            ts=timestamp_ms(),
+        )
+
         # Add to scratchpad
         if not state.get('scratchpad'):
             state['scratchpad'] = []
         state['scratchpad'].append(turn_entry)
+        update_digest(state, turn_entry)
         
         # Clear current turn actions
         state['current_turn_actions'] = []
@@ -86,8 +91,8 @@ class TurnManager:
         if not actions:
             return "No actions taken"
             
-        action_types = [action['action_type'] for action in actions]
-        tools_used = [action['details'].get('tool', '') for action in actions if action['action_type'] == 'tool_execution']
+        action_types = [action.kind for action in actions]
+        tools_used = [action.tool or '' for action in actions if action.kind == 'tool_execution']
         tools_used = [tool for tool in tools_used if tool]  # Remove empty strings
         
         summary_parts = []
@@ -115,9 +120,9 @@ class TurnManager:
         summary_lines = []
         
         for turn in recent_turns:
-            turn_num = turn.get('turn_number', 0)
-            query = turn.get('user_query', '')[:50] + "..." if len(turn.get('user_query', '')) > 50 else turn.get('user_query', '')
-            turn_summary = turn.get('turn_summary', '')
+            turn_num = turn.number
+            query = turn.user_query[:50] + "..." if len(turn.user_query) > 50 else turn.user_query
+            turn_summary = turn.summary
             summary_lines.append(f"Turn {turn_num}: '{query}' → {turn_summary}")
             
         return "\n".join(summary_lines)
\ No newline at end of file
@@ -0,0 +1,117 @@
+# agent/services/turn_records.py
+"""
+Compact turn records.
+
+Tool results are stored once in `state['tool_results']` (content-addressed by
+`result_id_for`); actions and `state['retrieved_docs']` only hold the id.
+Records are slotted dataclasses so the checkpointer serializes them natively.
+Use the render/iter helpers below instead of reading result text directly.
+"""
+import hashlib
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional
+
+
+@dataclass(slots=True)
+class ToolResult:
+    tag: str       # e.g. "PRICING", tag of the tool that first produced it
+    tool: str
+    text: str
+
+
+@dataclass(slots=True)
+class Action:
+    kind: str                         # user_query, agent_opening, llm_reasoning, tool_execution, context_update, error, final_response
+    ts: int                           # Epoch ms, see timestamp_ms()
+    text: Optional[str] = None        # Query / reasoning output / error / response
+    tool: Optional[str] = None
+    args: Optional[Dict[str, Any]] = None
+    result_id: Optional[str] = None   # Key into state['tool_results']
+    thought: Optional[str] = None
+
+
+@dataclass(slots=True)
+class TurnRecord:
+    number: int
+    user_query: str
+    actions: List[Action] = field(default_factory=list)
+    final_response: str = ""
+    summary: str = ""
+    ends_conversation: bool = False
+    ts: int = 0
+
+
+_last_ts = 0
+_ts_lock = threading.Lock()
+
+def timestamp_ms() -> int:
+    """Epoch milliseconds that never go backwards within the process."""
+    global _last_ts
+    with _ts_lock:
+        _last_ts = max(time.time_ns() // 1_000_000, _last_ts + 1)
+        return _last_ts
+
+
+def result_id_for(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:10]
+
+
+def store_result(results: Dict[str, ToolResult], tag: str, tool: str, text: str) -> str:
+    """Adds a tool result to the table (once per distinct text) and returns its id."""
+    result_id = result_id_for(text)
+    if result_id not in results:
+        results[result_id] = ToolResult(tag=tag, tool=tool, text=text)
+    return result_id
+
+
+def iter_retrieved_docs(state) -> Iterator[str]:
+    """Retrieved documents as "[TAG] text", in retrieval order."""
+    results = state.get('tool_results') or {}
+    for result_id in state.get('retrieved_docs') or []:
+        result = results.get(result_id)
+        if result is not None:
+            yield f"[{result.tag}] {result.text}"
+
+
+def render_action(action: Action, results: Optional[Dict[str, ToolResult]] = None) -> str:
+    """One-line description of an action; tool results are referenced, not inlined."""
+    parts = [action.kind]
+    if action.tool:
+        args = ", ".join(f"{k}={v!r}" for k, v in (action.args or {}).items())
+        parts.append(f"{action.tool}({args})")
+    if action.thought:
+        parts.append(f"thought: {action.thought}")
+    if action.result_id:
+        result = (results or {}).get(action.result_id)
+        size = f", {len(result.text)} chars" if result else ""
+        parts.append(f"-> result [{action.result_id}{size}] (see retrieved knowledge)")
+    if action.text:
+        parts.append(action.text)
+    return " | ".join(parts)
+
+
+def turn_to_dict(turn: TurnRecord, results: Optional[Dict[str, ToolResult]] = None) -> Dict[str, Any]:
+    """Plain-dict view of a turn for the UI, logs and JSON export (tool results inlined)."""
+    results = results or {}
+    return {
+        "turn_number": turn.number,
+        "user_query": turn.user_query,
+        "actions_taken": [
+            {
+                "timestamp": action.ts,
+                "action_type": action.kind,
+                **({"text": action.text} if action.text else {}),
+                **({"tool": action.tool} if action.tool else {}),
+                **(action.args or {}),
+                **({"result": results[action.result_id].text} if action.result_id in results else {}),
+                **({"thought": action.thought} if action.thought else {}),
+            }
+            for action in turn.actions
+        ],
+        "final_response": turn.final_response,
+        "turn_summary": turn.summary,
+        "ends_conversation": turn.ends_conversation,
+        "timestamp": turn.ts,
+    }
@@ -22,17 +22,21 @@ class ConversationState(TypedDict):
     buying_signals_detected: Optional[List[str]]
 
     #turn tracking
-    current_turn_actions: Optional[List[Dict[str, Any]]]  # Track actions in current turn
+    current_turn_actions: Optional[List[Any]]  # Action records for the current turn
     turn_counter: Optional[int]  # Track which turn we're on
 
     # Context Components
     long_term_memory: Dict[str, Any]
     messages: List[Dict]
-    retrieved_docs: List[str]
-    scratchpad: List[Dict[str, Any]]  # Changed to store structured turn data
+    retrieved_docs: List[str]  # Result ids into tool_results, in retrieval order
+    tool_results: Dict[str, Any]  # result_id -> ToolResult, each retrieved text stored once
+    scratchpad: List[Any]  # TurnRecord per finished turn
+    digest: Dict[str, Any]  # Bounded per-turn summary consumed by finalization
 
     # Data loaded for the session
     lead_data: Dict
     company_data: Dict
+    precedents: Optional[List[Dict]]  # Similar leads shown to the opening prompt (OPENING_PRECEDENTS)
 
-    is_end: bool
\ No newline at end of file
+    is_end: bool
+    finalization_job_id: Optional[str]  # Background memory synthesis job, set when the call ends
\ No newline at end of file
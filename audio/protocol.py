@@ -0,0 +1,200 @@
+"""
+Length-prefixed binary framing for the voice gateway, plus an asyncio client.
+
+Every message is a 9-byte header followed by its payload:
+
+    type (u8) | stream id (u32) | payload length (u32)      network byte order
+
+    CONTROL      JSON: commands, responses and errors
+    TRANSCRIPT   JSON {"text": "...", "final": bool}
+    PCM          16-bit little-endian mono samples sent to the gateway
+    TTS_AUDIO    16-bit little-endian mono samples of synthesized speech
+    AUDIO_END    empty; no more audio on this stream (from the gateway: stop sending it)
+
+A request opens a stream: the client picks a new stream id and sends a
+CONTROL command on it. Everything belonging to that request (audio chunks,
+partial and final transcripts, the response) carries the same id, so
+requests are pipelined on one connection and may finish in any order.
+
+    client = await VoiceClient.connect()
+    text = await client.transcribe(mic_chunks(), on_partial=print)
+    await client.close()
+"""
+import asyncio
+import itertools
+import json
+import os
+import struct
+from typing import AsyncIterable, Callable, Iterable, NamedTuple, Optional, Union
+
+HOST = os.getenv("VOICE_HOST", "127.0.0.1")
+PORT = int(os.getenv("VOICE_PORT", "5001"))
+
+CONTROL = 1
+TRANSCRIPT = 2
+PCM = 3
+TTS_AUDIO = 4
+AUDIO_END = 5
+FRAME_TYPES = {CONTROL, TRANSCRIPT, PCM, TTS_AUDIO, AUDIO_END}
+
+HEADER = struct.Struct("!BII")
+MAX_FRAME_BYTES = 4 * 1024 * 1024
+AUDIO_CHUNK_SAMPLES = 1600  # 100 ms at 16 kHz
+
+
+class ProtocolError(Exception):
+    pass
+
+
+class Frame(NamedTuple):
+    type: int
+    stream: int
+    payload: bytes = b""
+
+    def json(self) -> dict:
+        return json.loads(self.payload)
+
+
+def encode_frame(frame_type: int, stream: int, payload: bytes = b"") -> bytes:
+    if len(payload) > MAX_FRAME_BYTES:
+        raise ProtocolError(f"Frame of {len(payload)} bytes exceeds {MAX_FRAME_BYTES}")
+    return HEADER.pack(frame_type, stream, len(payload)) + payload
+
+
+def encode_json(frame_type: int, stream: int, message: dict) -> bytes:
+    return encode_frame(frame_type, stream, json.dumps(message).encode("utf-8"))
+
+
+async def read_frame(reader: asyncio.StreamReader) -> Optional[Frame]:
+    """Next frame, or None once the peer has closed the connection."""
+    try:
+        header = await reader.readexactly(HEADER.size)
+        frame_type, stream, length = HEADER.unpack(header)
+        if frame_type not in FRAME_TYPES or length > MAX_FRAME_BYTES:
+            raise ProtocolError(f"Bad frame header: type {frame_type}, {length} bytes")
+        payload = await reader.readexactly(length) if length else b""
+    except (asyncio.IncompleteReadError, ConnectionError):
+        return None
+    return Frame(frame_type, stream, payload)
+
+
+def pcm_chunks(samples, chunk_samples: int = AUDIO_CHUNK_SAMPLES) -> Iterable[bytes]:
+    """Splits an int16 numpy array into PCM frame payloads."""
+    data = samples.astype("<i2", copy=False).tobytes()
+    step = chunk_samples * 2
+    return (data[i:i + step] for i in range(0, len(data), step))
+
+
+class VoiceClient:
+    """asyncio client for the voice gateway; concurrent calls share one connection."""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._reader = reader
+        self._writer = writer
+        self._stream_ids = itertools.count(1)
+        self._streams = {}  # stream id -> asyncio.Queue of Frames (None once the connection is gone)
+        self._closed = False
+        self._dispatcher = asyncio.create_task(self._dispatch())
+
+    @classmethod
+    async def connect(cls, host: str = HOST, port: int = PORT) -> "VoiceClient":
+        reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer)
+
+    async def _dispatch(self):
+        try:
+            while (frame := await read_frame(self._reader)) is not None:
+                queue = self._streams.get(frame.stream)
+                if queue is not None:
+                    queue.put_nowait(frame)
+        except ProtocolError as e:
+            print(f"❌ Voice gateway sent a bad frame: {e}")
+        finally:
+            self._closed = True
+            for queue in self._streams.values():
+                queue.put_nowait(None)
+
+    def _open(self, command: str, **fields):
+        if self._closed:
+            raise ConnectionError("Voice gateway closed the connection")
+        stream = next(self._stream_ids)
+        self._streams[stream] = asyncio.Queue()
+        self._writer.write(encode_json(CONTROL, stream, {"command": command, **fields}))
+        return stream
+
+    async def _next(self, stream: int) -> Frame:
+        frame = await self._streams[stream].get()
+        if frame is None:
+            raise ConnectionError("Voice gateway closed the connection")
+        if frame.type == CONTROL and "error" in (message := frame.json()):
+            raise RuntimeError(f"Voice gateway error: {message['error']} {message.get('detail', '')}".strip())
+        return frame
+
+    async def _transcript(self, stream: int, on_partial: Optional[Callable[[str], None]],
+                          sender: Optional[asyncio.Task] = None) -> str:
+        while True:
+            frame = await self._next(stream)
+            if frame.type == AUDIO_END and sender is not None:
+                sender.cancel()  # the gateway has the whole utterance
+                continue
+            if frame.type != TRANSCRIPT:
+                continue
+            message = frame.json()
+            if message.get("final"):
+                return message["text"]
+            if on_partial:
+                on_partial(message["text"])
+
+    async def request(self, command: str, **fields) -> dict:
+        """Sends a control command (e.g. "health") and returns its response."""
+        stream = self._open(command, **fields)
+        try:
+            while (frame := await self._next(stream)).type != CONTROL:
+                pass
+            return frame.json()
+        finally:
+            del self._streams[stream]
+
+    async def listen(self, on_partial: Optional[Callable[[str], None]] = None) -> str:
+        """Transcribes the next utterance from the gateway machine's microphone."""
+        stream = self._open("listen", partials=on_partial is not None)
+        try:
+            return await self._transcript(stream, on_partial)
+        finally:
+            del self._streams[stream]
+
+    async def transcribe(self, chunks: Union[Iterable[bytes], AsyncIterable[bytes]], sample_rate: int = 16000,
+                         on_partial: Optional[Callable[[str], None]] = None, endpoint: bool = True) -> str:
+        """
+        Streams 16-bit PCM chunks to the gateway while reading transcripts back.
+        With endpoint=True the gateway stops at the end of the first utterance
+        and sends AUDIO_END, after which the rest of `chunks` isn't sent;
+        otherwise everything is transcribed.
+        """
+        stream = self._open("transcribe", sample_rate=sample_rate, endpoint=endpoint,
+                            partials=on_partial is not None)
+        sender = asyncio.create_task(self._send_audio(stream, chunks))
+        try:
+            return await self._transcript(stream, on_partial, sender)
+        finally:
+            sender.cancel()
+            del self._streams[stream]
+
+    async def _send_audio(self, stream: int, chunks):
+        if hasattr(chunks, "__aiter__"):
+            async for chunk in chunks:
+                self._writer.write(encode_frame(PCM, stream, chunk))
+                await self._writer.drain()
+        else:
+            for chunk in chunks:
+                self._writer.write(encode_frame(PCM, stream, chunk))
+                await self._writer.drain()
+                await asyncio.sleep(0)  # drain() doesn't yield until the socket backs up; let AUDIO_END in
+        self._writer.write(encode_frame(AUDIO_END, stream))
+        await self._writer.drain()
+
+    async def close(self):
+        if not self._writer.is_closing():
+            self._writer.write(encode_json(CONTROL, 0, {"command": "quit"}))
+            self._writer.close()
+        self._dispatcher.cancel()
@@ -1,9 +1,14 @@
+import numpy as np
 import sounddevice as sd
-import soundfile as sf
 
-def record_audio(filename='audio.wav', duration=5, samplerate=16000):
+def record_audio(filename=None, duration=5, samplerate=16000) -> np.ndarray:
+    """Records `duration` seconds of mono float32 audio; also saved to `filename` if given."""
     print("🎤 Recording... Speak now")
-    audio = sd.rec(int(samplerate * duration), samplerate=samplerate, channels=1)
+    audio = np.empty((int(samplerate * duration), 1), dtype=np.float32)
+    sd.rec(out=audio, samplerate=samplerate, channels=1)
     sd.wait()
-    sf.write(filename, audio, samplerate)
-    print("✅ Recording saved.")
+    if filename:
+        import soundfile as sf
+        sf.write(filename, audio, samplerate)
+        print("✅ Recording saved.")
+    return audio[:, 0]
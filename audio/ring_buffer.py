@@ -0,0 +1,57 @@
+"""
+Preallocated audio ring buffer for the capture path.
+
+Samples are written twice, at i % capacity and i % capacity + capacity, so
+the most recent `capacity` samples are always one contiguous slice of the
+backing array: readers get NumPy views (no copy, no concatenation) that can
+go straight to the STT engine.
+
+    ring = AudioRingBuffer(seconds=60)
+    ring.write(block)                      # from the sounddevice callback
+    samples = ring.view(start, ring.end)   # absolute sample indices
+"""
+import numpy as np
+
+
+class AudioRingBuffer:
+    """Single-writer mono ring buffer addressed by absolute sample index."""
+
+    def __init__(self, seconds: float = 60.0, sample_rate: int = 16000, dtype=np.float32):
+        self.sample_rate = sample_rate
+        self.capacity = int(seconds * sample_rate)
+        self._buffer = np.zeros(2 * self.capacity, dtype=dtype)
+        self.end = 0  # absolute index one past the newest sample
+
+    @property
+    def start(self) -> int:
+        """Oldest sample index still held."""
+        return max(0, self.end - self.capacity)
+
+    def write(self, block: np.ndarray):
+        """Appends a block of samples (copied into the preallocated array, both halves)."""
+        block = block.reshape(-1)
+        if len(block) > self.capacity:
+            self.end += len(block) - self.capacity
+            block = block[-self.capacity:]
+        n, capacity = len(block), self.capacity
+        pos = self.end % capacity
+        first = min(n, capacity - pos)
+        self._buffer[pos:pos + first] = block[:first]
+        self._buffer[pos + capacity:pos + capacity + first] = block[:first]
+        if first < n:
+            rest = n - first
+            self._buffer[:rest] = block[first:]
+            self._buffer[capacity:capacity + rest] = block[first:]
+        self.end += n
+
+    def view(self, start: int, end: int = None) -> np.ndarray:
+        """Samples [start, end) as a view; raises if they were already overwritten."""
+        end = self.end if end is None else end
+        if start < self.start or end > self.end or start > end:
+            raise IndexError(f"samples [{start}, {end}) not in buffer [{self.start}, {self.end})")
+        offset = start % self.capacity
+        return self._buffer[offset:offset + (end - start)]
+
+    def latest(self, n: int) -> np.ndarray:
+        """The newest n samples (fewer if less has been written)."""
+        return self.view(max(self.start, self.end - n))
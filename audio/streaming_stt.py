@@ -0,0 +1,126 @@
+"""
+Utterance-at-a-time transcription of live audio.
+
+A producer (the sounddevice callback, or a network client) writes PCM into
+an AudioRingBuffer; `StreamingTranscriber.run()` endpoints the utterance
+with EnergyVAD and, while the lead is still speaking, re-transcribes a
+sliding window over the newest audio and reports it as a partial
+transcript. The final transcript covers the whole utterance.
+
+`advance()` only does the (cheap) VAD bookkeeping, so a caller can run it
+as audio arrives and hand just the whisper calls (`emit_partial()`,
+`final_transcript()`) to worker threads.
+
+With endpoint=False (audio uploaded by a client) pauses don't end the
+utterance: everything written until stop_event is set is transcribed.
+
+    transcriber = StreamingTranscriber(stt, ring, on_partial=print)
+    text = transcriber.run()
+"""
+import os
+import threading
+import time
+from typing import Callable, Optional
+
+from audio.vad import EnergyVAD
+
+VOICE_PARTIAL_INTERVAL = float(os.getenv("VOICE_PARTIAL_INTERVAL", "0.6"))  # seconds of audio between partials
+VOICE_PARTIAL_WINDOW = float(os.getenv("VOICE_PARTIAL_WINDOW", "8"))       # seconds transcribed per partial
+# Seconds (of audio, or of wall-clock time when audio stops arriving) to wait for speech to start
+VOICE_NO_SPEECH_TIMEOUT = float(os.getenv("VOICE_NO_SPEECH_TIMEOUT", "15"))
+POLL_INTERVAL = 0.05
+
+
+class StreamingTranscriber:
+    """Endpoints and transcribes the next utterance written to `ring`."""
+
+    def __init__(self, stt, ring, on_partial: Optional[Callable[[str], None]] = None,
+                 partial_interval: float = VOICE_PARTIAL_INTERVAL, partial_window: float = VOICE_PARTIAL_WINDOW,
+                 no_speech_timeout: float = VOICE_NO_SPEECH_TIMEOUT, start: Optional[int] = None,
+                 endpoint: bool = True, **vad_options):
+        self.stt = stt
+        self.ring = ring
+        self.on_partial = on_partial
+        self.endpoint = endpoint
+        start = ring.end if start is None else start
+        rate = ring.sample_rate
+        self.vad = EnergyVAD(rate, start=start, **vad_options)
+        self.partial_interval = int(partial_interval * rate)
+        self.partial_window = int(partial_window * rate)
+        self.no_speech_timeout = no_speech_timeout
+        self.started_at = start
+        self.opened_at = time.monotonic()
+        self._last_partial_at = None
+        self._last_partial = ""
+        self.partials = 0
+        self.inference_seconds: Optional[float] = None  # whisper time of the final transcript
+        self.endpoint_latency: Optional[float] = None   # end of speech to final transcript, incl. the silence hangover
+
+    def advance(self) -> bool:
+        """Runs VAD over newly written audio (no whisper calls); True once the utterance has ended."""
+        ring = self.ring
+        if self.vad.process(ring) and self.endpoint:
+            return True
+        if not self.vad.started:
+            return self.endpoint and self._no_speech_timed_out()
+        if ring.end - self.vad.speech_start >= ring.capacity - self.vad.frame:
+            # Don't let the start of the utterance be overwritten
+            self.vad.force_end(ring.end)
+            return True
+        return False
+
+    def partial_due(self) -> bool:
+        if not self.on_partial or not self.vad.started or self.vad.ended:
+            return False
+        return self._last_partial_at is None or self.ring.end - self._last_partial_at >= self.partial_interval
+
+    def _no_speech_timed_out(self) -> bool:
+        audio_seconds = (self.ring.end - self.started_at) / self.ring.sample_rate
+        # Wall-clock too: a client that sends no audio at all never adds up to the timeout
+        return max(audio_seconds, time.monotonic() - self.opened_at) >= self.no_speech_timeout
+
+    def take_partial_window(self):
+        """The newest window of the utterance (a view of the ring); marks the partial as taken."""
+        end = self.ring.end
+        self._last_partial_at = end
+        return self.ring.view(max(self.vad.speech_start, end - self.partial_window), end)
+
+    def emit_partial(self, window=None):
+        """Transcribes `window` (default: the newest window) and reports it if it changed."""
+        if window is None:
+            window = self.take_partial_window()
+        text = self.stt.transcribe_pcm(window, self.ring.sample_rate)
+        if text and text != self._last_partial:
+            self._last_partial = text
+            self.partials += 1
+            if self.on_partial:  # cleared once the final transcript is under way
+                self.on_partial(text)
+
+    def final_transcript(self) -> str:
+        """Transcribes the whole utterance (everything written, with endpoint=False)."""
+        if not self.endpoint:
+            start = max(self.started_at, self.ring.start)
+            return self.stt.transcribe_pcm(self.ring.view(start), self.ring.sample_rate)
+        if not self.vad.started:
+            return ""
+        self.vad.force_end(self.ring.end)
+        return self.stt.transcribe_pcm(self.ring.view(self.vad.speech_start, self.vad.speech_end), self.ring.sample_rate)
+
+    def run(self, stop_event: Optional[threading.Event] = None) -> str:
+        """Blocks until the utterance is endpointed (or stop_event is set) and returns its transcript."""
+        while not self.advance():
+            if stop_event is not None and stop_event.is_set():
+                break
+            if self.partial_due():
+                self.emit_partial()
+            else:
+                time.sleep(POLL_INTERVAL)
+        # Audio heard after the speech ended: the VAD_SILENCE_MS hangover (less the padding kept)
+        decided_at = self.ring.end
+        start = time.perf_counter()
+        text = self.final_transcript()
+        self.inference_seconds = time.perf_counter() - start
+        if self.vad.started:
+            hangover = max(0, decided_at - self.vad.speech_end) / self.ring.sample_rate
+            self.endpoint_latency = hangover + self.inference_seconds
+        return text
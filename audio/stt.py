@@ -1,9 +1,108 @@
-from whisper_cpp_python import Whisper
+"""
+Resident whisper.cpp speech-to-text.
+
+The model is loaded once (whisper_cpp_python bindings) and reused for every
+utterance; audio goes in as 16 kHz mono PCM arrays, so there is no
+whisper-cli process or WAV file per utterance.
+
+    stt = SpeechToText(contexts=2)        # one whisper context per concurrent transcription
+    text = stt.transcribe_pcm(samples)    # int16 or float32 numpy array
+    stt.stats                             # model load vs per-utterance inference time
+"""
+import os
+import queue
+import threading
+import time
+import wave
+
+import numpy as np
+
+WHISPER_MODEL = os.getenv("WHISPER_MODEL", "models/ggml-base.en.bin")
+WHISPER_THREADS = int(os.getenv("WHISPER_THREADS", str(min(4, os.cpu_count() or 1))))
+WHISPER_LANGUAGE = os.getenv("WHISPER_LANGUAGE", "en")
+SAMPLE_RATE = 16000  # whisper.cpp's input rate
+
+
+def to_float32(samples: np.ndarray, sample_rate: int = SAMPLE_RATE) -> np.ndarray:
+    """Mono float32 samples in [-1, 1] at 16 kHz; float32 input at 16 kHz is passed through uncopied."""
+    samples = np.asarray(samples)
+    if samples.ndim > 1:
+        samples = samples.mean(axis=1) if samples.shape[1] > 1 else samples[:, 0]
+    if samples.dtype == np.int16:
+        samples = samples.astype(np.float32) / 32768.0
+    elif samples.dtype != np.float32:
+        samples = samples.astype(np.float32)
+    if sample_rate != SAMPLE_RATE and len(samples):
+        positions = np.arange(0, len(samples), sample_rate / SAMPLE_RATE)
+        samples = np.interp(positions, np.arange(len(samples)), samples).astype(np.float32)
+    return np.ascontiguousarray(samples)
+
 
 class SpeechToText:
-    def __init__(self, model_path="./models/ggml-base.en.bin"):
-        self.whisper = Whisper(model_path)
+    """whisper.cpp model kept in memory; each context transcribes one utterance at a time."""
+
+    def __init__(self, model_path: str = WHISPER_MODEL, contexts: int = 1, n_threads: int = WHISPER_THREADS):
+        from whisper_cpp_python import Whisper
+
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"Model not found: {model_path}")
+        start = time.perf_counter()
+        self._contexts = queue.Queue()
+        for _ in range(contexts):
+            whisper = Whisper(model_path, n_threads=n_threads)
+            whisper.params.language = WHISPER_LANGUAGE.encode("utf-8")
+            whisper.params.temperature = 0.0
+            self._contexts.put(whisper)
+        self.model_path = model_path
+        self.load_seconds = time.perf_counter() - start
+        self.utterances = 0
+        self.audio_seconds = 0.0
+        self.inference_seconds = 0.0
+        self.last_inference_seconds = 0.0
+        self._stats_lock = threading.Lock()
+        print(f"---SERVICE: Whisper model {model_path} loaded in {self.load_seconds * 1000:.0f} ms "
+              f"({contexts} context(s), {n_threads} threads each)---")
+
+    def transcribe_pcm(self, samples: np.ndarray, sample_rate: int = SAMPLE_RATE) -> str:
+        """Transcribes mono int16/float32 PCM; blocks while every context is busy."""
+        audio = to_float32(samples, sample_rate)
+        if not len(audio):
+            return ""
+        whisper = self._contexts.get()
+        try:
+            start = time.perf_counter()
+            # Whisper.transcribe only takes a file path; _full runs whisper_full on the samples
+            try:
+                result = whisper._full(audio)
+            except Exception as e:
+                raise RuntimeError(f"Whisper error: {e}") from e
+            elapsed = time.perf_counter() - start
+        finally:
+            self._contexts.put(whisper)
+
+        with self._stats_lock:
+            self.utterances += 1
+            self.audio_seconds += len(audio) / SAMPLE_RATE
+            self.inference_seconds += elapsed
+            self.last_inference_seconds = elapsed
+        return result["text"].replace("[BLANK_AUDIO]", "").strip()
 
     def transcribe(self, file_path: str) -> str:
-        result = self.whisper.transcribe(file_path)
-        return result["text"]
+        """Transcribes a 16-bit PCM WAV file."""
+        with wave.open(file_path, "rb") as wav:
+            frames = wav.readframes(wav.getnframes())
+            samples = np.frombuffer(frames, dtype=np.int16).reshape(-1, wav.getnchannels())
+            return self.transcribe_pcm(samples, wav.getframerate())
+
+    @property
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return {
+                "model": self.model_path,
+                "load_ms": round(self.load_seconds * 1000, 1),
+                "utterances": self.utterances,
+                "last_inference_ms": round(self.last_inference_seconds * 1000, 1),
+                "mean_inference_ms": round(self.inference_seconds / self.utterances * 1000, 1) if self.utterances else 0.0,
+                # Seconds of inference per second of audio
+                "realtime_factor": round(self.inference_seconds / self.audio_seconds, 3) if self.audio_seconds else 0.0,
+            }
@@ -1,27 +1,222 @@
+"""
+Kokoro text-to-speech, streamed sentence by sentence.
+
+`speak_stream` takes text while it is still being generated (e.g. the
+deltas of AgentAPI.stream_message), cuts it into sentences as each one
+completes and synthesizes every sentence on a worker thread while the
+previous one plays. Audio is queued in memory for one continuous
+sounddevice output stream; nothing touches disk. Time to first audio is
+the time to the first complete sentence plus its synthesis, not the
+synthesis of the whole reply.
+
+    tts = TextToSpeech()
+    reply = tts.speak_stream(agent_api.stream_message(lead_id, text))
+    tts.last_stats     # first-audio latency, per-sentence synthesis time
+"""
 import os
+import queue
+import re
+import threading
 import time
+from collections import deque
+from typing import Callable, Iterable, List, Optional
+
+import numpy as np
+import sounddevice as sd
 import torch
 from kokoro import KPipeline
-import soundfile as sf
-from playsound import playsound
+
+TTS_VOICE = os.getenv("TTS_VOICE", "Kokoro-82M/voices/af_heart.pt")
+TTS_SAMPLE_RATE = 24000  # Kokoro's output rate
+TTS_MIN_SENTENCE_CHARS = int(os.getenv("TTS_MIN_SENTENCE_CHARS", "12"))   # "Hi!" waits for the next sentence
+TTS_MAX_SENTENCE_CHARS = int(os.getenv("TTS_MAX_SENTENCE_CHARS", "250"))  # long run-ons are cut at a comma
+
+# End of a sentence (punctuation, closing quotes/brackets, then whitespace) or a paragraph break
+SENTENCE_END = re.compile(r"(?<=[.!?…])[\"')\]*]*\s+|\n\s*\n")
+
+
+class SentenceSplitter:
+    """Cuts streamed text into sentences as soon as each one is complete."""
+
+    def __init__(self, min_chars: int = TTS_MIN_SENTENCE_CHARS, max_chars: int = TTS_MAX_SENTENCE_CHARS):
+        self.min_chars = min_chars
+        self.max_chars = max_chars
+        self._buffer = ""
+
+    def feed(self, text: str) -> List[str]:
+        """Adds streamed text; returns the sentences it completed."""
+        self._buffer += text
+        sentences = []
+        while (cut := self._next_cut()) is not None:
+            sentence, self._buffer = self._buffer[:cut].strip(), self._buffer[cut:]
+            if sentence:
+                sentences.append(sentence)
+        return sentences
+
+    def flush(self) -> List[str]:
+        """The unfinished remainder, once the text stream has ended."""
+        rest, self._buffer = self._buffer.strip(), ""
+        return [rest] if rest else []
+
+    def _next_cut(self) -> Optional[int]:
+        for match in SENTENCE_END.finditer(self._buffer):
+            if len(self._buffer[:match.start()].strip()) >= self.min_chars:
+                return match.end()
+        if len(self._buffer) > self.max_chars:
+            cut = self._buffer.rfind(", ", 0, self.max_chars)
+            if cut <= 0:
+                cut = self._buffer.rfind(" ", 0, self.max_chars)
+            return cut + 1 if cut > 0 else self.max_chars
+        return None
+
+
+class AudioPlayer:
+    """One continuous output stream, played from an in-memory queue of float32 blocks."""
+
+    def __init__(self, sample_rate: int = TTS_SAMPLE_RATE):
+        self.sample_rate = sample_rate
+        self._blocks = deque()
+        self._offset = 0  # samples of _blocks[0] already played
+        self._lock = threading.Lock()
+        self._drained = threading.Event()
+        self._drained.set()
+        self.first_audio_at: Optional[float] = None  # perf_counter of the first sample played since reset()
+        self._stream = sd.OutputStream(samplerate=sample_rate, channels=1, dtype='float32',
+                                       callback=self._callback)
+        self._stream.start()
+
+    def _callback(self, outdata, frames, time_info, status):
+        """Callback from sounddevice: copy queued audio out, silence when there is none."""
+        out = outdata[:, 0]
+        filled = 0
+        with self._lock:
+            while filled < frames and self._blocks:
+                block = self._blocks[0]
+                n = min(frames - filled, len(block) - self._offset)
+                out[filled:filled + n] = block[self._offset:self._offset + n]
+                filled += n
+                self._offset += n
+                if self._offset == len(block):
+                    self._blocks.popleft()
+                    self._offset = 0
+            if filled and self.first_audio_at is None:
+                self.first_audio_at = time.perf_counter()
+            if not self._blocks:
+                self._drained.set()
+        out[filled:] = 0
+
+    def play(self, audio: np.ndarray):
+        """Queues audio behind whatever is already playing."""
+        if not len(audio):
+            return
+        with self._lock:
+            self._blocks.append(np.ascontiguousarray(audio, dtype=np.float32))
+            self._drained.clear()
+
+    def reset(self):
+        self.first_audio_at = None
+
+    def wait(self):
+        """Blocks until everything queued has played."""
+        self._drained.wait()
+        time.sleep(self._stream.latency)  # the last block is still in the device buffer
+
+    def stop(self):
+        """Drops queued audio."""
+        with self._lock:
+            self._blocks.clear()
+            self._offset = 0
+            self._drained.set()
+
+    def close(self):
+        self.stop()
+        self._stream.close()
+
 
 class TextToSpeech:
-    def __init__(self):
+    def __init__(self, voice: str = TTS_VOICE):
         self.engine = KPipeline(lang_code='a', device='cpu')
-        self.output_dir = "tts_outputs"
-        os.makedirs(self.output_dir, exist_ok=True)
-        self.counter = 0
+        self.voice = voice
+        self.sample_rate = TTS_SAMPLE_RATE
+        self._player = None
+        self.last_stats = {}
+
+    @property
+    def player(self) -> AudioPlayer:
+        # The output stream stays open between replies
+        if self._player is None:
+            self._player = AudioPlayer(self.sample_rate)
+        return self._player
+
+    def synthesize(self, text: str) -> np.ndarray:
+        """Float32 audio for one sentence."""
+        with torch.inference_mode():
+            parts = [np.asarray(audio, dtype=np.float32)
+                     for _, _, audio in self.engine(text, voice=self.voice) if audio is not None]
+        return np.concatenate(parts) if parts else np.zeros(0, dtype=np.float32)
 
     def speak(self, text: str):
-        # Generate speech audio
-        generator = self.engine(text, voice='Kokoro-82M/voices/af_heart.pt')
-        
-        for _, (gs, ps, audio) in enumerate(generator):
-            filename = os.path.join(self.output_dir, f"{self.counter}_{int(time.time()*1000)}.wav")
-            sf.write(filename, audio, 24000)
-            print(f"💾 Saved: {filename} | GS: {gs}, PS: {ps}")
-            
-            # Play audio immediately
-            playsound(filename)
-
-            self.counter += 1
+        self.speak_stream([text])
+
+    def speak_stream(self, text_stream: Iterable[str], on_text: Callable[[str], None] = None) -> str:
+        """
+        Speaks text as it arrives, sentence by sentence, and returns all of it once
+        it has been played. on_text sees each piece of text as it is consumed.
+        """
+        player = self.player
+        player.reset()
+        start = time.perf_counter()
+        sentences = queue.Queue()
+        synthesis_seconds = []
+        interrupted = threading.Event()
+
+        def synthesize_sentences():
+            # Synthesizes sentence n+1 while sentence n plays
+            while (sentence := sentences.get()) is not None and not interrupted.is_set():
+                began = time.perf_counter()
+                try:
+                    audio = self.synthesize(sentence)
+                except Exception as e:
+                    print(f"❌ TTS failed for {sentence!r}: {e}")
+                    continue
+                synthesis_seconds.append(time.perf_counter() - began)
+                if interrupted.is_set():
+                    break
+                player.play(audio)
+
+        synthesizer = threading.Thread(target=synthesize_sentences, daemon=True)
+        synthesizer.start()
+        splitter = SentenceSplitter()
+        text = []
+        completed = False
+        try:
+            for piece in text_stream:
+                text.append(piece)
+                if on_text:
+                    on_text(piece)
+                for sentence in splitter.feed(piece):
+                    sentences.put(sentence)
+            for sentence in splitter.flush():
+                sentences.put(sentence)
+            completed = True
+        finally:
+            if not completed:  # interrupted: stop talking, queued sentences included
+                interrupted.set()
+            sentences.put(None)
+            synthesizer.join()
+            if not completed:
+                player.stop()  # after the join, so nothing is queued behind the stop
+        player.wait()
+
+        self.last_stats = {
+            "first_audio_ms": round((player.first_audio_at - start) * 1000, 1) if player.first_audio_at else None,
+            "first_sentence_synthesis_ms": round(synthesis_seconds[0] * 1000, 1) if synthesis_seconds else None,
+            "sentences": len(synthesis_seconds),
+            "total_ms": round((time.perf_counter() - start) * 1000, 1),
+        }
+        return "".join(text)
+
+    def close(self):
+        if self._player is not None:
+            self._player.close()
+            self._player = None
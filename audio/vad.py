@@ -0,0 +1,111 @@
+"""
+Energy-based voice activity detection and utterance endpointing.
+
+Audio is scored in 30 ms frames by RMS level (dBFS). A frame is speech when
+it is louder than both VAD_THRESHOLD_DB and the noise floor plus
+VAD_MARGIN_DB; the floor is measured over the first 300 ms and then tracks
+the non-speech frames. An utterance starts after VAD_MIN_SPEECH_MS of speech and
+ends after VAD_SILENCE_MS of silence; both boundaries are padded so word
+onsets and tails aren't clipped.
+
+    vad = EnergyVAD()
+    vad.process(ring)                # call as audio arrives
+    if vad.ended:
+        samples = ring.view(vad.speech_start, vad.speech_end)
+"""
+import os
+from typing import Optional
+
+import numpy as np
+
+VAD_FRAME_MS = 30
+VAD_THRESHOLD_DB = float(os.getenv("VAD_THRESHOLD_DB", "-45"))
+VAD_MARGIN_DB = float(os.getenv("VAD_MARGIN_DB", "10"))
+VAD_MIN_SPEECH_MS = int(os.getenv("VAD_MIN_SPEECH_MS", "150"))
+VAD_SILENCE_MS = int(os.getenv("VAD_SILENCE_MS", "700"))
+VAD_PADDING_MS = 200
+VAD_CALIBRATION_MS = 300  # the noise floor starts as the quietest frame in this window
+NOISE_FLOOR_ALPHA = 0.05  # EMA weight of each non-speech frame in the noise floor
+
+
+def frame_db(frames: np.ndarray) -> np.ndarray:
+    """RMS level in dBFS of each row of float32 [-1, 1] samples."""
+    rms = np.sqrt(np.mean(np.square(frames, dtype=np.float32), axis=1))
+    return 20 * np.log10(rms + 1e-10)
+
+
+class EnergyVAD:
+    """Finds the start and end of one utterance in an AudioRingBuffer."""
+
+    def __init__(self, sample_rate: int = 16000, start: int = 0, silence_ms: int = VAD_SILENCE_MS,
+                 threshold_db: float = VAD_THRESHOLD_DB, margin_db: float = VAD_MARGIN_DB,
+                 min_speech_ms: int = VAD_MIN_SPEECH_MS):
+        self.frame = sample_rate * VAD_FRAME_MS // 1000
+        self.threshold_db = threshold_db
+        self.margin_db = margin_db
+        self.min_speech_frames = max(1, min_speech_ms // VAD_FRAME_MS)
+        self.silence_frames = max(1, silence_ms // VAD_FRAME_MS)
+        self.padding = sample_rate * VAD_PADDING_MS // 1000
+        self.origin = start       # nothing before this index belongs to the utterance
+        self.position = start     # next sample index to score
+        self.noise_floor = threshold_db - margin_db
+        self._calibration_frames = VAD_CALIBRATION_MS // VAD_FRAME_MS
+        self.speech_start: Optional[int] = None
+        self.speech_end: Optional[int] = None
+        self._run = 0             # consecutive speech frames (before start) / silent frames (after)
+        self._last_speech_end = start
+
+    @property
+    def started(self) -> bool:
+        return self.speech_start is not None
+
+    @property
+    def ended(self) -> bool:
+        return self.speech_end is not None
+
+    def process(self, ring) -> bool:
+        """Scores the complete frames written since the last call; True once the utterance ended."""
+        if self.ended:
+            return True
+        self.position = max(self.position, ring.start)
+        count = (ring.end - self.position) // self.frame
+        if count <= 0:
+            return False
+        frames = ring.view(self.position, self.position + count * self.frame).reshape(count, self.frame)
+        for level in frame_db(frames):
+            frame_end = self.position + self.frame
+            if self._calibration_frames:
+                # Room noise louder than threshold_db would otherwise read as speech
+                self._calibration_frames -= 1
+                first = self.position == self.origin
+                self.noise_floor = level if first else min(self.noise_floor, level)
+            is_speech = level > max(self.threshold_db, self.noise_floor + self.margin_db)
+            if not is_speech and not self._calibration_frames:
+                self.noise_floor += NOISE_FLOOR_ALPHA * (level - self.noise_floor)
+            self._step(is_speech, frame_end)
+            self.position = frame_end
+            if self.ended:
+                return True
+        return False
+
+    def _step(self, is_speech: bool, frame_end: int):
+        if not self.started:
+            self._run = self._run + 1 if is_speech else 0
+            if self._run >= self.min_speech_frames:
+                first = frame_end - self._run * self.frame
+                self.speech_start = max(self.origin, first - self.padding)
+                self._last_speech_end = frame_end
+                self._run = 0
+            return
+        if is_speech:
+            self._last_speech_end = frame_end
+            self._run = 0
+        else:
+            self._run += 1
+            if self._run >= self.silence_frames:
+                self.speech_end = min(frame_end, self._last_speech_end + self.padding)
+
+    def force_end(self, index: int):
+        """Ends the utterance at `index` (e.g. the buffer is full or the caller stopped)."""
+        if self.started and not self.ended:
+            self.speech_end = index
@@ -1,76 +1,81 @@
 import os
-import queue
 import sys
 import threading
 import time
+from typing import Callable, Optional
+import numpy as np
 import sounddevice as sd
-import soundfile as sf
-import subprocess
+from audio.ring_buffer import AudioRingBuffer
+from audio.streaming_stt import StreamingTranscriber
+from audio.stt import SpeechToText, WHISPER_MODEL
+
+# Seconds of microphone audio kept in memory; longer utterances lose their start
+VOICE_BUFFER_SECONDS = float(os.getenv("VOICE_BUFFER_SECONDS", "60"))
+# Directory to also save each utterance as a WAV file (debugging only; off by default)
+VOICE_DEBUG_DUMP = os.getenv("VOICE_DEBUG_DUMP")
 
 class VoiceService:
-    def __init__(self):
-        self._output_dir = "outputs"
-        os.makedirs(self._output_dir, exist_ok=True)
-        self._whisper_exe = r"whisper.cpp\whisper-cli.exe"  # Windows executable path
-        self._model_dir = r"whisper.cpp\models"
+    def __init__(self, model_path: str = WHISPER_MODEL, stt_contexts: int = 1,
+                 debug_dump_dir: str = VOICE_DEBUG_DUMP):
+        # whisper.cpp model stays loaded for the life of the service
+        self.stt = SpeechToText(model_path, contexts=stt_contexts)
         self._samplerate = 16000
         self._channels = 1
-        self._q = queue.Queue()
+        # Capture writes straight into a preallocated buffer; STT reads views of it
+        self._ring = AudioRingBuffer(VOICE_BUFFER_SECONDS, self._samplerate, dtype=np.float32)
+        self._debug_dump_dir = debug_dump_dir
+        if debug_dump_dir:
+            os.makedirs(debug_dump_dir, exist_ok=True)
 
     def _callback(self, indata, frames, time_info, status):
-        """Callback from sounddevice, put recorded data into a queue."""
+        """Callback from sounddevice, append the block to the ring buffer."""
         if status:
             print(status, file=sys.stderr)
-        # Always ensure indata is (frames, channels)
-        self._q.put(indata.copy())
+        self._ring.write(indata[:, 0])
 
-    def listen(self):
+    def listen(self, on_partial: Optional[Callable[[str], None]] = None,
+               stop_event: Optional[threading.Event] = None):
         """
-        Records until Enter is pressed, then transcribes with whisper.cpp
+        Records one utterance, ended automatically after VAD_SILENCE_MS of silence
+        (or when stop_event is set), and transcribes it with whisper.cpp.
+        While the lead is speaking, on_partial gets sliding-window partial transcripts.
         """
-        temp_wav = os.path.join(self._output_dir, "mic_input.wav")
-        print("🎤 Recording... press ENTER to stop")
-
-        # Thread for stopping on Enter
-        stop_event = threading.Event()
-        threading.Thread(target=lambda: (input(), stop_event.set()), daemon=True).start()
+        print("🎤 Listening...")
 
-        # Start recording
-        with sf.SoundFile(temp_wav, mode='w', samplerate=self._samplerate,
-                          channels=self._channels, subtype='PCM_16') as file:
-            with sd.InputStream(samplerate=self._samplerate, channels=self._channels,
-                                callback=self._callback):
-                while not stop_event.is_set():
-                    file.write(self._q.get())
+        transcriber = StreamingTranscriber(self.stt, self._ring, on_partial=on_partial)
+        with sd.InputStream(samplerate=self._samplerate, channels=self._channels, dtype='float32',
+                            callback=self._callback):
+            text = transcriber.run(stop_event)
 
-        print("✅ Recording stopped, transcribing...")
-        start = time.time()
-        text = self.process_audio(temp_wav)
-        end = time.time()
-        print(f"🕒 Transcribed in {end - start:.2f} seconds")
+        vad = transcriber.vad
+        if vad.started:
+            speech_seconds = (vad.speech_end - vad.speech_start) / self._samplerate
+            print(f"🕒 {speech_seconds:.1f}s of speech transcribed {transcriber.endpoint_latency:.2f} s after it ended "
+                  f"({transcriber.inference_seconds:.2f} s inference, {transcriber.partials} partials; "
+                  f"model loaded once in {self.stt.load_seconds:.2f} s)")
+            if self._debug_dump_dir:
+                self._dump(self._ring.view(vad.speech_start, vad.speech_end), self._samplerate)
+        else:
+            print("🔇 No speech detected")
         return text
 
-    def process_audio(self, wav_file, model_name="base.en"):
-        """Run whisper.cpp CLI to transcribe audio."""
-        model_path = os.path.join(self._model_dir, f"ggml-{model_name}.bin")
-        if not os.path.exists(model_path):
-            raise FileNotFoundError(f"Model not found: {model_path}")
+    def process_audio(self, wav_file):
+        """Transcribe a 16-bit PCM WAV file with the resident whisper model."""
         if not os.path.exists(wav_file):
             raise FileNotFoundError(f"WAV file not found: {wav_file}")
+        return self.stt.transcribe(wav_file)
 
-        cmd = [
-            self._whisper_exe,
-            "-m", model_path,
-            "-f", wav_file,
-            "-np", "-nt"
-        ]
-        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        output, error = process.communicate()
-
-        if process.returncode != 0:
-            raise RuntimeError(f"Whisper error: {error.decode('utf-8')}")
+    def transcribe_pcm(self, samples: np.ndarray, sample_rate: int = 16000) -> str:
+        """Transcribe mono int16/float32 PCM samples."""
+        if self._debug_dump_dir:
+            self._dump(samples, sample_rate)
+        return self.stt.transcribe_pcm(samples, sample_rate)
 
-        return output.decode("utf-8").replace("[BLANK_AUDIO]", "").strip()
+    def _dump(self, samples: np.ndarray, sample_rate: int):
+        import soundfile as sf
+        path = os.path.join(self._debug_dump_dir, f"utterance_{int(time.time() * 1000)}.wav")
+        sf.write(path, samples, sample_rate, subtype='PCM_16')
+        print(f"💾 Saved: {path}")
 
 
 # if __name__ == "__main__":
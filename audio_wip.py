@@ -1,69 +1,76 @@
-import socket
-import json
+import asyncio
 import os
+import threading
 os.environ["KMP_DUPLICATE_LIB_OK"] = "TRUE"
-from audio.tts import TextToSpeech
-from agent.AgentAPI import get_agent_api
+from audio.protocol import HOST, PORT, VoiceClient
 
-HOST = '127.0.0.1'
-PORT = 5001
+def load_tts(holder: dict):
+    # torch + kokoro take seconds to import; done on a thread while the agent warms up
+    from audio.tts import TextToSpeech
+    holder['tts'] = TextToSpeech()
 
-def main():
+def show_partial(text: str):
+    print(f"\r🧑 ... {text}", end="", flush=True)
+
+def show_reply(text: str):
+    print(text, end="", flush=True)
+
+def speak_reply(tts, reply_stream):
+    """Speaks the agent's reply while it is still being generated."""
+    print("\n🤖 Agent: ", end="", flush=True)
+    tts.speak_stream(reply_stream, on_text=show_reply)
+    stats = tts.last_stats
+    if stats.get("first_audio_ms") is not None:
+        print(f"\n🔊 First audio after {stats['first_audio_ms'] / 1000:.2f} s "
+              f"(first sentence synthesized in {stats['first_sentence_synthesis_ms'] / 1000:.2f} s)")
+
+async def main():
     lead_id = "lead_2024_0156"
-    agent_api = get_agent_api(lead_id=lead_id)
-    tts = TextToSpeech()
+    tts_holder = {}
+    tts_loader = threading.Thread(target=load_tts, args=(tts_holder,), daemon=True)
+    tts_loader.start()
 
-    if not agent_api.initialize_knowledge():
-        print("❌ Failed to initialize knowledge bases!")
+    from agent.runtime import get_runtime
+    runtime = get_runtime()
+    try:
+        await asyncio.to_thread(runtime.warm, background_indexes=True)
+    except Exception as e:
+        print(f"❌ Failed to initialize knowledge bases! ({e})")
         return
+    agent_api = runtime.session(lead_id)
 
     # Connect to Voice Service
     print(f"🔌 Connecting to Voice Service at {HOST}:{PORT}...")
-    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    sock.connect((HOST, PORT))
+    client = await VoiceClient.connect(HOST, PORT)
     print("✅ Connected!")
 
-    opening = agent_api.get_opening_statement(lead_id)
-    print(f"🤖 Agent: {opening}")
-    tts.speak(opening)
+    await asyncio.to_thread(tts_loader.join)
+    if 'tts' not in tts_holder:
+        print("❌ Failed to load text-to-speech!")
+        return
+    tts = tts_holder['tts']
+    await asyncio.to_thread(speak_reply, tts, agent_api.stream_opening(lead_id))
 
     try:
-        buffer = ""
         while True:
-            # Tell voice service to start listening
-            sock.sendall(json.dumps({"command": "listen"}).encode('utf-8') + b"\n")
-
-            # Wait for transcription
-            while True:
-                chunk = sock.recv(1024).decode('utf-8')
-                if not chunk:
-                    return
-                buffer += chunk
-                while "\n" in buffer:
-                    line, buffer = buffer.split("\n", 1)
-                    try:
-                        msg = json.loads(line)
-                        if "transcription" in msg:
-                            user_input = msg["transcription"]
-                            print(f"\n🧑 You said: {user_input}")
-                            print("\n🤔 [Agent is thinking...]")
-                            response = agent_api.process_message(lead_id, user_input)
-                            print(f"\n🤖 Agent: {response}")
-                            tts.speak(response)  # After speaking, go to next listen loop
-                            if agent_api.state.get('is_end', False):
-                                sock.sendall(json.dumps({"command": "quit"}).encode('utf-8') + b"\n")
-                                return
-                            break
-                    except json.JSONDecodeError:
-                        continue
-                else:
-                    continue
-                break  # Exit inner loop and send next "listen"
-
-    except KeyboardInterrupt:
-        print("\n🛑 Conversation stopped by user.")
+            # Voice service listens until the lead stops talking
+            user_input = await client.listen(on_partial=show_partial)
+            if not user_input:
+                continue  # nothing was said; listen again
+            print(f"\n🧑 You said: {user_input}")
+            # Sentences are spoken as the reply streams in; after speaking, go to next listen loop
+            await asyncio.to_thread(speak_reply, tts, agent_api.stream_message(lead_id, user_input))
+            if agent_api.state.get('is_end', False):
+                return
     finally:
-        sock.close()
+        await client.close()
+        tts.close()
+        if agent_api.get_finalization_status():
+            print("💾 Saving conversation memory...")
+            agent_api.wait_for_finalization()
 
 if __name__ == "__main__":
-    main()
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        print("\n🛑 Conversation stopped by user.")
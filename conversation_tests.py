@@ -4,6 +4,7 @@ Run these to validate agent behavior across different scenarios
 """
 
 from agent.AgentAPI import get_agent_api
+from agent.services.turn_records import iter_retrieved_docs
 import json
 import time
 
@@ -120,8 +121,8 @@ TEST_CASES = {
             "I'm not convinced the ROI justifies the cost. What guarantees do you offer?"
         ],
         expected_behaviors={
-            "searches_pricing_info": lambda state, log: any("pricing" in doc.lower() for doc in state.get('retrieved_docs', [])),
-            "searches_banking_cases": lambda state, log: any("banking" in doc.lower() or "bank" in doc.lower() for doc in state.get('retrieved_docs', [])),
+            "searches_pricing_info": lambda state, log: any("pricing" in doc.lower() for doc in iter_retrieved_docs(state)),
+            "searches_banking_cases": lambda state, log: any("banking" in doc.lower() or "bank" in doc.lower() for doc in iter_retrieved_docs(state)),
             "detects_price_objection": lambda state, log: state.get('detected_objections') and any("cost" in obj.lower() or "expensive" in obj.lower() for obj in state['detected_objections']),
             "stays_in_objection_handling": lambda state, log: state.get('conversation_stage') == 'objection_handling',
             "provides_roi_evidence": lambda state, log: any("roi" in msg['content'].lower() or "return" in msg['content'].lower() for msg in log if msg['role'] == 'agent')
@@ -193,7 +194,7 @@ TEST_CASES = {
         ],
         expected_behaviors={
             "detects_high_urgency": lambda state, log: state.get('lead_qualification_score', {}).get('need_urgency', 0) >= 8,
-            "searches_erp_capabilities": lambda state, log: any("erp" in doc.lower() for doc in state.get('retrieved_docs', [])),
+            "searches_erp_capabilities": lambda state, log: any("erp" in doc.lower() for doc in iter_retrieved_docs(state)),
             "progresses_quickly_to_closing": lambda state, log: state.get('conversation_stage') in ['closing'],
             "detects_multiple_buying_signals": lambda state, log: len(state.get('buying_signals_detected', [])) >= 2,
             "high_overall_qualification": lambda state, log: sum(state.get('lead_qualification_score', {}).values()) >= 25
@@ -218,7 +219,7 @@ TEST_CASES = {
         expected_behaviors={
             "addresses_competition": lambda state, log: any("competitor" in msg['content'].lower() or "different" in msg['content'].lower() for msg in log if msg['role'] == 'agent'),
             "provides_differentiation": lambda state, log: any("unique" in msg['content'].lower() or "advantage" in msg['content'].lower() for msg in log if msg['role'] == 'agent'),
-            "searches_healthcare_cases": lambda state, log: any("healthcare" in doc.lower() for doc in state.get('retrieved_docs', [])),
+            "searches_healthcare_cases": lambda state, log: any("healthcare" in doc.lower() for doc in iter_retrieved_docs(state)),
             "maintains_professional_tone": lambda state, log: not any("better than" in msg['content'].lower() or "superior" in msg['content'].lower() for msg in log if msg['role'] == 'agent')
         }
     ),
@@ -242,7 +243,7 @@ TEST_CASES = {
             "attempts_knowledge_searches": lambda state, log: len(state.get('retrieved_docs', [])) >= 2,
             "acknowledges_knowledge_gaps": lambda state, log: any("specific" in msg['content'].lower() or "details" in msg['content'].lower() for msg in log if msg['role'] == 'agent'),
             "maintains_technical_focus": lambda state, log: state.get('communication_style_preference') == 'technical',
-            "searches_healthcare_tech": lambda state, log: any("healthcare" in doc.lower() or "technical" in doc.lower() for doc in state.get('retrieved_docs', []))
+            "searches_healthcare_tech": lambda state, log: any("healthcare" in doc.lower() or "technical" in doc.lower() for doc in iter_retrieved_docs(state))
         }
     )
 }
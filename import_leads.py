@@ -0,0 +1,43 @@
+"""
+Bulk import of leads into the indexed lead store (data/leads.sqlite).
+
+Streams a CSV (header row), JSONL (one object per line) or {lead_id: record}
+JSON file, validates records in chunks and upserts each valid chunk in one
+transaction. Records need a lead_id (or id), name and company; role,
+industry and any other columns are kept with the lead. Invalid records are
+skipped and reported.
+
+    uv run import_leads.py leads.csv --chunk-size 5000
+"""
+import argparse
+import sys
+import time
+
+from agent.services.lead_store import IMPORT_CHUNK_SIZE, get_lead_store
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import leads from CSV/JSONL into the lead store")
+    parser.add_argument("path", help="CSV, JSONL or JSON file to import")
+    parser.add_argument("--chunk-size", type=int, default=IMPORT_CHUNK_SIZE, help="Records validated and written per transaction")
+    args = parser.parse_args()
+
+    store = get_lead_store()
+    start = time.perf_counter()
+
+    def progress(report):
+        print(f"\r{report.imported} imported, {report.rejected} rejected "
+              f"({report.imported / (time.perf_counter() - start):.0f} leads/s)", end="", flush=True)
+
+    report = store.import_file(args.path, chunk_size=args.chunk_size, progress=progress)
+    print(f"\nImported {args.path} into {store.path} in {time.perf_counter() - start:.1f}s: {report} "
+          f"({store.count()} leads in store)")
+    for error in report.errors:
+        print(f"  rejected {error}")
+    if report.rejected > len(report.errors):
+        print(f"  ... and {report.rejected - len(report.errors)} more")
+    sys.exit(1 if report.imported == 0 and report.rejected else 0)
+
+
+if __name__ == "__main__":
+    main()
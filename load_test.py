@@ -0,0 +1,244 @@
+"""
+Load / soak driver for the agent graph.
+
+Pushes N simulated leads through `AgentAPI` concurrently against the local
+stub LLM server (started in-process unless --endpoint is given) and reports
+turns/sec, p50/p95/p99 turn latency and memory per session.
+
+    uv run load_test.py --sessions 200 --concurrency 50 --turns 4 --latency lognormal:-1.5,0.4
+    uv run load_test.py --sessions 400 --concurrency 25 --workers 4   # pre-forked warm workers
+    uv run load_test.py --stream --tps 200                             # streamed replies, time to first token
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Optional
+
+FALLBACK_RESPONSES = {
+    "I'm having trouble processing that. Could you please try again?",
+    "Hello! I'm Zain from Systems Limited. How can I help you today?",
+}
+
+SCRIPTED_TURNS = [
+    "Hi Zain, we're struggling to integrate our legacy patient system with newer cloud tools.",
+    "Do you have case studies with other healthcare companies?",
+    "What would pricing look like? Our budget is tight this year.",
+    "What technical stack do you usually work with for AI projects?",
+    "Who are you as a company, how big is the team?",
+    "Our timeline is next quarter, could we get a demo?",
+]
+GOODBYE = "Thanks, that's all for now. Goodbye!"
+
+
+def max_rss_kib() -> Optional[int]:
+    """Peak resident set size of this process, or None where the resource module doesn't exist (Windows)."""
+    if sys.platform == "win32":
+        return None
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def percentile(values: list, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def deep_sizeof(obj, seen=None) -> int:
+    """Approximate retained size of a state object in bytes."""
+    seen = seen if seen is not None else set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(k, seen) + deep_sizeof(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set)):
+        size += sum(deep_sizeof(item, seen) for item in obj)
+    elif hasattr(obj, "__slots__"):
+        size += sum(deep_sizeof(getattr(obj, slot, None), seen) for slot in obj.__slots__)
+    elif hasattr(obj, "__dict__"):
+        size += deep_sizeof(vars(obj), seen)
+    return size
+
+
+def stream_reply(agent_api, stream) -> tuple:
+    """Consumes a streamed reply; returns (final message, streamed text matched it)"""
+    streamed = "".join(stream)
+    final = agent_api.state['messages'][-1]['content'] if agent_api.state and agent_api.state['messages'] else streamed
+    return final, streamed == final
+
+
+def run_session(index: int, turns: int, say_goodbye: bool, release_idle: bool = False, stream: bool = False) -> dict:
+    from agent.runtime import get_runtime
+
+    lead_id = f"loadtest_{index:05d}"
+    agent_api = get_runtime().session(lead_id)
+    latencies, first_tokens, errors, mismatches = [], [], 0, 0
+
+    start = time.perf_counter()
+    if stream:
+        opening, matched = stream_reply(agent_api, agent_api.stream_opening(lead_id))
+        mismatches += not matched
+    else:
+        opening = agent_api.get_opening_statement(lead_id)
+    opening_latency = time.perf_counter() - start
+    errors += opening in FALLBACK_RESPONSES
+
+    messages = [SCRIPTED_TURNS[(index + t) % len(SCRIPTED_TURNS)] for t in range(turns)]
+    if say_goodbye:
+        messages.append(GOODBYE)
+
+    for message in messages:
+        if release_idle:
+            agent_api.release_state()  # Next turn reloads the state from the checkpointer
+        start = time.perf_counter()
+        if stream:
+            response, matched = stream_reply(agent_api, agent_api.stream_message(lead_id, message))
+            mismatches += not matched
+            if agent_api.last_turn_latency["first_token"] is not None:
+                first_tokens.append(agent_api.last_turn_latency["first_token"])
+        else:
+            response = agent_api.process_message(lead_id, message)
+        latencies.append(time.perf_counter() - start)
+        errors += response in FALLBACK_RESPONSES
+        if agent_api.state.get('is_end', False):
+            break
+
+    return {
+        "lead_id": lead_id,
+        "opening_latency": opening_latency,
+        "latencies": latencies,
+        "first_tokens": first_tokens,
+        "errors": errors,
+        "stream_mismatches": mismatches,
+        "state_bytes": deep_sizeof(agent_api.state),
+    }
+
+
+def run_batch(indices: list, concurrency: int, turns: int, say_goodbye: bool, release_idle: bool, stream: bool) -> dict:
+    """Runs sessions on a thread pool and waits for their finalization jobs (one per worker process)."""
+    from agent.services.finalization_queue import get_finalization_queue
+
+    results, failures = [], 0
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="lead") as pool:
+        futures = [pool.submit(run_session, i, turns, say_goodbye, release_idle, stream) for i in indices]
+        for future in as_completed(futures):
+            try:
+                results.append(future.result())
+            except Exception as e:
+                failures += 1
+                print(f"Session failed: {e}")
+    wall = time.perf_counter() - start
+
+    finalize_start = time.perf_counter()
+    jobs = get_finalization_queue().wait_all()
+    return {
+        "results": results,
+        "failures": failures,
+        "wall": wall,
+        "jobs": jobs,
+        "finalize_drain": time.perf_counter() - finalize_start,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the agent graph against the stub LLM server")
+    parser.add_argument("--sessions", type=int, default=50, help="Number of simulated leads")
+    parser.add_argument("--concurrency", type=int, default=10, help="Concurrent conversations (per worker)")
+    parser.add_argument("--workers", type=int, default=1, help="Pre-forked worker processes sharing the warmed runtime")
+    parser.add_argument("--turns", type=int, default=3, help="User turns per conversation (before goodbye)")
+    parser.add_argument("--no-goodbye", action="store_true", help="Don't end conversations (skips finalization)")
+    parser.add_argument("--release-idle", action="store_true", help="Drop session state between turns and reload it by thread_id")
+    parser.add_argument("--stream", action="store_true", help="Stream replies (AgentAPI.stream_message) and report time to first token")
+    parser.add_argument("--endpoint", default=None, help="Use an already running stub/provider endpoint")
+    parser.add_argument("--latency", default="fixed:0.05", help="Stub latency distribution (see stub_llm_server.py)")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--tps", type=float, default=0.0)
+    args = parser.parse_args()
+
+    if args.endpoint:
+        endpoint, stub = args.endpoint, None
+    else:
+        from stub_llm_server import start_in_background
+        stub, endpoint = start_in_background(latency=args.latency, error_rate=args.error_rate,
+                                              tokens_per_second=args.tps, seed=42)
+    os.environ["LLM_API_ENDPOINT"] = endpoint
+    os.environ.setdefault("GOOGLE_API_KEY", "stub-key")
+    # Keep simulated leads out of the real long-term memory
+    scratch_dir = tempfile.mkdtemp(prefix="loadtest_")
+    os.environ["LONG_TERM_MEMORY_FILE"] = os.path.join(scratch_dir, "long_term_memory.json")
+    os.environ["LONG_TERM_MEMORY_DB"] = os.path.join(scratch_dir, "long_term_memory.sqlite")
+    os.environ["LEADS_DB"] = os.path.join(scratch_dir, "leads.sqlite")
+    os.environ["SIMILAR_LEADS_INDEX"] = os.path.join(scratch_dir, "similar_leads.index")
+    os.environ["CHECKPOINT_DB"] = os.path.join(scratch_dir, "checkpoints.sqlite")
+    print(f"🧪 LLM endpoint: {endpoint}")
+
+    from agent.runtime import get_runtime
+    runtime = get_runtime()
+    runtime.warm()
+
+    rss_before = max_rss_kib()
+    batch_args = (args.concurrency, args.turns, not args.no_goodbye, args.release_idle, args.stream)
+    wall_start = time.perf_counter()
+    if args.workers > 1:
+        shards = [list(range(w, args.sessions, args.workers)) for w in range(args.workers)]
+        with runtime.prefork_pool(args.workers) as pool:
+            batches = pool.starmap(run_batch, [(shard, *batch_args) for shard in shards])
+    else:
+        batches = [run_batch(list(range(args.sessions)), *batch_args)]
+    wall = max(batch["wall"] for batch in batches)
+    finalize_drain = time.perf_counter() - wall_start - wall
+
+    results = [r for batch in batches for r in batch["results"]]
+    failures = sum(batch["failures"] for batch in batches)
+    jobs = [job for batch in batches for job in batch["jobs"]]
+    rss_after = max_rss_kib()
+
+    latencies = [lat for r in results for lat in r["latencies"]]
+    openings = [r["opening_latency"] for r in results]
+    state_sizes = [r["state_bytes"] for r in results]
+
+    print(f"\n{'='*60}")
+    print("LOAD TEST SUMMARY")
+    print(f"{'='*60}")
+    print(f"Startup: {runtime.format_timings()}")
+    print(f"Sessions: {len(results)} ok, {failures} failed | concurrency {args.concurrency} x {args.workers} worker(s) | "
+          f"threads alive {threading.active_count()}")
+    print(f"Turns: {len(latencies)} in {wall:.2f}s -> {len(latencies) / wall if wall else 0:.2f} turns/sec")
+    print(f"Turn latency (s): p50 {percentile(latencies, 50):.3f} | p95 {percentile(latencies, 95):.3f} | "
+          f"p99 {percentile(latencies, 99):.3f} | max {max(latencies, default=0):.3f}")
+    print(f"Opening latency (s): p50 {percentile(openings, 50):.3f} | p95 {percentile(openings, 95):.3f}")
+    if args.stream:
+        first_tokens = [t for r in results for t in r["first_tokens"]]
+        print(f"Time to first token (s): p50 {percentile(first_tokens, 50):.3f} | p95 {percentile(first_tokens, 95):.3f} | "
+              f"streamed replies differing from the final message: {sum(r['stream_mismatches'] for r in results)}")
+    print(f"Finalization jobs: {sum(j['status'] == 'done' for j in jobs)} done, "
+          f"{sum(j['status'] == 'failed' for j in jobs)} failed | queue drained {finalize_drain:.2f}s after last turn")
+    print(f"Fallback/error responses: {sum(r['errors'] for r in results)}")
+    if args.workers == 1:
+        from agent.services.result_cache import get_result_cache
+        from agent.services.lead_repository import get_lead_repository
+        print(f"Tool result cache: {get_result_cache().get_stats()}")
+        print(f"Lead repository: {get_lead_repository().stats}")
+    if state_sizes:
+        print(f"State per session: mean {statistics.mean(state_sizes) / 1024:.1f} KiB | "
+              f"max {max(state_sizes) / 1024:.1f} KiB")
+    if rss_after is not None:
+        print(f"Process max RSS: {rss_after / 1024:.1f} MiB (+{(rss_after - rss_before) / 1024:.1f} MiB during run)")
+    if stub is not None:
+        stats = stub.RequestHandlerClass.config.stats
+        print(f"Stub requests: {stats['requests']} ({stats['errors']} injected errors) {stats['by_kind']}")
+        stub.shutdown()
+
+
+if __name__ == "__main__":
+    main()
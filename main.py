@@ -1,12 +1,13 @@
-import pprint
+import os
 import sys
-from agent.graph import create_agent_graph
-from IPython.display import Image, display
-from vectorstores.create_knowledge_bases import initialize_vector_knowledge, initialize_json_knowledge
-from agent.AgentAPI import get_agent_api
+
+# Heavy modules (LangChain, FAISS, Gemini clients) are imported inside the
+# commands that need them, so `main.py graph`/`streamlit` and the first prompt
+# don't pay for everything up front. `main.py profile [cli]` shows the cost.
 
 def visualize_graph():
     """Generate graph visualization"""
+    from agent.graph import create_agent_graph
     app = create_agent_graph()
     with open("agent_graph.png", "wb") as f:
         f.write(app.get_graph(xray=True).draw_mermaid_png())
@@ -14,13 +15,22 @@ def visualize_graph():
 
 def run_cli_conversation():
     """Run CLI conversation using the new API"""
+    from agent.runtime import get_runtime
+    from agent.services.tracing import print_summary, start_metrics_server
+
     lead_id = "lead_2024_0156"
-    agent_api = get_agent_api(lead_id=lead_id)
-    # Initialize knowledge bases
-    if not agent_api.initialize_knowledge():
-        print("Failed to initialize knowledge bases!")
+    if os.getenv("METRICS_PORT"):
+        start_metrics_server(int(os.getenv("METRICS_PORT")))
+
+    # Initialize knowledge bases (indexes finish loading while the opening is generated)
+    runtime = get_runtime()
+    try:
+        runtime.warm(background_indexes=True)
+    except Exception as e:
+        print(f"Failed to initialize knowledge bases! ({e})")
         return
-    
+    agent_api = runtime.session(lead_id)
+
     # Get opening statement
     print("\n" + "="*50)
     opening = agent_api.get_opening_statement(lead_id)
@@ -53,6 +63,32 @@ def run_cli_conversation():
             print(f"\nError: {e}")
             break
 
+    if agent_api.get_finalization_status():
+        print("\n[Saving conversation memory...]")
+        status = agent_api.wait_for_finalization()
+        print(f"Memory synthesis {status['status']} after {status['attempts']} attempt(s).")
+
+    print_summary()
+
+def profile_startup(entry_point: str = "cli"):
+    """Print an import-time breakdown for an entry point (see agent/services/startup_profile.py)"""
+    from agent.services.startup_profile import ENTRY_POINT_IMPORTS, format_import_profile
+    if entry_point not in ENTRY_POINT_IMPORTS:
+        print(f"Unknown entry point '{entry_point}'. Choose from: {', '.join(ENTRY_POINT_IMPORTS)}")
+        return
+    print(format_import_profile(ENTRY_POINT_IMPORTS[entry_point]))
+
+def compact_memory(keep: str = None):
+    """Bound every lead's long-term memory history (see agent/services/memory_manager.py)"""
+    from agent.services.memory_manager import MEMORY_HISTORY_VERSIONS, compact_memory_history
+    compact_memory_history(int(keep) if keep else MEMORY_HISTORY_VERSIONS)
+
+def index_similar_leads():
+    """Embed every lead memory missing from the similar-lead index (see agent/services/similar_leads.py)"""
+    from agent.services.similar_leads import get_similar_lead_index
+    index = get_similar_lead_index()
+    print(f"Indexed {index.index_all()} lead profiles ({index.size()} leads in the index)")
+
 def run_streamlit():
     """Run the Streamlit UI version"""
     import subprocess
@@ -69,8 +105,14 @@ if __name__ == "__main__":
         elif sys.argv[1] == "graph":
             print("Generating graph visualization...")
             visualize_graph()
+        elif sys.argv[1] == "profile":
+            profile_startup(sys.argv[2] if len(sys.argv) > 2 else "cli")
+        elif sys.argv[1] == "compact-memory":
+            compact_memory(sys.argv[2] if len(sys.argv) > 2 else None)
+        elif sys.argv[1] == "index-similar-leads":
+            index_similar_leads()
         else:
-            print("Usage: python main.py [streamlit|cli|graph]")
+            print("Usage: python main.py [streamlit|cli|graph|profile [cli|graph|voice|main]|compact-memory [keep]|index-similar-leads]")
     else:
         # Default to CLI for backward compatibility
         print("Starting CLI conversation... (use 'python main.py streamlit' for UI)")
@@ -0,0 +1,85 @@
+"""
+Batch pre-generation of opening statements across the lead book.
+
+Walks the lead store (see import_leads.py) with bounded concurrency, builds
+each lead's opening prompt and stores the generated opener in
+the opening store (data/openings.sqlite) together with a fingerprint of the lead data and
+long-term memory it was built from. Calls then start instantly from the
+stored opener while it is fresh (see agent/services/opening_store.py). Leads
+whose stored opener is still fresh are skipped unless --force is given.
+
+    uv run pregenerate_openings.py --concurrency 8
+"""
+import argparse
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from agent.AgentAPI import load_initial_data
+from agent.prompts import get_opening_prompt
+from agent.services.lead_repository import get_lead_repository
+from agent.services.llm_service import get_llm, invoke_llm
+from agent.services.opening_store import get_fresh_opening, opening_fingerprint, save_openings
+
+FLUSH_EVERY = 50  # Openers written per transaction, so an interrupted run keeps its progress
+IN_FLIGHT_PER_WORKER = 2  # Leads submitted ahead of the workers; the book is never queued whole
+
+
+def generate_opening(lead_id: str, force: bool = False) -> dict:
+    state = load_initial_data({"lead_id": lead_id})
+    fingerprint = opening_fingerprint(state['lead_data'], state['long_term_memory'], state['company_data'],
+                                      state.get('precedents'))
+    if not force and get_fresh_opening(lead_id, fingerprint) is not None:
+        return None
+    opening = invoke_llm(get_llm(), get_opening_prompt(state), "opening")
+    return {"fingerprint": fingerprint, "opening": opening, "generated_at": time.time()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-generate opening statements for all leads")
+    parser.add_argument("--concurrency", type=int, default=4, help="Concurrent LLM generations")
+    parser.add_argument("--force", action="store_true", help="Regenerate openers that are still fresh")
+    args = parser.parse_args()
+
+    lead_ids = get_lead_repository().iter_lead_ids()  # Streamed from the store a batch at a time
+    max_in_flight = max(1, args.concurrency) * IN_FLIGHT_PER_WORKER
+
+    start = time.perf_counter()
+    pending, generated, skipped, failed = {}, 0, 0, 0
+    with ThreadPoolExecutor(max_workers=args.concurrency, thread_name_prefix="opening") as pool:
+        futures = {}
+        exhausted = False
+        while futures or not exhausted:
+            while not exhausted and len(futures) < max_in_flight:
+                lead_id = next(lead_ids, None)
+                if lead_id is None:
+                    exhausted = True
+                else:
+                    futures[pool.submit(generate_opening, lead_id, args.force)] = lead_id
+            if not futures:
+                break
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                lead_id = futures.pop(future)
+                try:
+                    entry = future.result()
+                except Exception as e:
+                    failed += 1
+                    print(f"Failed to generate opening for {lead_id}: {e}")
+                    continue
+                if entry is None:
+                    skipped += 1
+                    continue
+                pending[lead_id] = entry
+                generated += 1
+                if len(pending) >= FLUSH_EVERY:
+                    save_openings(pending)
+                    pending = {}
+    if pending:
+        save_openings(pending)
+
+    print(f"Openings: {generated} generated, {skipped} still fresh, {failed} failed "
+          f"in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
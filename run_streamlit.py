@@ -17,8 +17,7 @@ def main():
     
     # Check if required files exist
     required_files = [
-        'data/leads.json',
-        'data/long_term_memory.json'
+        'data/leads.json'
     ]
     
     for file_path in required_files:
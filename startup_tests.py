@@ -0,0 +1,124 @@
+"""
+Startup benchmark for the entry points.
+
+Times, in fresh interpreters:
+  - import_main:           `import main` (should stay light, see main.py)
+  - import_runtime:        importing the agent runtime (LangChain, LangGraph, Gemini clients)
+  - time_to_first_prompt:  `main.py cli` until it waits for the first user input,
+                           against the local stub LLM (live opening generation)
+
+Each median is checked against an absolute budget and, if a baseline was
+recorded with --update-baseline, against the baseline plus a tolerance.
+Exits non-zero on a regression.
+
+    uv run startup_tests.py --runs 5
+    uv run startup_tests.py --update-baseline
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BASELINE_FILE = Path("outputs/startup_baseline.json")
+TOLERANCE = float(os.getenv("STARTUP_TOLERANCE", "0.25"))  # Allowed slowdown over the baseline
+
+# Absolute budgets in seconds
+BUDGETS = {
+    "import_main": float(os.getenv("STARTUP_BUDGET_IMPORT_MAIN", "0.3")),
+    "import_runtime": float(os.getenv("STARTUP_BUDGET_IMPORT_RUNTIME", "5.0")),
+    "time_to_first_prompt": float(os.getenv("STARTUP_BUDGET_FIRST_PROMPT", "10.0")),
+}
+
+PROMPT_MARKER = b"Your response:"
+
+
+def time_import(*modules: str) -> float:
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "; ".join(f"import {module}" for module in modules)],
+                   check=True, capture_output=True)
+    return time.perf_counter() - start
+
+
+def time_to_first_prompt(env: dict, timeout: float = 60.0) -> float:
+    """Seconds from launching `main.py cli` until it prints the first input prompt."""
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "main.py", "cli"], env=env,
+                               stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    output = b""
+    try:
+        while PROMPT_MARKER not in output:
+            chunk = process.stdout.read1(4096)
+            if not chunk:
+                raise RuntimeError(f"main.py cli exited before prompting:\n{output.decode(errors='replace')[-500:]}")
+            output += chunk
+            if time.perf_counter() - start > timeout:
+                raise TimeoutError("main.py cli did not prompt in time")
+        return time.perf_counter() - start
+    finally:
+        process.kill()
+        process.wait()
+
+
+def stub_env() -> dict:
+    from stub_llm_server import start_in_background
+    _, endpoint = start_in_background(latency="fixed:0.05", seed=42)
+    scratch_dir = tempfile.mkdtemp(prefix="startup_")
+    return {
+        **os.environ,
+        "LLM_API_ENDPOINT": endpoint,
+        "GOOGLE_API_KEY": os.getenv("GOOGLE_API_KEY", "stub-key"),
+        "LONG_TERM_MEMORY_FILE": os.path.join(scratch_dir, "long_term_memory.json"),
+        "LONG_TERM_MEMORY_DB": os.path.join(scratch_dir, "long_term_memory.sqlite"),
+        "LEADS_DB": os.path.join(scratch_dir, "leads.sqlite"),
+        "SIMILAR_LEADS_INDEX": os.path.join(scratch_dir, "similar_leads.index"),
+        "CHECKPOINT_DB": os.path.join(scratch_dir, "checkpoints.sqlite"),
+        "OPENINGS_DB": os.path.join(scratch_dir, "openings.sqlite"),  # Empty: measure live generation
+        "OPENINGS_FILE": os.path.join(scratch_dir, "openings.json"),  # No legacy openers to import
+        "TRACING": "0",
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Startup time benchmark for the agent entry points")
+    parser.add_argument("--runs", type=int, default=3, help="Runs per measurement (median is used)")
+    parser.add_argument("--update-baseline", action="store_true", help="Record these medians as the baseline")
+    args = parser.parse_args()
+
+    env = stub_env()
+    measurements = {
+        "import_main": lambda: time_import("main"),
+        "import_runtime": lambda: time_import("agent.runtime", "agent.AgentAPI"),
+        "time_to_first_prompt": lambda: time_to_first_prompt(env),
+    }
+
+    baseline = json.loads(BASELINE_FILE.read_text()) if BASELINE_FILE.exists() else {}
+    medians, failures = {}, []
+    print(f"{'measurement':<24}{'median s':>10}{'budget s':>10}{'baseline s':>12}  result")
+    for name, measure in measurements.items():
+        medians[name] = statistics.median(measure() for _ in range(args.runs))
+        limit = BUDGETS[name]
+        if name in baseline and not args.update_baseline:
+            limit = min(limit, baseline[name] * (1 + TOLERANCE))
+        ok = medians[name] <= limit
+        if not ok:
+            failures.append(name)
+        print(f"{name:<24}{medians[name]:>10.3f}{BUDGETS[name]:>10.2f}"
+              f"{baseline.get(name, float('nan')):>12.3f}  {'PASS' if ok else 'FAIL'}")
+
+    if args.update_baseline:
+        BASELINE_FILE.parent.mkdir(parents=True, exist_ok=True)
+        BASELINE_FILE.write_text(json.dumps(medians, indent=2))
+        print(f"Baseline written to {BASELINE_FILE}")
+
+    if failures:
+        print(f"Startup regression in: {', '.join(failures)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,16 @@
 import streamlit as st
-import json
 from datetime import datetime
 from typing import Dict, Any, List
 import os
-from pathlib import Path
 
 # Import your existing modules
-from vectorstores.create_knowledge_bases import initialize_vector_knowledge, initialize_json_knowledge
-from agent.services.memory_manager import load_memory
+from agent.services.lead_repository import get_lead_repository
 from ui.components.sidebar import render_sidebar
-from ui.utils.conversation_handler import ConversationHandler
 from ui.components.chat import render_chat_interface
 from ui.components.lead_info import render_lead_info
 from ui.utils.session_state import initialize_session_state, get_session_state
+from ui.utils.lead_pagination import get_lead_page, render_page_controls
+from ui.utils.resources import get_shared_runtime
 
 
 # Page config
@@ -81,17 +79,13 @@ def main():
     </div>
     """, unsafe_allow_html=True)
     
-    # Initialize knowledge bases on first run
-    if not st.session_state.get('knowledge_initialized', False):
-        with st.spinner('Initializing knowledge bases...'):
-            try:
-                initialize_vector_knowledge()
-                initialize_json_knowledge()
-                st.session_state.knowledge_initialized = True
-                st.success('Knowledge bases initialized successfully!')
-            except Exception as e:
-                st.error(f'Failed to initialize knowledge bases: {str(e)}')
-                return
+    # Graph, LLM clients and knowledge bases are warmed once per server process
+    # and shared by every browser session; indexes finish loading in the background
+    try:
+        get_shared_runtime()
+    except Exception as e:
+        st.error(f'Failed to start the agent: {str(e)}')
+        return
     
     # Create layout
     col1, col2 = st.columns([1, 3])
@@ -115,22 +109,34 @@ def main():
             
             # Show available leads
             st.subheader("Available Leads")
-            leads_file = Path("data/leads.json")
-            if leads_file.exists():
-                with open(leads_file, 'r') as f:
-                    leads = json.load(f)
-                
-                for lead_id, lead_data in leads.items():
-                    with st.expander(f"📋 {lead_data.get('name', 'Unknown')} - {lead_data.get('company', 'N/A')}"):
-                        col_a, col_b = st.columns(2)
-                        with col_a:
-                            st.write(f"**Role:** {lead_data.get('role', 'N/A')}")
-                        with col_b:
-                            st.write(f"**Company:** {lead_data.get('company', 'N/A')}")
-                        
-                        if st.button(f"Start Conversation", key=f"start_{lead_id}"):
-                            st.session_state.current_lead = lead_id
-                            st.rerun()
+            repository = get_lead_repository()
+            col_search, col_industry = st.columns([2, 1])
+            with col_search:
+                query = st.text_input("Search", placeholder="Name, company or lead ID", key="landing_search")
+            with col_industry:
+                industry = st.selectbox("Industry", [""] + repository.lead_filter_values('industry'),
+                                        key="landing_industry")
+            
+            total = repository.count_leads(query, industry=industry or None)
+            page, page_number = get_lead_page('landing_leads', query, industry=industry or None)
+            
+            for lead_data in page.leads:
+                lead_id = lead_data['lead_id']
+                with st.expander(f"📋 {lead_data.get('name', 'Unknown')} - {lead_data.get('company', 'N/A')}"):
+                    col_a, col_b = st.columns(2)
+                    with col_a:
+                        st.write(f"**Role:** {lead_data.get('role', 'N/A')}")
+                    with col_b:
+                        st.write(f"**Company:** {lead_data.get('company', 'N/A')}")
+                    
+                    if st.button(f"Start Conversation", key=f"start_{lead_id}"):
+                        st.session_state.current_lead = lead_id
+                        st.rerun()
+            
+            if total:
+                render_page_controls(st, 'landing_leads', page, page_number, total)
+            else:
+                st.info("No leads match your search.")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
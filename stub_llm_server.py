@@ -0,0 +1,378 @@
+"""
+Local stand-in LLM server for load and soak testing.
+
+Speaks enough of the Gemini REST API (generateContent, streamGenerateContent,
+embedContent, batchEmbedContents) and the OpenAI chat completions API for
+`get_llm` and the knowledge-base embeddings to run against it:
+
+    uv run stub_llm_server.py --port 8765 --latency lognormal:-1.5,0.4 --error-rate 0.01
+    LLM_API_ENDPOINT=http://127.0.0.1:8765 uv run main.py cli
+
+Reasoning prompts are answered with schema-valid action JSON (the eight
+actions listed in `get_reasoning_prompt`), so the graph runs its normal
+think -> execute_tool -> think loop without a real provider.
+"""
+import argparse
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+HOST = '127.0.0.1'
+PORT = 8765
+EMBEDDING_DIM = 768  # models/embedding-001, must match the saved FAISS indexes
+
+SEARCH_ACTIONS = {
+    "search_company_case_studies": ["case", "project", "example", "success", "client", "healthcare", "bank"],
+    "search_technical_capabilities": ["integrat", "technical", "cloud", "ai", "api", "security", "stack"],
+    "search_pricing_models": ["price", "pricing", "cost", "budget", "expensive", "rate"],
+    "search_company_profile": ["company", "history", "who are", "office", "team", "about"],
+}
+END_WORDS = ["bye", "goodbye", "end the call", "that's all", "not interested", "talk later"]
+
+
+class LatencyModel:
+    """Samples per-request latency from a `kind:params` spec, e.g. `normal:0.4,0.1`."""
+
+    def __init__(self, spec: str = "fixed:0"):
+        kind, _, params = spec.partition(":")
+        self.kind = kind
+        self.params = [float(p) for p in params.split(",") if p] or [0.0]
+        if kind not in ("fixed", "uniform", "normal", "lognormal", "exp"):
+            raise ValueError(f"Unknown latency distribution '{kind}'")
+
+    def sample(self, rng: random.Random) -> float:
+        p = self.params
+        if self.kind == "fixed":
+            value = p[0]
+        elif self.kind == "uniform":
+            value = rng.uniform(p[0], p[1])
+        elif self.kind == "normal":
+            value = rng.gauss(p[0], p[1])
+        elif self.kind == "lognormal":
+            value = rng.lognormvariate(p[0], p[1])
+        else:
+            value = rng.expovariate(1.0 / p[0]) if p[0] > 0 else 0.0
+        return max(0.0, value)
+
+
+class StubConfig:
+    def __init__(self, latency="fixed:0", error_rate=0.0, tokens_per_second=0.0,
+                 max_tool_steps=2, end_probability=0.0, seed=None):
+        self.latency = LatencyModel(latency)
+        self.error_rate = error_rate
+        self.tokens_per_second = tokens_per_second
+        self.max_tool_steps = max_tool_steps
+        self.end_probability = end_probability
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.stats = {"requests": 0, "errors": 0, "embeddings": 0, "by_kind": {}}
+
+    def record(self, kind: str, error: bool = False):
+        with self.lock:
+            self.stats["requests"] += 1
+            self.stats["by_kind"][kind] = self.stats["by_kind"].get(kind, 0) + 1
+            if error:
+                self.stats["errors"] += 1
+
+
+# --- Canned responses ---
+def _section(prompt: str, header: str) -> str:
+    """Text following a `### HEADER` line, up to the next section marker."""
+    start = prompt.find(header)
+    if start == -1:
+        return ""
+    rest = prompt[start + len(header):]
+    end = re.search(r"\n(###|---)", rest)
+    return rest[:end.start()] if end else rest
+
+
+def reasoning_response(prompt: str, config: StubConfig) -> str:
+    query = _section(prompt, "### CURRENT USER QUERY:").strip()
+    lowered = query.lower()
+    steps = _section(prompt, "### CURRENT TURN ACTIONS:").count("llm_reasoning")
+    with config.lock:
+        roll = config.rng.random()
+        pick = config.rng.random()
+
+    if any(word in lowered for word in END_WORDS) or roll < config.end_probability:
+        action = {"tool": "end_conversation",
+                  "answer": "Thank you for your time today. I'll send over a short summary and follow up next week. Have a great day!"}
+        thought = "The lead is wrapping up the call."
+    elif steps >= config.max_tool_steps:
+        action = {"tool": "generate_response",
+                  "answer": f"That's a great question. Based on what we've delivered for similar teams, "
+                            f"we can help with {query[:60] or 'your goals'}. Would a short technical deep-dive next week work for you?"}
+        thought = "I have enough context to answer."
+    elif steps == 0 and any(word in lowered for word in ["budget", "timeline", "demo", "next step"]):
+        action = {"tool": "update_conversation_context", "stage": "interest",
+                  "signals": [f"{query[:40]}"], "qualification_updates": {"engagement_level": 7}}
+        thought = "The lead shared qualification data."
+    else:
+        tool = next((name for name, words in SEARCH_ACTIONS.items() if any(w in lowered for w in words)), None)
+        if tool is None:
+            tool = list(SEARCH_ACTIONS)[int(pick * len(SEARCH_ACTIONS))] if pick < 0.8 else "search_knowledge_base"
+        key = "query" if tool == "search_knowledge_base" else "keywords"
+        action = {"tool": tool, key: query[:80] or "overview"}
+        thought = f"I should look this up with {tool}."
+
+    return "```json\n" + json.dumps({"thought": thought, "action": action}, indent=2) + "\n```"
+
+
+def memory_response() -> str:
+    return json.dumps({
+        "projects_of_interest": ["Patient management modernization"],
+        "key_pain_points_confirmed": ["Legacy system integration"],
+        "solutions_of_interest": ["Data & AI", "Cloud Services"],
+        "budget_confirmed": None,
+        "timeline_confirmed": "Next quarter",
+        "decision_authority_level": "High",
+        "key_questions_asked_by_lead": ["How long does integration take?"],
+        "relevant_docs_provided": ["Case studies"],
+        "buying_signals_detected": ["Asked about timeline"],
+        "objections_raised": ["Cost concerns"],
+        "conversation_stage_reached": "interest",
+        "lead_qualification_score": {"budget_fit": 5, "authority_level": 8, "need_urgency": 6, "engagement_level": 7},
+        "communication_style_preference": "technical",
+        "next_steps_agreed": ["Technical deep-dive"],
+        "overall_sentiment": "Positive",
+        "follow_up_timing": "1 week",
+        "miscellaneous_notes": "Generated by the stub LLM server."
+    }, indent=2)
+
+
+def completion_for(prompt: str, config: StubConfig) -> tuple:
+    """Returns (kind, text) for a prompt based on which template produced it."""
+    if "**AVAILABLE ACTIONS" in prompt:
+        return "reasoning", reasoning_response(prompt, config)
+    if "craft an opening statement" in prompt:
+        return "opening", ("Hi, this is Zain from Systems Limited. I noticed your team has been scaling quickly "
+                           "and wanted to see how you're handling integration across your platforms.")
+    if "Final State Report" in prompt:
+        return "memory", "```json\n" + memory_response() + "\n```"
+    if "sales-focused summary" in prompt:
+        return "summary", ("The lead is in the interest stage, confirmed legacy integration pain points and asked "
+                           "about timelines. Next step is a technical deep-dive.")
+    if "Documents:" in prompt and "Answer the query" in prompt:
+        return "rag", "According to the policy documents, the standard engagement terms apply."
+    if "RESPONSE (keep under 100 words)" in prompt:
+        return "lead", "Interesting. What would pricing look like for a team of our size?"
+    return "other", "OK."
+
+
+def embed(text: str) -> list:
+    """Deterministic hashed bag-of-words embedding, so similar texts land close together."""
+    vector = [0.0] * EMBEDDING_DIM
+    for token in re.findall(r"\w+", text.lower()):
+        digest = hashlib.blake2b(token.encode(), digest_size=8).digest()
+        index = int.from_bytes(digest[:4], "little") % EMBEDDING_DIM
+        vector[index] += 1.0 if digest[4] & 1 else -1.0
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+
+def count_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def split_tokens(text: str) -> list:
+    return re.findall(r"\S+\s*|\s+", text)
+
+
+# --- HTTP handler ---
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    config: StubConfig = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read_json(self) -> dict:
+        length = int(self.headers.get("Content-Length", 0))
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _send_json(self, status: int, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _start_chunked(self, content_type: str):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+    def _write_chunk(self, data: bytes):
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def _simulate(self, kind: str) -> bool:
+        """Sleeps for the sampled latency; returns False (after replying) on an injected error."""
+        config = self.config
+        with config.lock:
+            delay = config.latency.sample(config.rng)
+            failed = config.rng.random() < config.error_rate
+        time.sleep(delay)
+        config.record(kind, error=failed)
+        if failed:
+            self._send_json(503, {"error": {"code": 503, "message": "Injected stub error", "status": "UNAVAILABLE"}})
+        return not failed
+
+    def _token_delay(self, token: str):
+        if self.config.tokens_per_second > 0:
+            time.sleep(count_tokens(token) / self.config.tokens_per_second)
+
+    def do_GET(self):
+        if urlparse(self.path).path == "/stats":
+            with self.config.lock:
+                self._send_json(200, self.config.stats)
+        else:
+            self._send_json(404, {"error": {"code": 404, "message": "Not found"}})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        path = url.path
+        try:
+            body = self._read_json()
+        except json.JSONDecodeError:
+            self._send_json(400, {"error": {"code": 400, "message": "Invalid JSON"}})
+            return
+
+        if path.endswith(":embedContent") or path.endswith(":batchEmbedContents"):
+            self._handle_embeddings(path, body)
+        elif path.endswith(":generateContent") or path.endswith(":streamGenerateContent"):
+            self._handle_gemini(path, body, parse_qs(url.query))
+        elif path.endswith("/chat/completions"):
+            self._handle_openai(body)
+        else:
+            self._send_json(404, {"error": {"code": 404, "message": f"Unknown route {path}"}})
+
+    def _handle_embeddings(self, path: str, body: dict):
+        if not self._simulate("embedding"):
+            return
+        requests = body.get("requests", [body])
+        vectors = [embed(" ".join(part.get("text", "") for part in req.get("content", {}).get("parts", [])))
+                   for req in requests]
+        with self.config.lock:
+            self.config.stats["embeddings"] += len(vectors)
+        if path.endswith(":batchEmbedContents"):
+            self._send_json(200, {"embeddings": [{"values": v} for v in vectors]})
+        else:
+            self._send_json(200, {"embedding": {"values": vectors[0]}})
+
+    def _handle_gemini(self, path: str, body: dict, query: dict):
+        prompt = "\n".join(part.get("text", "") for content in body.get("contents", [])
+                           for part in content.get("parts", []))
+        kind, text = completion_for(prompt, self.config)
+        if not self._simulate(kind):
+            return
+
+        def chunk(piece: str, finished: bool) -> dict:
+            candidate = {"content": {"parts": [{"text": piece}], "role": "model"}, "index": 0}
+            if finished:
+                candidate["finishReason"] = "STOP"
+            return {"candidates": [candidate],
+                    "usageMetadata": {"promptTokenCount": count_tokens(prompt),
+                                      "candidatesTokenCount": count_tokens(text),
+                                      "totalTokenCount": count_tokens(prompt) + count_tokens(text)}}
+
+        if path.endswith(":generateContent"):
+            self._send_json(200, chunk(text, True))
+            return
+
+        # streamGenerateContent: SSE when ?alt=sse, otherwise a streamed JSON array (REST transport)
+        tokens = split_tokens(text)
+        sse = query.get("alt", [""])[0] == "sse"
+        self._start_chunked("text/event-stream" if sse else "application/json")
+        if not sse:
+            self._write_chunk(b"[")
+        for i, token in enumerate(tokens):
+            self._token_delay(token)
+            payload = json.dumps(chunk(token, i == len(tokens) - 1))
+            if sse:
+                self._write_chunk(f"data: {payload}\r\n\r\n".encode("utf-8"))
+            else:
+                self._write_chunk(((",\n" if i else "") + payload).encode("utf-8"))
+        if not sse:
+            self._write_chunk(b"]")
+        self._write_chunk(b"")
+
+    def _handle_openai(self, body: dict):
+        prompt = "\n".join(str(m.get("content", "")) for m in body.get("messages", []))
+        kind, text = completion_for(prompt, self.config)
+        if not self._simulate(kind):
+            return
+        model = body.get("model", "stub")
+        usage = {"prompt_tokens": count_tokens(prompt), "completion_tokens": count_tokens(text),
+                 "total_tokens": count_tokens(prompt) + count_tokens(text)}
+
+        if not body.get("stream"):
+            self._send_json(200, {
+                "id": "chatcmpl-stub", "object": "chat.completion", "created": int(time.time()), "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                "usage": usage,
+            })
+            return
+
+        self._start_chunked("text/event-stream")
+        for token in split_tokens(text):
+            self._token_delay(token)
+            event = {"id": "chatcmpl-stub", "object": "chat.completion.chunk", "model": model,
+                     "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}]}
+            self._write_chunk(f"data: {json.dumps(event)}\n\n".encode("utf-8"))
+        done = {"id": "chatcmpl-stub", "object": "chat.completion.chunk", "model": model,
+                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}], "usage": usage}
+        self._write_chunk(f"data: {json.dumps(done)}\n\ndata: [DONE]\n\n".encode("utf-8"))
+        self._write_chunk(b"")
+
+
+def create_server(host: str = HOST, port: int = PORT, **config_kwargs) -> ThreadingHTTPServer:
+    handler = type("ConfiguredStubHandler", (StubHandler,), {"config": StubConfig(**config_kwargs)})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def start_in_background(host: str = HOST, port: int = 0, **config_kwargs) -> tuple:
+    """Starts the stub on a daemon thread; returns (server, endpoint_url)."""
+    server = create_server(host, port, **config_kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in LLM server for load testing")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--latency", default="fixed:0",
+                        help="fixed:S | uniform:A,B | normal:MEAN,STD | lognormal:MU,SIGMA | exp:MEAN (seconds)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with HTTP 503")
+    parser.add_argument("--tps", type=float, default=0.0, help="Streaming tokens per second (0 = unthrottled)")
+    parser.add_argument("--max-tool-steps", type=int, default=2, help="Reasoning steps before generate_response")
+    parser.add_argument("--end-probability", type=float, default=0.0, help="Chance of end_conversation per reasoning call")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    server = create_server(args.host, args.port, latency=args.latency, error_rate=args.error_rate,
+                           tokens_per_second=args.tps, max_tool_steps=args.max_tool_steps,
+                           end_probability=args.end_probability, seed=args.seed)
+    print(f"🧪 Stub LLM server listening on http://{args.host}:{args.port}")
+    print(f"   export LLM_API_ENDPOINT=http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n🛑 Stub server stopped.")
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,105 +1,174 @@
-from agent.AgentAPI import get_agent_api
 import streamlit as st
-from typing import List, Dict
-from ui.utils.session_state import get_session_state, set_session_state
-from ui.utils.conversation_handler import ConversationHandler
+from typing import List, Dict, Optional
+from agent.services.turn_executor import get_turn_executor
+from ui.utils.session_state import get_session_state, set_session_state, reset_conversation_state
+from ui.utils.conversation_handler import ConversationHandler, get_agent_session, end_agent_session
 
-# Global variables
-handler = ConversationHandler()
-app = None  # Will be initialized later
+# Seconds between progress polls of a running turn (only the progress fragment reruns)
+POLL_INTERVAL = 0.25
+FINISHED_STATUSES = ("done", "failed", "cancelled")
+NODE_LABELS = {"think": "Thinking", "execute_tool": "Researching", "finalize": "Wrapping up"}
 
 def render_chat_interface():
     """Render the main chat interface"""
-    global app  # Tell Python to use the global variable
-
     current_lead = get_session_state('current_lead')
-    conversation_active = get_session_state('conversation_active')
-    pending_input = get_session_state('pending_user_input')
-    
+
     if not current_lead:
         st.warning("No lead selected")
         return
-    
+
     st.markdown("### 💬 Conversation")
-    
+
+    # Per-lead conversation on the process-wide graph
+    app = get_agent_session(current_lead)
+    handler = ConversationHandler(current_lead)
+    turn_job = collect_finished_turn(app)
+    conversation_active = get_session_state('conversation_active')
+    messages = app.state.get('messages', []) if app.state else []
+    if turn_job:
+        # The worker is updating the state; show it as it was when the turn was submitted
+        messages = messages[:turn_job['history_len']]
+
     chat_container = st.container()
-    
+
     with chat_container:
-        if app is None:
-            app = get_agent_api(current_lead)
-            set_session_state('agent_graph', app)
-        
-        conversation_history = get_session_state('conversation_history')
-        if app.state is not None:
-            conversation_history = app.state.get('messages', [])
-        
-        if conversation_history:
-            for message in conversation_history:
-                render_message(message)
-        elif conversation_active:
-            with st.spinner("Agent is preparing opening statement..."):
-                try:
-                    app.get_opening_statement(current_lead)
-                    set_session_state('conversation_history', app.state['messages'])
-                    st.rerun()
-                except Exception as e:
-                    st.error(f"Error starting conversation: {str(e)}")
-        else:
-            st.info("Click 'Start Conversation' in the sidebar to begin.")
-    
-    if conversation_active:
-        render_user_input()
-        if pending_input:
-            # Process the agent response
-            app = get_session_state('agent_graph')
-            app.process_message(
-                pending_input['lead_id'],
-                pending_input['text']
-            )
-            
-            set_session_state('conversation_history', app.state['messages'])
-            set_session_state('pending_user_input', None)  # clear it
-            st.rerun()  # Now rerun to show both messages
-        if app.state['is_end']:
-                conversation_active = False
-                set_session_state('coversation_active', conversation_active)
-                current_lead = None
-                set_session_state('current_lead', current_lead)
-                app = get_agent_api(current_lead)
-                set_session_state('agent_graph', app)
-                st.rerun()
+        render_history(messages)
+        # This run's new messages are appended here instead of re-rendering the history
+        live = st.container()
 
-def render_message(message: Dict):
-    """Render a single message"""
+    if not messages and not turn_job:
+        if not conversation_active:
+            with chat_container:
+                st.info("Click 'Start Conversation' in the sidebar to begin.")
+            return
+        try:
+            handler.start_conversation(current_lead)
+            turn_job = get_session_state('turn_job')
+        except Exception as e:
+            st.error(f"Error starting conversation: {str(e)}")
+            return
+
+    if not turn_job and conversation_active and not app.state.get('is_end'):
+        user_input = render_user_input()
+        if user_input:
+            handle_user_input(handler, user_input)
+            turn_job = get_session_state('turn_job')
+
+    if turn_job:
+        with live:
+            if turn_job['user_input']:
+                render_message({'role': 'user', 'content': turn_job['user_input']})
+            render_turn_progress(turn_job['id'])
+
+    if not turn_job and app.state and app.state.get('is_end'):
+        # Long-term memory is written in the background; the next run goes back to lead selection
+        st.success("Conversation ended. Lead memory is being updated.")
+        reset_conversation_state()
+        end_agent_session()
+        set_session_state('current_lead', None)
+
+def collect_finished_turn(app) -> Optional[Dict]:
+    """Clears this session's turn once it finished (recording its latency); returns it if still running"""
+    turn_job = get_session_state('turn_job')
+    if not turn_job:
+        return None
+    progress = get_turn_executor().get_progress(turn_job['id'])
+    if progress and progress['status'] not in FINISHED_STATUSES:
+        return turn_job
+
+    set_session_state('turn_job', None)
+    if progress is None:
+        return None
+    if progress['status'] == 'done' and progress['latency']:
+        # Shown with the reply whenever the history is rendered
+        latencies = get_session_state('turn_latencies') or {}
+        latencies[len(app.state['messages']) - 1] = progress['latency']
+        set_session_state('turn_latencies', latencies)
+    elif progress['status'] == 'cancelled':
+        st.info("Turn cancelled.")
+    elif progress['status'] == 'failed':
+        st.error(f"Error processing message: {progress['error']}")
+    if progress['status'] != 'done' and turn_job['user_input'] is None:
+        # Don't start the opener again right away
+        set_session_state('conversation_active', False)
+    return None
+
+@st.fragment(run_every=POLL_INTERVAL)
+def render_turn_progress(job_id: str):
+    """Partial reply, current step and a cancel button for a turn running in the background"""
+    executor = get_turn_executor()
+    progress = executor.get_progress(job_id)
+    if progress is None or progress['status'] in FINISHED_STATUSES:
+        # One full rerun moves the finished turn into the history
+        st.rerun()
+
+    if progress['partial']:
+        st.markdown(message_html({'role': 'agent', 'content': progress['partial'] + " ▌"}), unsafe_allow_html=True)
+
+    if progress['status'] == 'cancelling':
+        step = "Cancelling"
+    elif progress['tool']:
+        step = f"Running {progress['tool']}"
+    else:
+        step = NODE_LABELS.get(progress['node'], "Waiting for the agent")
+    col_status, col_cancel = st.columns([4, 1])
+    col_status.caption(f"🔄 {step}… ({progress['elapsed']:.1f}s)")
+    if col_cancel.button("⏹ Cancel", key=f"cancel_{job_id}", disabled=progress['status'] == 'cancelling'):
+        executor.cancel(job_id)
+
+def render_history(messages: List[Dict]):
+    """Render the conversation so far as one block, reusing the HTML of messages already rendered"""
+    rendered = get_session_state('rendered_messages') or []
+    latencies = get_session_state('turn_latencies') or {}
+    # Keep the longest prefix that is unchanged (a reset or a new lead starts over)
+    keep = 0
+    while keep < min(len(rendered), len(messages)) and rendered[keep][0] == (messages[keep]['role'], messages[keep]['content']):
+        keep += 1
+    rendered = rendered[:keep] + [
+        ((message['role'], message['content']), message_html(message, latencies.get(index)))
+        for index, message in enumerate(messages[keep:], start=keep)
+    ]
+    set_session_state('rendered_messages', rendered)
+    if rendered:
+        st.markdown("".join(html for _, html in rendered), unsafe_allow_html=True)
+
+def message_html(message: Dict, latency: Optional[Dict] = None) -> str:
+    """HTML block for a single message"""
     role = message['role']
     content = message['content']
     timestamp = message.get('timestamp', '')
+    if latency:
+        first_token = f"first token {latency['first_token']:.2f}s · " if latency.get('first_token') is not None else ""
+        timestamp = f"{timestamp} ⏱️ {first_token}{latency['total']:.2f}s".strip()
 
     if role == 'agent':
-        st.markdown(f"""
+        return f"""
         <div class="agent-message">
             <strong>🤖 Zain (Sales Agent)</strong>
             <small style="float: right; color: gray;">{timestamp}</small>
             <br><br>
             {content}
         </div>
-        """, unsafe_allow_html=True)
-    else:
-        st.markdown(f"""
+        """
+    return f"""
         <div class="user-message">
             <strong>👤 You</strong>
             <small style="float: right; color: gray;">{timestamp}</small>
             <br><br>
             {content}
         </div>
-        """, unsafe_allow_html=True)
+        """
+
+def render_message(message: Dict):
+    """Render a single message"""
+    st.markdown(message_html(message), unsafe_allow_html=True)
 
-def render_user_input():
-    """Render user input section"""
+def render_user_input() -> Optional[str]:
+    """Render user input section; returns the submitted message, if any"""
     st.markdown("---")
     with st.form(key="user_input_form", clear_on_submit=True):
         col1, col2 = st.columns([4, 1])
-        
+
         with col1:
             user_input = st.text_area(
                 "Your message:",
@@ -107,24 +176,21 @@ def render_user_input():
                 height=100,
                 key="user_message_input"
             )
-        
+
         with col2:
             st.markdown("<br>", unsafe_allow_html=True)
             submit_button = st.form_submit_button("Send 📤", type="primary")
-        
-        if submit_button and user_input.strip():
-            handle_user_input(user_input.strip())
 
-def handle_user_input(user_input: str):
-    """Handle user input and get agent response"""
-    global handler  # Tell Python to use the global variable
+        if submit_button and user_input.strip():
+            return user_input.strip()
+    return None
 
+def handle_user_input(handler: ConversationHandler, user_input: str):
+    """Submit a user message; the agent reply runs in the background and is polled"""
     current_lead = get_session_state('current_lead')
-    
+
     try:
-        with st.spinner("Agent is thinking..."):
-            handler.process_user_input(current_lead, user_input)  
-        st.rerun()
+        handler.process_user_input(current_lead, user_input)
     except Exception as e:
         st.error(f"Error processing message: {str(e)}")
         st.exception(e)  # For debugging
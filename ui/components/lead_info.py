@@ -1,21 +1,11 @@
 import streamlit as st
-import json
-from pathlib import Path
-from agent.services.memory_manager import load_memory
+from agent.services.lead_repository import get_lead_repository
 
 def render_lead_info(lead_id: str):
     """Render lead information panel"""
     
     # Load lead data
-    leads_file = Path("data/leads.json")
-    if not leads_file.exists():
-        st.error("Leads file not found!")
-        return
-    
-    with open(leads_file, 'r') as f:
-        leads = json.load(f)
-    
-    lead_data = leads.get(lead_id, {})
+    lead_data = get_lead_repository().get_lead(lead_id)
     if not lead_data:
         st.error(f"Lead {lead_id} not found!")
         return
@@ -39,7 +29,7 @@ def render_lead_info(lead_id: str):
 def render_lead_memory_summary(lead_id: str):
     """Render lead memory and qualification summary"""
     
-    memory = load_memory(lead_id)
+    memory = get_lead_repository().get_memory(lead_id)
     
     if memory and memory.get('detailed_memory'):
         detailed = memory['detailed_memory']
@@ -109,7 +99,7 @@ def render_lead_memory_summary(lead_id: str):
 def render_conversation_insights(lead_id: str):
     """Render additional conversation insights"""
     
-    memory = load_memory(lead_id)
+    memory = get_lead_repository().get_memory(lead_id)
     
     if memory and memory.get('detailed_memory'):
         detailed = memory['detailed_memory']
@@ -1,31 +1,35 @@
 import streamlit as st
-import json
-from pathlib import Path
-from ui.utils.session_state import get_session_state, set_session_state
-from agent.services.memory_manager import load_memory
+from ui.utils.session_state import get_session_state, set_session_state, reset_conversation_state
+from agent.services.lead_repository import get_lead_repository
+from ui.utils.lead_pagination import get_lead_page, render_page_controls
+from ui.utils.resources import knowledge_ready
 
 def render_sidebar():
     """Render the sidebar with lead selection and conversation controls"""
     
     st.sidebar.markdown("### 👥 Lead Management")
     
-    # Load available leads
-    leads_file = Path("data/leads.json")
-    if not leads_file.exists():
-        st.sidebar.error("No leads file found!")
-        return
-    
-    with open(leads_file, 'r') as f:
-        leads = json.load(f)
+    # Search the lead book one page at a time
+    repository = get_lead_repository()
+    query = st.sidebar.text_input("Search leads:", placeholder="Name, company or lead ID")
+    total = repository.count_leads(query)
     
-    if not leads:
-        st.sidebar.warning("No leads available")
+    if not total:
+        st.sidebar.warning("No leads match your search" if query else "No leads available")
         return
     
+    page, page_number = get_lead_page('sidebar_leads', query)
+    
     # Lead selection
     current_lead = get_session_state('current_lead')
-    lead_options = {f"{data['name']} ({data['company']})": lead_id 
-                   for lead_id, data in leads.items()}
+    lead_options = {f"{lead['name']} ({lead['company']})": lead['lead_id'] 
+                   for lead in page.leads}
+    
+    # Keep the current lead selectable while browsing other pages
+    if current_lead and current_lead not in lead_options.values():
+        lead_data = repository.get_lead(current_lead)
+        if lead_data:
+            lead_options = {f"{lead_data['name']} ({lead_data['company']})": current_lead, **lead_options}
     
     selected_option = st.sidebar.selectbox(
         "Select Lead:",
@@ -42,10 +46,11 @@ def render_sidebar():
         if selected_lead_id != current_lead:
             set_session_state('current_lead', selected_lead_id)
             # Clear conversation when switching leads
-            set_session_state('conversation_history', [])
-            set_session_state('conversation_active', False)
+            reset_conversation_state()
             st.rerun()
     
+    render_page_controls(st.sidebar, 'sidebar_leads', page, page_number, total)
+    
     # Conversation controls
     st.sidebar.markdown("---")
     st.sidebar.markdown("### 🎛️ Controls")
@@ -58,8 +63,7 @@ def render_sidebar():
                 st.rerun()
         else:
             if st.sidebar.button("🔄 Reset Conversation"):
-                set_session_state('conversation_history', [])
-                set_session_state('conversation_active', False)
+                reset_conversation_state()
                 st.rerun()
     
     # Lead memory summary
@@ -67,7 +71,7 @@ def render_sidebar():
         st.sidebar.markdown("---")
         st.sidebar.markdown("### 📝 Lead Memory")
         
-        memory = load_memory(current_lead)
+        memory = repository.get_memory(current_lead)
         if memory and memory.get('summary'):
             with st.sidebar.expander("Previous Interactions"):
                 st.markdown(memory['summary'])
@@ -78,8 +82,10 @@ def render_sidebar():
     st.sidebar.markdown("---")
     st.sidebar.markdown("### 📊 System Status")
     
-    knowledge_status = get_session_state('knowledge_initialized', False)
-    st.sidebar.success("✅ Knowledge Base Ready" if knowledge_status else "❌ Knowledge Base Not Ready")
+    if knowledge_ready():
+        st.sidebar.success("✅ Knowledge Base Ready")
+    else:
+        st.sidebar.info("⏳ Knowledge Base Loading")
     
     if current_lead and get_session_state('conversation_active'):
         st.sidebar.success("✅ Conversation Active")
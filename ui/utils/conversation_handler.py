@@ -1,50 +1,48 @@
 import streamlit as st
 from datetime import datetime
 from typing import List, Dict, Any
-from agent.AgentAPI import get_agent_api
+from agent.AgentAPI import AgentAPI
+from agent.services.turn_executor import get_turn_executor
+from ui.utils.resources import get_shared_runtime
 from ui.utils.session_state import get_session_state, set_session_state, get_conversation_config
 
+def get_agent_session(lead_id: str) -> AgentAPI:
+    """Get this browser session's conversation with a lead, starting one on the shared graph if needed"""
+    agent_session = get_session_state('agent_session')
+    if agent_session is None or agent_session.lead_id != lead_id:
+        agent_session = get_shared_runtime().session(lead_id)
+        set_session_state('agent_session', agent_session)
+    return agent_session
+
+def end_agent_session():
+    """Drop this browser session's conversation state"""
+    set_session_state('agent_session', None)
+
 class ConversationHandler:
     """Handles conversation logic between UI and agent graph"""
     
-    def __init__(self):
-        self.app = self._get_or_create_app()
-    
-    def _get_or_create_app(self):
-        """Get or create the agent graph app"""
-        if not get_session_state('agent_graph'):
-            app = get_agent_api(get_session_state('current_lead'))
-            set_session_state('agent_graph', app)
-            return app
-        return get_session_state('agent_graph')
+    def __init__(self, lead_id: str):
+        self.app = get_agent_session(lead_id)
     
     def start_conversation(self, lead_id: str) -> str:
-        """Start a new conversation with opening statement"""
+        """Generate the opening statement in the background; returns the turn job id"""
         try:
-            # Run the graph to get opening statement
-            # The graph should handle the opening statement generation
-            return self.app.get_opening_statement(lead_id)
+            return self._submit(lead_id)
                     
         except Exception as e:
             st.error(f"Error starting conversation: {str(e)}")
             raise e
     
-    def process_user_input(self, lead_id: str, user_input: str) -> None:
-        """Save user message immediately, then process agent reply in next run"""
-        self.app = self._get_or_create_app()
-
-        # 1️⃣ Save the user message right away
-        self.app.set_user_response(user_input)
-        set_session_state('conversation_history', self.app.state['messages'])
-        
-        # Mark that we still need to process this input
-        set_session_state('pending_user_input', {
-            'lead_id': lead_id,
-            'text': user_input
-        })
-
-        # 2️⃣ Trigger rerun so UI shows user message now
-        st.rerun()
+    def process_user_input(self, lead_id: str, user_input: str) -> str:
+        """Run the agent's reply to a user message in the background; returns the turn job id"""
+        return self._submit(lead_id, user_input)
+    
+    def _submit(self, lead_id: str, user_input: str = None) -> str:
+        # The history shown while the turn runs is the state as it was before it
+        messages = self.app.state.get('messages', []) if self.app.state else []
+        job_id = get_turn_executor().submit(self.app, lead_id, user_input)
+        set_session_state('turn_job', {'id': job_id, 'history_len': len(messages), 'user_input': user_input})
+        return job_id
     
     def _convert_history_to_messages(self, conversation_history: List[Dict]) -> List[Dict]:
         """Convert UI conversation history to agent message format"""
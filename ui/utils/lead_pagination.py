@@ -0,0 +1,35 @@
+import math
+import streamlit as st
+from typing import Tuple
+from agent.services.lead_repository import get_lead_repository
+from agent.services.lead_store import LeadPage
+from ui.utils.session_state import get_session_state, set_session_state
+
+PAGE_SIZE = 20
+
+def get_lead_page(key: str, query: str = "", **filters) -> Tuple[LeadPage, int]:
+    """Get the current page of a searchable lead list and its 1-based page number"""
+    # Keyset cursors of the pages visited so far; a new search starts over at page 1
+    params = (query, tuple(sorted(filters.items())))
+    pages = get_session_state(f'{key}_pages')
+    if not pages or pages['params'] != params:
+        pages = {'params': params, 'cursors': [None]}
+        set_session_state(f'{key}_pages', pages)
+
+    page = get_lead_repository().search_leads(query, limit=PAGE_SIZE, after=pages['cursors'][-1], **filters)
+    return page, len(pages['cursors'])
+
+def render_page_controls(container, key: str, page: LeadPage, page_number: int, total: int):
+    """Render previous/next buttons for a lead list"""
+    pages = get_session_state(f'{key}_pages')
+    col_prev, col_info, col_next = container.columns([1, 2, 1])
+
+    if col_prev.button("◀", key=f"{key}_prev", disabled=page_number == 1):
+        pages['cursors'].pop()
+        st.rerun()
+
+    col_info.caption(f"Page {page_number} of {max(1, math.ceil(total / PAGE_SIZE))} ({total} leads)")
+
+    if col_next.button("▶", key=f"{key}_next", disabled=page.next_cursor is None):
+        pages['cursors'].append(page.next_cursor)
+        st.rerun()
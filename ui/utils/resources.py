@@ -0,0 +1,18 @@
+import streamlit as st
+from agent.runtime import AgentRuntime, get_runtime
+from agent.services.lead_repository import get_lead_repository
+
+@st.cache_resource(show_spinner="Warming up the sales agent...")
+def get_shared_runtime() -> AgentRuntime:
+    """
+    Process-wide warmed runtime (compiled graph, LLM clients, knowledge indexes).
+    Runs once per server process; new browser tabs and reruns reuse it.
+    """
+    runtime = get_runtime()
+    runtime.warm(background_indexes=True)
+    get_lead_repository()
+    return runtime
+
+def knowledge_ready() -> bool:
+    """True once the background index loading has finished"""
+    return get_shared_runtime().wait_until_warm(timeout=0)
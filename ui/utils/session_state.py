@@ -1,13 +1,10 @@
 import streamlit as st
 from typing import Any, Optional
+from agent.services.turn_executor import get_turn_executor
 
 def initialize_session_state():
     """Initialize session state variables"""
     
-    # Core application state
-    if 'knowledge_initialized' not in st.session_state:
-        st.session_state.knowledge_initialized = False
-    
     # Conversation state
     if 'current_lead' not in st.session_state:
         st.session_state.current_lead = None
@@ -18,9 +15,13 @@ def initialize_session_state():
     if 'conversation_history' not in st.session_state:
         st.session_state.conversation_history = []
     
-    # Agent state
-    if 'agent_graph' not in st.session_state:
-        st.session_state.agent_graph = None
+    # Agent state (the compiled graph itself is shared process-wide; see ui/utils/resources.py)
+    if 'agent_session' not in st.session_state:
+        st.session_state.agent_session = None
+    
+    # Agent turn running in the background for this session (see ui/components/chat.py)
+    if 'turn_job' not in st.session_state:
+        st.session_state.turn_job = None
     
     if 'conversation_config' not in st.session_state:
         st.session_state.conversation_config = {}
@@ -39,10 +40,16 @@ def clear_session_state(key: str):
         delattr(st.session_state, key)
 
 def reset_conversation_state():
-    """Reset conversation-related session state"""
+    """Reset conversation-related session state (cancelling a turn still running)"""
+    turn_job = get_session_state('turn_job')
+    if turn_job:
+        get_turn_executor().cancel(turn_job['id'])
+    set_session_state('turn_job', None)
     set_session_state('conversation_active', False)
     set_session_state('conversation_history', [])
     set_session_state('conversation_config', {})
+    set_session_state('turn_latencies', {})
+    set_session_state('agent_session', None)
 
 def get_conversation_config(lead_id: str) -> dict:
     """Get or create conversation config for a lead"""
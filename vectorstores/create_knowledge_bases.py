@@ -1,15 +1,15 @@
 import json
 import os
 import pickle
+import threading
 from typing import List
 from dotenv import load_dotenv
-from PyPDF2 import PdfReader
 from langchain.schema import Document
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
 from langchain_community.vectorstores import FAISS
 from langchain.retrievers import BM25Retriever, EnsembleRetriever
-from agent.services.llm_service import get_llm
+from agent.services.llm_service import get_llm, get_embeddings, invoke_llm
+from agent.services.result_cache import manifest_fingerprint
+from agent.services.tracing import span
 
 # Load environment variables
 load_dotenv()
@@ -17,6 +17,7 @@ load_dotenv()
 # Global retrievers
 dense_retriever = None
 bm25_retriever = None
+_vector_lock = threading.Lock()
 
 
 JSON_RETRIEVARS = {
@@ -26,6 +27,10 @@ JSON_RETRIEVARS = {
     "company_projects": ["vectorstores/json_files_indexes/company_projects_faiss_index", "vectorstores/json_files_indexes/company_projects_bm25_index.pkl"],
 }
 
+# Loaded JSON indexes: type -> (manifest fingerprint, dense retriever, bm25 retriever, original JSON data)
+_json_indexes = {}
+_json_indexes_lock = threading.Lock()
+
 JSON_FILES = {
    "company_profile": "data/company_docs/company_profile.json",
    "company_price_models": "data/company_docs/company_price_models.json",
@@ -33,8 +38,18 @@ JSON_FILES = {
    "company_projects": "data/company_docs/projects.json"
 }
 
+def index_manifest_paths(index: str) -> List[str]:
+    """Files a search over `index` depends on; changing any of them invalidates cached results."""
+    if index == "company_docs":
+        return [os.getenv("FAISS_PATH", "vectorstores/faiss_index"), os.getenv("BM25_PATH", "vectorstores/bm25_index.pkl")]
+    return [*JSON_RETRIEVARS[index], JSON_FILES[index]]
+
 # --- 1. Chunking Documents ---
 def chunk_pdf_doc(pdf_path: str) -> List[Document]:
+    # Only needed when (re)building indexes
+    from PyPDF2 import PdfReader
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+
     pdf_reader = PdfReader(pdf_path)
     pdf_text = "".join([page.extract_text() or "" for page in pdf_reader.pages])
     doc = Document(page_content=pdf_text, metadata={"source": pdf_path})
@@ -49,10 +64,7 @@ def chunk_pdf_doc(pdf_path: str) -> List[Document]:
 
 # --- 2. Create and Save FAISS Retriever ---
 def create_faiss_index(chunks: List[Document], api_key: str, save_path: str):
-    embeddings = GoogleGenerativeAIEmbeddings(
-        model="models/embedding-001",
-        google_api_key=api_key
-    )
+    embeddings = get_embeddings(api_key)
     vectorstore = FAISS.from_documents(chunks, embeddings)
     vectorstore.save_local(save_path)
     return vectorstore.as_retriever(search_kwargs={"k": 2})
@@ -66,10 +78,7 @@ def create_bm25_index(chunks: List[Document], save_path: str):
 
 # --- 4. Load FAISS Retriever ---
 def load_faiss_index(api_key: str, load_path: str):
-    embeddings = GoogleGenerativeAIEmbeddings(
-        model="models/embedding-001",
-        google_api_key=api_key
-    )
+    embeddings = get_embeddings(api_key)
     vectorstore = FAISS.load_local(load_path, embeddings, allow_dangerous_deserialization=True)
     return vectorstore.as_retriever(search_kwargs={"k": 2})
 
@@ -116,9 +125,16 @@ def get_value_by_keypath(data, chain):
     return current
 
 # --- 6. Initialize Indexes ---
-def initialize_vector_knowledge():
+def initialize_vector_knowledge(force: bool = False):
+    with _vector_lock:  # Concurrent callers (e.g. background warm-up and a first search) load once
+        _initialize_vector_knowledge(force)
+
+def _initialize_vector_knowledge(force: bool):
     global dense_retriever, bm25_retriever
 
+    if dense_retriever is not None and bm25_retriever is not None and not force:
+        return  # Already loaded in this process
+
     docs_dir = os.getenv("COMPANY_DOCS_DIR", "data/company_docs")
 
     faiss_path = os.getenv("FAISS_PATH", "vectorstores/faiss_index")
@@ -155,28 +171,46 @@ def initialize_json_knowledge():
             google_api_key = os.getenv("GOOGLE_API_KEY")
             create_faiss_index(chunks, google_api_key, faiss_path)
             create_bm25_index(chunks, bm25_path)
+        get_json_index(json_name)  # Preload so the first search doesn't pay for it
+
+def get_json_index(type: str):
+    """Loaded retrievers and data for a JSON index; reloaded when its files change on disk."""
+    fingerprint = manifest_fingerprint(index_manifest_paths(type))
+    cached = _json_indexes.get(type)
+    if cached and cached[0] == fingerprint:
+        return cached
+    with _json_indexes_lock:
+        cached = _json_indexes.get(type)
+        if cached and cached[0] == fingerprint:
+            return cached
+        faiss_path, bm25_path = JSON_RETRIEVARS[type]
+        with span("index_load", index=type):
+            with open(JSON_FILES[type], "r") as f:
+                original_json_data = json.load(f)
+            json_dense_retriever = load_faiss_index(os.getenv("GOOGLE_API_KEY"), faiss_path)
+            json_bm25_retriever = load_bm25_index(bm25_path)
+        _json_indexes[type] = (fingerprint, json_dense_retriever, json_bm25_retriever, original_json_data)
+        return _json_indexes[type]
 
 def search_json_keys_and_return_values(query: str, top_k: int = 10, type: str = "company_profile") -> str:
+    with span("retriever", index=type, query_chars=len(query)) as retriever_span:
+        result = _search_json_keys_and_return_values(query, top_k, type)
+        retriever_span.set("result_chars", len(result))
+        return result
+
+def _search_json_keys_and_return_values(query: str, top_k: int, type: str) -> str:
     # Set top_k on both retrievers
     
     if type not in JSON_RETRIEVARS:
         raise ValueError(f"Invalid type: {type}. Must be one of {list(JSON_RETRIEVARS.keys())}.")
     
-    faiss_path, bm25_path = JSON_RETRIEVARS[type]
+    _, json_dense_retriever, json_bm25_retriever, original_json_data = get_json_index(type)
 
-    # Load original JSON data
-    json_path = JSON_FILES[type]
-    with open(json_path, "r") as f:
-        original_json_data = json.load(f)
-
-    json_dense_retriever = load_faiss_index(os.getenv("GOOGLE_API_KEY"), faiss_path)
-    json_bm25_retriever = load_bm25_index(bm25_path)
-
-    # Set top_k for BM25 retriever
-    json_bm25_retriever.k = top_k
-
-    # Create dense retriever with top_k
-    json_dense_retriever.search_kwargs["k"] = top_k
+    # Per-call copies with top_k; the loaded retrievers are shared across sessions
+    json_bm25_retriever = json_bm25_retriever.model_copy(update={"k": top_k})
+    json_dense_retriever = json_dense_retriever.model_copy(
+        update={"search_kwargs": {**json_dense_retriever.search_kwargs, "k": top_k}}
+    )
 
     # Combine them
     ensemble = EnsembleRetriever(
@@ -206,6 +240,13 @@ def search_json_keys_and_return_values(query: str, top_k: int = 10, type: str =
 
 # --- 7. Query Interface ---
 def search_knowledge_base_rag(question: str) -> str:
+    with span("retriever", index="company_docs", query_chars=len(question)):
+        return _search_knowledge_base_rag(question)
+
+def _search_knowledge_base_rag(question: str) -> str:
+    if dense_retriever is None or bm25_retriever is None:
+        initialize_vector_knowledge()  # Still warming up in the background
+
     # Set number of BM25 results
     bm25_retriever.k = 2
 
@@ -236,7 +277,7 @@ def search_knowledge_base_rag(question: str) -> str:
 
     # Run through LLM
     llm = get_llm()
-    response = llm.invoke(prompt).content
+    response = invoke_llm(llm, prompt, "kb_answer")
 
     # Return text response
     return response
@@ -1,47 +1,310 @@
-import socket
-import json
-from audio.voice_service import VoiceService# your existing VoiceService class
+"""
+Voice gateway: serves speech-to-text to many concurrent clients.
 
-HOST = '127.0.0.1'
-PORT = 5001
+Clients speak the length-prefixed binary protocol in audio/protocol.py. A
+request opens a stream with a CONTROL command; its responses and
+transcripts come back on the same stream id, so a client can pipeline
+requests on one connection and have them answered out of order:
 
-def run_server():
-    
-    vs = VoiceService()
-    print(f"🎤 Voice Service listening on {HOST}:{PORT}...")
-
-    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-        s.bind((HOST, PORT))
-        s.listen()
-        conn, addr = s.accept()
-        print(f"✅ Connected to {addr}")
-
-        with conn:
-            buffer = ""
-            while True:
-                chunk = conn.recv(1024).decode('utf-8')
-                if not chunk:
+    {"command": "listen"}                              one utterance from this machine's mic
+    {"command": "transcribe", "sample_rate": 16000,    the client streams PCM frames on the stream,
+     "endpoint": true}                                 then AUDIO_END
+    {"command": "health"} / {"command": "stats"}       gateway status and queue depth
+    {"command": "quit"}                                close this connection
+
+listen and transcribe reply with TRANSCRIPT {"text": ..., "final": false}
+partials while the lead is still speaking ("partials": false turns them
+off) and a final {"text": ..., "final": true}. With "endpoint" (the
+default) a transcribe request is answered as soon as VAD sees the end of
+the utterance, without waiting for AUDIO_END; the gateway then sends
+AUDIO_END on the stream and drops any audio still arriving on it.
+
+Transcriptions run on a bounded worker pool (STT_WORKERS). A connection may
+have MAX_PENDING_PER_CONNECTION requests in flight and at most
+STT_QUEUE_LIMIT jobs wait for a worker; past either limit a request is
+answered with CONTROL {"error": "busy"} instead of queueing without bound.
+Voice activity detection on client audio runs on the event loop as frames
+arrive; workers only run whisper. A transcribe stream that goes quiet for
+VOICE_STREAM_IDLE_TIMEOUT seconds is finished with the audio it has.
+The gateway waits for its writes to drain before reading the next frame,
+so a client that stops reading is pushed back by TCP.
+"""
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+import numpy as np
+
+from audio.protocol import (AUDIO_END, CONTROL, HOST, PCM, PORT, TRANSCRIPT, ProtocolError, encode_frame,
+                            encode_json, read_frame)
+from audio.ring_buffer import AudioRingBuffer
+from audio.streaming_stt import StreamingTranscriber
+from audio.stt import SAMPLE_RATE, to_float32
+
+STT_WORKERS = int(os.getenv("STT_WORKERS", "2"))
+STT_QUEUE_LIMIT = int(os.getenv("STT_QUEUE_LIMIT", "32"))
+MAX_PENDING_PER_CONNECTION = int(os.getenv("MAX_PENDING_PER_CONNECTION", "4"))
+# Longest client utterance kept per transcribe request
+VOICE_STREAM_BUFFER_SECONDS = float(os.getenv("VOICE_STREAM_BUFFER_SECONDS", "30"))
+# A transcribe stream that gets no audio for this long is finished with what it has
+VOICE_STREAM_IDLE_TIMEOUT = float(os.getenv("VOICE_STREAM_IDLE_TIMEOUT", "10"))
+STREAM_CHECK_INTERVAL = 0.25  # seconds between timeout checks while a stream is quiet
+
+
+class GatewayBusy(Exception):
+    pass
+
+
+class AudioStream:
+    """Client audio of one transcribe request, written and endpointed on the event loop."""
+
+    def __init__(self, sample_rate: int = SAMPLE_RATE):
+        self.sample_rate = sample_rate
+        self.ring = AudioRingBuffer(VOICE_STREAM_BUFFER_SECONDS, SAMPLE_RATE, dtype=np.float32)
+        self.done = False                # no more audio taken: AUDIO_END, endpointed, or the client went away
+        self.changed = asyncio.Event()   # new audio, or done
+        self.last_audio_at = time.monotonic()
+
+    def write(self, payload: bytes):
+        if len(payload) % 2:
+            raise ProtocolError("PCM frame with an odd number of bytes")
+        if self.done:
+            return  # endpointed: the utterance being transcribed must not be overwritten
+        self.ring.write(to_float32(np.frombuffer(payload, dtype="<i2"), self.sample_rate))
+        self.last_audio_at = time.monotonic()
+        self.changed.set()
+
+    def finish(self):
+        self.done = True
+        self.changed.set()
+
+    @property
+    def idle(self) -> bool:
+        return time.monotonic() - self.last_audio_at >= VOICE_STREAM_IDLE_TIMEOUT
+
+
+class VoiceGateway:
+    """asyncio front end; transcription runs on a thread pool shared by all connections."""
+
+    def __init__(self, workers: int = STT_WORKERS, queue_limit: int = STT_QUEUE_LIMIT):
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="stt")
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self._voice_service = None
+        self._voice_service_lock = threading.Lock()
+        self._mic_lock = None  # asyncio.Lock, created on the gateway's loop
+        self._counts_lock = threading.Lock()  # queue counters are updated from worker threads
+        self.started_at = time.time()
+        self.connections = 0
+        self.queued = 0    # jobs waiting for a worker
+        self.running = 0   # jobs on a worker
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+
+    def voice_service(self):
+        # Loaded on first use: sounddevice and the STT model are slow to import.
+        # One whisper context per worker, so every worker can transcribe at once
+        with self._voice_service_lock:
+            if self._voice_service is None:
+                from audio.voice_service import VoiceService
+                self._voice_service = VoiceService(stt_contexts=self.workers)
+            return self._voice_service
+
+    def stats(self) -> dict:
+        return {
+            "status": "ok",
+            "uptime": round(time.time() - self.started_at, 1),
+            "connections": self.connections,
+            "workers": self.workers,
+            "queue_depth": self.queued,
+            "queue_limit": self.queue_limit,
+            "running": self.running,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "stt": self._voice_service.stt.stats if self._voice_service else None,
+        }
+
+    async def run_job(self, fn, *args):
+        """Runs fn(*args) on the worker pool, or raises GatewayBusy when too many jobs are waiting."""
+        with self._counts_lock:
+            if self.queued >= self.queue_limit:
+                self.rejected += 1
+                raise GatewayBusy(f"{self.queued} transcriptions already queued")
+            self.queued += 1
+        state = {"started": False, "abandoned": False}
+
+        def job():
+            with self._counts_lock:
+                if state["abandoned"]:
+                    return None
+                state["started"] = True
+                self.queued -= 1
+                self.running += 1
+            try:
+                return fn(*args)
+            finally:
+                with self._counts_lock:
+                    self.running -= 1
+
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(self._pool, job)
+            self.completed += 1
+            return result
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            with self._counts_lock:
+                if not state["started"]:  # the client went away before a worker picked it up
+                    state["abandoned"] = True
+                    self.queued -= 1
+
+    def transcribe_pcm(self, samples, sample_rate: int = SAMPLE_RATE) -> str:
+        # Lets StreamingTranscriber use the (lazily loaded) model from a worker thread
+        return self.voice_service().stt.transcribe_pcm(samples, sample_rate)
+
+    async def transcribe_stream(self, stream: AudioStream, on_partial, endpoint: bool,
+                                on_audio_end: Callable[[], None] = None) -> str:
+        """
+        Endpoints a client's audio on the event loop as it arrives; only whisper
+        calls (partial windows, the final transcript) take a worker, so a client
+        that stalls mid-stream doesn't hold one. Once the utterance has ended the
+        stream takes no more audio and on_audio_end tells the client to stop sending.
+        """
+        transcriber = StreamingTranscriber(self, stream.ring, on_partial=on_partial, start=0, endpoint=endpoint)
+        partial = None
+        try:
+            while not stream.done and not stream.idle:
+                if transcriber.advance():
                     break
+                if transcriber.partial_due() and (partial is None or partial.done()):
+                    # Copied here: the client keeps writing into the ring while whisper runs
+                    window = transcriber.take_partial_window().copy()
+                    partial = asyncio.create_task(self._partial(transcriber, window))
+                stream.changed.clear()
+                try:
+                    await asyncio.wait_for(stream.changed.wait(), STREAM_CHECK_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            # No partials after the final transcript
+            transcriber.on_partial = None
+            if partial is not None:
+                partial.cancel()
+            if not stream.done:
+                stream.finish()
+                if on_audio_end:
+                    on_audio_end()
+        return await self.run_job(transcriber.final_transcript)
 
-                buffer += chunk
-                while "\n" in buffer:
-                    line, buffer = buffer.split("\n", 1)
-                    try:
-                        msg = json.loads(line)
-                        command = msg.get("command")
+    async def _partial(self, transcriber: StreamingTranscriber, window):
+        try:
+            await self.run_job(transcriber.emit_partial, window)
+        except GatewayBusy:
+            pass  # partials are best effort; the final transcript still comes
+        except Exception as e:
+            print(f"❌ Partial transcription failed: {e}")
 
-                        if command == "listen":
-                            print("🎙️ Starting recording...")
-                            text = vs.listen()
-                            response = json.dumps({"transcription": text})
-                            conn.sendall(response.encode('utf-8') + b"\n")
+    async def run_request(self, stream_id: int, msg: dict, streams: dict, send):
+        """Runs one request; its response and transcripts go out through send(frame_type, stream_id[, message])."""
+        command = msg.get("command")
+        on_partial = None
+        if msg.get("partials", True):
+            loop = asyncio.get_running_loop()
+            # Called on the STT worker thread
+            on_partial = lambda text: loop.call_soon_threadsafe(
+                send, TRANSCRIPT, stream_id, {"text": text, "final": False})
+        try:
+            if command in ("health", "stats"):
+                send(CONTROL, stream_id, self.stats())
+                return
+            if command == "listen":
+                # One microphone: callers take turns
+                async with self._mic_lock:
+                    text = await self.run_job(lambda: self.voice_service().listen(on_partial=on_partial))
+            elif command == "transcribe":
+                text = await self.transcribe_stream(streams[stream_id], on_partial, bool(msg.get("endpoint", True)),
+                                                    on_audio_end=lambda: send(AUDIO_END, stream_id))
+            else:
+                send(CONTROL, stream_id, {"error": f"Unknown command {command!r}"})
+                return
+            send(TRANSCRIPT, stream_id, {"text": text, "final": True})
+        except GatewayBusy as e:
+            send(CONTROL, stream_id, {"error": "busy", "detail": str(e)})
+        except Exception as e:
+            send(CONTROL, stream_id, {"error": str(e)})
+        finally:
+            streams.pop(stream_id, None)
 
-                        elif command == "quit":
-                            print("❌ Closing connection")
-                            return
+    async def handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        addr = writer.get_extra_info("peername")
+        self.connections += 1
+        print(f"✅ Connected to {addr} ({self.connections} connections)")
+        streams = {}      # stream id -> AudioStream of a transcribe request still taking audio
+        requests = set()  # request tasks in flight
 
-                    except json.JSONDecodeError:
+        def send(frame_type: int, stream_id: int, message: dict = None):
+            if not writer.is_closing():
+                writer.write(encode_frame(frame_type, stream_id) if message is None
+                             else encode_json(frame_type, stream_id, message))
+
+        try:
+            while (frame := await read_frame(reader)) is not None:
+                if frame.type == CONTROL:
+                    msg = frame.json()
+                    if msg.get("command") == "quit":
+                        print(f"❌ Closing connection {addr}")
+                        break
+                    if len(requests) >= MAX_PENDING_PER_CONNECTION:
+                        self.rejected += 1
+                        send(CONTROL, frame.stream, {"error": "busy", "detail": f"{len(requests)} requests in flight"})
                         continue
+                    if msg.get("command") == "transcribe":
+                        # Registered before the audio frames that follow are read
+                        streams[frame.stream] = AudioStream(int(msg.get("sample_rate", SAMPLE_RATE)))
+                    task = asyncio.create_task(self.run_request(frame.stream, msg, streams, send))
+                    requests.add(task)
+                    task.add_done_callback(requests.discard)
+                elif frame.type == PCM and frame.stream in streams:
+                    streams[frame.stream].write(frame.payload)
+                elif frame.type == AUDIO_END and frame.stream in streams:
+                    streams[frame.stream].finish()
+                await writer.drain()
+        except (ProtocolError, ValueError, ConnectionError) as e:  # ValueError: bad JSON in a control frame
+            print(f"❌ Dropping connection {addr}: {e}")
+        finally:
+            try:
+                # Requests already made are still answered, with the audio received so far
+                for stream in streams.values():
+                    stream.finish()
+                await asyncio.gather(*requests, return_exceptions=True)
+                await writer.drain()
+            except ConnectionError:
+                pass
+            finally:
+                writer.close()
+                self.connections -= 1
+
+    async def serve(self, host: str = HOST, port: int = PORT):
+        self._mic_lock = asyncio.Lock()
+        server = await asyncio.start_server(self.handle_client, host, port)
+        print(f"🎤 Voice gateway listening on {host}:{port} ({self.workers} STT workers)")
+        async with server:
+            await server.serve_forever()
+
+
+def run_server():
+    try:
+        asyncio.run(VoiceGateway().serve())
+    except KeyboardInterrupt:
+        print("\n🛑 Voice gateway stopped.")
 
 if __name__ == "__main__":
     run_server()